@@ -0,0 +1,210 @@
+import os
+import csv
+import gzip
+import math
+import time
+import logging
+import threading
+from collections import namedtuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Bundled airport dataset (see scripts/build_airports.py)
+AIRPORTS_FILE = os.environ.get(
+    "AIRPORTS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "airports.csv.gz")
+)
+
+# Size of the spatial index cells, in degrees of latitude and longitude
+GRID_CELL_DEGREES = 1.0
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+Airport = namedtuple("Airport", ["icao", "iata", "name", "city", "country", "lat", "lon", "tz"])
+
+
+def _distance_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, h)))
+
+
+class AirportDatabase:
+    """
+    In-memory airport lookups by code and by location
+    
+    Codes are looked up in dicts; locations go through a grid of
+    GRID_CELL_DEGREES cells, so nearest-airport and bounding-box queries only
+    look at airports in nearby cells.
+    """
+    
+    def __init__(self, airports, cell_degrees=GRID_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._by_iata = {}
+        self._by_icao = {}
+        self._grid = {}
+        self._count = 0
+        for airport in airports:
+            self._count += 1
+            if airport.iata:
+                self._by_iata[airport.iata] = airport
+            if airport.icao:
+                self._by_icao[airport.icao] = airport
+            self._grid.setdefault(self._cell(airport.lat, airport.lon), []).append(airport)
+    
+    @classmethod
+    def load(cls, path=AIRPORTS_FILE):
+        """Load airports from a gzipped CSV file"""
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            next(reader)
+            return cls(
+                Airport(icao, iata, name, city, country, float(lat), float(lon), tz)
+                for icao, iata, name, city, country, lat, lon, tz in reader
+            )
+    
+    def __len__(self):
+        return self._count
+    
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lon / self.cell_degrees))
+    
+    @property
+    def _lon_cells(self):
+        return int(round(360 / self.cell_degrees))
+    
+    def get(self, code):
+        """
+        Look up an airport by IATA (3 letters) or ICAO (4 letters) code
+        
+        Returns:
+            Airport: The airport, or None if the code is unknown
+        """
+        if not code:
+            return None
+        code = code.strip().upper()
+        if len(code) == 3:
+            return self._by_iata.get(code)
+        return self._by_icao.get(code)
+    
+    def coordinates(self, code):
+        """Return (lat, lon) for an airport code, or None if it is unknown"""
+        airport = self.get(code)
+        return (airport.lat, airport.lon) if airport else None
+    
+    def nearest(self, lat, lon, max_distance_km=None, with_iata=False):
+        """
+        Find the airport closest to a point
+        
+        Searches rings of grid cells outward from the point's cell and stops
+        once no unsearched cell can hold anything closer.
+        
+        Args:
+            lat, lon (float): The point, in degrees
+            max_distance_km (float): Give up beyond this distance
+            with_iata (bool): Only consider airports that have an IATA code
+        
+        Returns:
+            tuple: (Airport, distance in km), or (None, None) if nothing was found
+        """
+        center_lat, center_lon = self._cell(lat, lon)
+        best, best_distance = None, None
+        
+        for ring in range(self._lon_cells):
+            for cell in self._ring_cells(center_lat, center_lon, ring):
+                for airport in self._grid.get(cell, ()):
+                    if with_iata and not airport.iata:
+                        continue
+                    distance = _distance_km(lat, lon, airport.lat, airport.lon)
+                    if best_distance is None or distance < best_distance:
+                        best, best_distance = airport, distance
+            
+            # Anything not searched yet lies outside this window of cells
+            bound = self._window_clearance(lat, lon, center_lat, center_lon, ring)
+            if bound == math.inf or (best_distance is not None and best_distance <= bound):
+                break
+            if max_distance_km is not None and bound > max_distance_km:
+                break
+        
+        if best is None or (max_distance_km is not None and best_distance > max_distance_km):
+            return None, None
+        return best, best_distance
+    
+    def _ring_cells(self, center_lat, center_lon, ring):
+        lon_cells = self._lon_cells
+        lon_min_cell = -lon_cells // 2
+        seen = set()
+        for row in range(center_lat - ring, center_lat + ring + 1):
+            if ring >= lon_cells // 2:
+                columns = range(center_lon - ring, center_lon + ring + 1)
+            elif abs(row - center_lat) == ring:
+                columns = range(center_lon - ring, center_lon + ring + 1)
+            else:
+                columns = (center_lon - ring, center_lon + ring)
+            for column in columns:
+                # Wrap longitude cells around the antimeridian
+                column = (column - lon_min_cell) % lon_cells + lon_min_cell
+                if (row, column) not in seen:
+                    seen.add((row, column))
+                    yield row, column
+    
+    def _window_clearance(self, lat, lon, center_lat, center_lon, ring):
+        """Lower bound (km) on the distance from the point to anything outside the searched cells"""
+        south = (center_lat - ring) * self.cell_degrees
+        north = (center_lat + ring + 1) * self.cell_degrees
+        west = (center_lon - ring) * self.cell_degrees
+        east = (center_lon + ring + 1) * self.cell_degrees
+        
+        clearance = math.inf
+        if south > -90:
+            clearance = min(clearance, (lat - south) * KM_PER_DEGREE)
+        if north < 90:
+            clearance = min(clearance, (north - lat) * KM_PER_DEGREE)
+        if east - west < 360:
+            # Distance to the great circle through the nearest unsearched meridian
+            lon_gap = min(90.0, lon - west, east - lon)
+            clearance = min(clearance, EARTH_RADIUS_KM * math.asin(
+                math.cos(math.radians(lat)) * math.sin(math.radians(lon_gap))
+            ))
+        return clearance
+    
+    def in_bbox(self, south, west, north, east, with_iata=False):
+        """
+        Find the airports inside a bounding box
+        
+        A box whose west edge is east of its east edge wraps across the antimeridian.
+        
+        Returns:
+            list: Airports inside the box
+        """
+        if west > east:
+            return self.in_bbox(south, west, north, 180.0, with_iata) + self.in_bbox(south, -180.0, north, east, with_iata)
+        
+        south_cell, west_cell = self._cell(max(south, -90.0), max(west, -180.0))
+        north_cell, east_cell = self._cell(min(north, 90.0), min(east, 180.0))
+        found = []
+        for row in range(south_cell, north_cell + 1):
+            for column in range(west_cell, east_cell + 1):
+                for airport in self._grid.get((row, column), ()):
+                    if with_iata and not airport.iata:
+                        continue
+                    if south <= airport.lat <= north and west <= airport.lon <= east:
+                        found.append(airport)
+        return found
+
+
+_airports = None
+_airports_lock = threading.Lock()
+
+
+def get_airports():
+    """Return the airport database, loading it on first use"""
+    global _airports
+    if _airports is None:
+        with _airports_lock:
+            if _airports is None:
+                start = time.perf_counter()
+                _airports = AirportDatabase.load()
+                logger.info(f"Loaded {len(_airports)} airports in {time.perf_counter() - start:.2f}s")
+    return _airports
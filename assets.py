@@ -0,0 +1,110 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+from flask import request, url_for
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Cache lifetime (seconds) for static files requested by a content-hashed URL
+ASSET_MAX_AGE = int(os.environ.get("ASSET_MAX_AGE", str(365 * 24 * 3600)))
+
+# Written by scripts/build_assets.py: source path -> minified, content-hashed build
+MANIFEST_FILE = os.path.join("dist", "manifest.json")
+
+
+class AssetVersions:
+    """
+    Content-hashed URLs for files in a static folder
+    
+    Built files listed in the manifest get their own hashed file name; any
+    other file is versioned with ?v=<hash of its contents>. Hashes are
+    recomputed only when a file's modification time changes.
+    """
+    
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._hashes = {}
+        self._manifest = (None, {})
+        self._lock = threading.Lock()
+    
+    def _mtime(self, filename):
+        try:
+            return os.stat(os.path.join(self.static_folder, filename)).st_mtime_ns
+        except OSError:
+            return None
+    
+    def manifest(self):
+        mtime = self._mtime(MANIFEST_FILE)
+        with self._lock:
+            if self._manifest[0] != mtime:
+                entries = {}
+                if mtime is not None:
+                    with open(os.path.join(self.static_folder, MANIFEST_FILE)) as f:
+                        entries = json.load(f)
+                self._manifest = (mtime, entries)
+            return self._manifest[1]
+    
+    def content_hash(self, filename):
+        """Short hash of a static file's contents, or None if it doesn't exist"""
+        mtime = self._mtime(filename)
+        if mtime is None:
+            return None
+        with self._lock:
+            cached = self._hashes.get(filename)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        with open(os.path.join(self.static_folder, filename), "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        with self._lock:
+            self._hashes[filename] = (mtime, digest)
+        return digest
+    
+    def url(self, filename):
+        """
+        URL for a static file that can be cached indefinitely
+        
+        Args:
+            filename (str): Path relative to the static folder, e.g. "js/tracker.js"
+        
+        Returns:
+            str: URL of the built file if there is one, else the source file with ?v=
+        """
+        built = self.manifest().get(filename)
+        if built:
+            return url_for("static", filename=built)
+        return url_for("static", filename=filename, v=self.content_hash(filename))
+    
+    def is_versioned(self, filename):
+        """Whether a static request names a specific version of the file"""
+        if filename.startswith("dist/"):
+            return filename in self.manifest().values()
+        version = request.args.get("v")
+        return version is not None and version == self.content_hash(filename)
+
+
+def init_assets(app):
+    """
+    Serve static files with cache headers and provide asset_url() to templates
+    
+    Versioned URLs are cached for ASSET_MAX_AGE and marked immutable; plain
+    static URLs and pages must be revalidated (Flask answers with 304 when
+    the ETag or modification time still matches).
+    """
+    versions = AssetVersions(app.static_folder)
+    app.jinja_env.globals["asset_url"] = versions.url
+    
+    @app.after_request
+    def cache_static(response):
+        if request.endpoint == "static" and response.status_code in (200, 304):
+            filename = request.view_args.get("filename", "")
+            if versions.is_versioned(filename):
+                response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+            else:
+                response.headers["Cache-Control"] = "no-cache"
+        return response
+    
+    return versions
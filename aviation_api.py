@@ -1,131 +1,464 @@
 import os
+import re
+import time
+import random
 import logging
+import threading
 import requests
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from airports import get_airports
+from flight_cache import get_cache, normalize_flight_number, ttl_for
+from geo import AIRBORNE_STATUSES, estimate_position, interpolate_great_circle, route_times
+from metrics import LatencyHistogram, timed_lookup
+from quota import PRIORITY_BACKGROUND, PRIORITY_USER, QUOTA_ERROR, QuotaExceededError, get_quota
+
+try:
+    import orjson
+except ImportError:  # optional: pip install .[serialization]
+    orjson = None
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 # AviationStack API base URL and API key
-BASE_URL = "http://api.aviationstack.com/v1"
+BASE_URL = os.environ.get("AVIATION_API_BASE_URL", "http://api.aviationstack.com/v1")
 API_KEY = os.environ.get("AVIATION_API_KEY", "default_api_key")
 
-# Airport coordinates lookup table (IATA code -> [lat, lon])
-AIRPORT_COORDINATES = {
-    # Major US airports
-    "ATL": [33.6407, -84.4277],   # Atlanta
-    "LAX": [33.9416, -118.4085],  # Los Angeles
-    "ORD": [41.9742, -87.9073],   # Chicago O'Hare
-    "DFW": [32.8998, -97.0403],   # Dallas/Fort Worth
-    "DEN": [39.8561, -104.6737],  # Denver
-    "JFK": [40.6413, -73.7781],   # New York JFK
-    "SFO": [37.7749, -122.4194],  # San Francisco
-    "SEA": [47.4502, -122.3088],  # Seattle
-    "LAS": [36.0840, -115.1537],  # Las Vegas
-    "MCO": [28.4312, -81.3081],   # Orlando
-    "EWR": [40.6895, -74.1745],   # Newark
-    "CLT": [35.2144, -80.9473],   # Charlotte
-    "PHX": [33.4352, -112.0101],  # Phoenix
-    "IAH": [29.9844, -95.3414],   # Houston
-    "MIA": [25.7932, -80.2906],   # Miami
-    "BOS": [42.3656, -71.0096],   # Boston
-    "MSP": [44.8848, -93.2223],   # Minneapolis
-    "DTW": [42.2162, -83.3554],   # Detroit
-    "FLL": [26.0742, -80.1506],   # Fort Lauderdale
-    "PHL": [39.8729, -75.2437],   # Philadelphia
-    "LGA": [40.7769, -73.8740],   # New York LaGuardia
-    "BWI": [39.1774, -76.6694],   # Baltimore
-    "SLC": [40.7899, -111.9791],  # Salt Lake City
-    "DCA": [38.8512, -77.0402],   # Washington Reagan
-    "IAD": [38.9531, -77.4565],   # Washington Dulles
-    "SAN": [32.7338, -117.1933],  # San Diego
-    "MDW": [41.7868, -87.7522],   # Chicago Midway
-    "TPA": [27.9772, -82.5311],   # Tampa
-    "PDX": [45.5898, -122.5951],  # Portland
-    "HNL": [21.3245, -157.9251],  # Honolulu
-    "CVG": [39.0489, -84.6678],   # Cincinnati
-    
-    # Major international airports
-    "LHR": [51.4700, -0.4543],    # London Heathrow
-    "CDG": [49.0097, 2.5479],     # Paris Charles de Gaulle
-    "FRA": [50.0379, 8.5622],     # Frankfurt
-    "AMS": [52.3105, 4.7683],     # Amsterdam
-    "MAD": [40.4983, -3.5676],    # Madrid
-    "BCN": [41.2974, 2.0833],     # Barcelona
-    "FCO": [41.8003, 12.2389],    # Rome
-    "LGW": [51.1481, -0.1903],    # London Gatwick
-    "MUC": [48.3537, 11.7750],    # Munich
-    "ZRH": [47.4582, 8.5555],     # Zurich
-    "DUB": [53.4264, -6.2499],    # Dublin
-    "MAN": [53.3537, -2.2750],    # Manchester
-    "CPH": [55.6180, 12.6508],    # Copenhagen
-    "VIE": [48.1200, 16.5672],    # Vienna
-    "ARN": [59.6497, 17.9237],    # Stockholm
-    "OSL": [60.1975, 11.1004],    # Oslo
-    "HEL": [60.3183, 24.9497],    # Helsinki
-    "WAW": [52.1672, 20.9679],    # Warsaw
-    "BRU": [50.9014, 4.4844],     # Brussels
-    "ATH": [37.9356, 23.9484],    # Athens
-    "LIS": [38.7756, -9.1354],    # Lisbon
-    
-    # Major Asian airports
-    "HND": [35.5494, 139.7798],   # Tokyo Haneda
-    "NRT": [35.7719, 140.3929],   # Tokyo Narita
-    "PEK": [40.0799, 116.6031],   # Beijing
-    "HKG": [22.3080, 113.9185],   # Hong Kong
-    "ICN": [37.4602, 126.4407],   # Seoul Incheon
-    "SIN": [1.3644, 103.9915],    # Singapore
-    "BKK": [13.6900, 100.7501],   # Bangkok
-    "KUL": [2.7456, 101.7099],    # Kuala Lumpur
-    "DEL": [28.5562, 77.1000],    # Delhi
-    "BOM": [19.0896, 72.8656],    # Mumbai
-    "SYD": [33.9399, 151.1753],   # Sydney
-    "MEL": [37.6690, 144.8410],   # Melbourne
-    "AKL": [36.0086, 174.7853],   # Auckland
-    "CGK": [6.1275, 106.6537],    # Jakarta
-    "MNL": [14.5086, 121.0197],   # Manila
-    
-    # Middle East airports
-    "DXB": [25.2528, 55.3644],    # Dubai
-    "DOH": [25.2609, 51.6138],    # Doha
-    "AUH": [24.4331, 54.6511],    # Abu Dhabi
-    "IST": [41.2606, 28.7425],    # Istanbul
-    "CAI": [30.1219, 31.4056],    # Cairo
-    
-    # Major African airports
-    "JNB": [26.1367, 28.2412],    # Johannesburg
-    "CPT": [33.9649, 18.6027],    # Cape Town
-    "ADD": [8.9778, 38.7989],     # Addis Ababa
-    "NBO": [1.3192, 36.9280],     # Nairobi
-    "CMN": [33.3698, -7.5900],    # Casablanca
-    
-    # Major South American airports
-    "GRU": [-23.4356, -46.4731],  # São Paulo
-    "EZE": [-34.8222, -58.5358],  # Buenos Aires
-    "BOG": [4.7016, -74.1469],    # Bogotá
-    "SCL": [-33.3898, -70.7945],  # Santiago
-    "LIM": [-12.0219, -77.1143],  # Lima
+# Connect and read timeouts (seconds) for a single AviationStack request
+CONNECT_TIMEOUT = float(os.environ.get("AVIATION_API_CONNECT_TIMEOUT", "3.05"))
+REQUEST_TIMEOUT = float(os.environ.get("AVIATION_API_TIMEOUT", "10"))
+
+# Retries with jittered exponential backoff for 429/5xx responses and
+# connection failures; Retry-After waits longer than BACKOFF_MAX are not retried
+MAX_RETRIES = int(os.environ.get("AVIATION_API_MAX_RETRIES", "2"))
+BACKOFF_BASE = float(os.environ.get("AVIATION_API_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.environ.get("AVIATION_API_BACKOFF_MAX", "8"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Circuit breaker: consecutive failures before failing fast, and seconds to
+# wait before letting a trial request through again
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("AVIATION_API_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("AVIATION_API_BREAKER_RESET", "30"))
+
+# Connection pool size per host for the shared HTTP session
+POOL_SIZE = int(os.environ.get("AVIATION_API_POOL_SIZE", "10"))
+
+# Concurrency cap and overall deadline (seconds) for multi-flight refreshes
+REFRESH_MAX_WORKERS = int(os.environ.get("REFRESH_MAX_WORKERS", "8"))
+REFRESH_DEADLINE = float(os.environ.get("REFRESH_DEADLINE", "15"))
+
+# Batch lookups: page size, maximum pages per airline query, and the smallest
+# group of flights (sharing airline and departure airport) worth batching
+BATCH_PAGE_LIMIT = int(os.environ.get("AVIATION_API_PAGE_LIMIT", "100"))
+BATCH_MAX_PAGES = int(os.environ.get("BATCH_MAX_PAGES", "3"))
+BATCH_MIN_GROUP = int(os.environ.get("BATCH_MIN_GROUP", "2"))
+
+# IATA flight number: two-character airline designator + 1-4 digit number
+FLIGHT_IATA_PATTERN = re.compile(r"^([A-Z0-9]{2})(\d{1,4}[A-Z]?)$")
+
+# Error message reported for lookups that missed the refresh deadline
+TIMEOUT_ERROR = "Request timed out"
+
+# Also coalesce duplicate lookups across worker processes via a lock in the
+# shared cache (only effective with the Redis cache backend)
+SINGLE_FLIGHT_SHARED = os.environ.get("SINGLE_FLIGHT_SHARED", "false").lower() in ("1", "true", "yes")
+
+# Share of upstream flight records written to the log in full when DEBUG
+# logging is enabled (1 logs every record)
+DEBUG_SAMPLE_RATE = float(os.environ.get("AVIATION_API_DEBUG_SAMPLE_RATE", "1"))
+
+# Nested fields read from each AviationStack flight record, as
+# name -> (section, key). Compiled once into per-section lookups below, so a
+# record is parsed with one dict lookup per section plus one per field
+FLIGHT_INFO_FIELDS = {
+    "flight_iata": ("flight", "iata"),
+    "airline": ("airline", "name"),
+    "departure_airport": ("departure", "iata"),
+    "departure_lat": ("departure", "latitude"),
+    "departure_lon": ("departure", "longitude"),
+    "departure_scheduled": ("departure", "scheduled"),
+    "departure_estimated": ("departure", "estimated"),
+    "departure_actual": ("departure", "actual"),
+    "arrival_airport": ("arrival", "iata"),
+    "arrival_lat": ("arrival", "latitude"),
+    "arrival_lon": ("arrival", "longitude"),
+    "arrival_scheduled": ("arrival", "scheduled"),
+    "arrival_estimated": ("arrival", "estimated"),
+    "arrival_actual": ("arrival", "actual"),
+    "current_lat": ("live", "latitude"),
+    "current_lon": ("live", "longitude"),
+    "altitude": ("live", "altitude"),
+    "speed": ("live", "speed_horizontal"),
 }
 
-def get_flight_data(flight_number):
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling AviationStack while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the upstream provider is down
+    
+    After `failure_threshold` consecutive failures the breaker opens and
+    rejects calls for `reset_timeout` seconds. It then lets a single trial
+    call through (half-open); success closes it again, failure re-opens it.
+    """
+    
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+    
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+    
+    def before_call(self):
+        """
+        Check that a call may go ahead
+        
+        Returns:
+            bool: True if this call is the half-open trial
+        
+        Raises:
+            CircuitOpenError: While the breaker is open
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_progress:
+                raise CircuitOpenError("AviationStack circuit breaker is open; upstream is unavailable")
+            self._trial_in_progress = True
+            return True
+    
+    def end_trial(self):
+        """Let another trial call through if the current one ended without a success or failure"""
+        with self._lock:
+            self._trial_in_progress = False
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_progress or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_progress:
+                    logger.warning(f"Opening AviationStack circuit breaker after {self._failures} failures")
+                self._opened_at = time.monotonic()
+            self._trial_in_progress = False
+
+
+class AviationStackClient:
+    """
+    HTTP client for the AviationStack API
+    
+    Uses one keep-alive, connection-pooled session for all requests, with
+    connect/read timeouts, jittered exponential backoff on 429/5xx (honoring
+    Retry-After), a circuit breaker and per-attempt latency histograms.
+    """
+    
+    def __init__(self, base_url=None, api_key=None, max_retries=MAX_RETRIES):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyHistogram()
+        self._counters_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+    
+    def get(self, endpoint, params, priority=PRIORITY_USER):
+        """
+        GET an API endpoint, retrying transient failures
+        
+        Args:
+            endpoint (str): Endpoint path relative to the base URL, e.g. "flights"
+            params (dict): Query parameters (the access key is added automatically)
+            priority (int): Quota priority of the request (quota.PRIORITY_*)
+            
+        Returns:
+            requests.Response: The final response, which may still be an error status
+            
+        Raises:
+            requests.exceptions.RequestException: On connection failures, timeouts,
+            while the circuit breaker is open, or (QuotaExceededError) when the
+            request budget doesn't allow the call
+        """
+        quota = get_quota()
+        if not quota.acquire(priority):
+            raise QuotaExceededError(QUOTA_ERROR)
+        try:
+            trial = self.breaker.before_call()
+        except CircuitOpenError:
+            quota.refund()
+            raise
+        
+        url = f"{self.base_url or BASE_URL}/{endpoint}"
+        params = {"access_key": self.api_key or API_KEY, **params}
+        
+        try:
+            for attempt in range(self.max_retries + 1):
+                self._count("requests")
+                started = time.perf_counter()
+                try:
+                    response = self.session.get(url, params=params, timeout=(CONNECT_TIMEOUT, REQUEST_TIMEOUT))
+                except requests.exceptions.ConnectionError:
+                    self.latency.observe(time.perf_counter() - started)
+                    # The request never reached upstream, so it doesn't count
+                    quota.refund()
+                    if attempt < self.max_retries and quota.acquire(priority):
+                        self._backoff(self._backoff_delay(attempt))
+                        continue
+                    self._fail()
+                    raise
+                except requests.exceptions.RequestException:
+                    # Read timeouts are not retried: a hung upstream would just hang again
+                    self.latency.observe(time.perf_counter() - started)
+                    self._fail()
+                    raise
+                self.latency.observe(time.perf_counter() - started)
+                
+                if response.status_code in RETRY_STATUSES:
+                    delay = self._retry_after(response)
+                    if delay is None:
+                        delay = self._backoff_delay(attempt)
+                    # Retries spend quota too, so they wait their turn like any other request
+                    if attempt < self.max_retries and delay <= BACKOFF_MAX and quota.acquire(priority):
+                        logger.warning(f"AviationStack returned {response.status_code}, retrying in {delay:.2f}s")
+                        self._backoff(delay)
+                        continue
+                    self._fail()
+                    return response
+                
+                self.breaker.record_success()
+                return response
+        finally:
+            if trial:
+                # A trial that ended some other way (not a response or a
+                # RequestException) mustn't keep the breaker shut for good
+                self.breaker.end_trial()
+    
+    def stats(self):
+        with self._counters_lock:
+            counters = {"requests": self.requests, "retries": self.retries, "failures": self.failures}
+        return {**counters, "circuit": self.breaker.state, "latency": self.latency.snapshot()}
+    
+    def _count(self, name):
+        with self._counters_lock:
+            setattr(self, name, getattr(self, name) + 1)
+    
+    def _fail(self):
+        self._count("failures")
+        self.breaker.record_failure()
+    
+    def _backoff(self, delay):
+        self._count("retries")
+        time.sleep(delay)
+    
+    @staticmethod
+    def _backoff_delay(attempt):
+        # "Full jitter": uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+    
+    @staticmethod
+    def _retry_after(response):
+        """Parse a Retry-After header (seconds or HTTP date) into seconds"""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide AviationStack client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AviationStackClient()
+    return _client
+
+
+class _Call:
+    """An in-progress upstream lookup that other callers can wait on"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into a single call
+    
+    The first caller for a key runs the function; callers arriving while it
+    is still running wait for it and receive the same result.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+    
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+        
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return dict(call.result)
+        
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+_single_flight = SingleFlight()
+
+
+@contextmanager
+def _shared_lookup_lock(cache, cache_key):
+    """Hold the cross-worker lookup lock for a flight, if one is configured"""
+    lock = cache.lock(cache_key, timeout=REQUEST_TIMEOUT * 2) if SINGLE_FLIGHT_SHARED else None
+    acquired = False
+    if lock is not None:
+        try:
+            acquired = lock.acquire()
+        except Exception as e:
+            # Never block a lookup because the lock store is unavailable
+            logger.error(f"Could not acquire shared lookup lock for {cache_key}: {str(e)}")
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except Exception as e:
+                logger.error(f"Could not release shared lookup lock for {cache_key}: {str(e)}")
+
+
+@timed_lookup
+def get_flight_data(flight_number, use_cache=True, priority=PRIORITY_USER):
+    """
+    Fetch flight data, serving recent results from the flight cache
+    
+    When the request budget doesn't allow an upstream call, the last data
+    cached for the flight is returned instead, marked with "stale": True.
+    
+    Args:
+        flight_number (str): The flight number to look up
+        use_cache (bool): Whether to read from the cache before calling the API
+        priority (int): Quota priority of the lookup (quota.PRIORITY_*)
+        
+    Returns:
+        dict: Flight information or error message
+    """
+    cache_key = normalize_flight_number(flight_number)
+    cache = get_cache()
+    
+    if use_cache:
+        try:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            logger.error(f"Flight cache read failed for {cache_key}: {str(e)}")
+    
+    def load():
+        with _shared_lookup_lock(cache, cache_key) as locked:
+            # Another worker may have fetched this flight while we waited for the lock
+            if locked and use_cache:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
+            flight_data = _fetch_flight_data(cache_key, priority)
+            if flight_data.get("error") == QUOTA_ERROR:
+                return _stale_flight_data(cache, cache_key) or flight_data
+            
+            ttl = ttl_for(flight_data)
+            if ttl:
+                try:
+                    cache.set(cache_key, flight_data, ttl)
+                except Exception as e:
+                    logger.error(f"Flight cache write failed for {cache_key}: {str(e)}")
+            
+            return flight_data
+    
+    # Concurrent lookups of the same flight share a single upstream request
+    return _single_flight.do(cache_key, load)
+
+def _stale_flight_data(cache, cache_key):
+    """The last cached data for a flight, marked stale, or None"""
+    try:
+        stale = cache.get_stale(cache_key)
+    except Exception as e:
+        logger.error(f"Flight cache read failed for {cache_key}: {str(e)}")
+        return None
+    if stale is None:
+        return None
+    logger.info(f"Request budget exhausted, serving stale data for {cache_key}")
+    return {**stale, "stale": True}
+
+def _fetch_flight_data(flight_number, priority=PRIORITY_USER):
     """
     Fetch flight data from AviationStack API
     
     Args:
         flight_number (str): The flight number to look up
+        priority (int): Quota priority of the request
         
     Returns:
         dict: Flight information or error message
     """
     try:
         # Make API request
-        response = requests.get(
-            f"{BASE_URL}/flights",
-            params={
-                "access_key": API_KEY,
-                "flight_iata": flight_number
-            }
-        )
+        response = get_client().get("flights", {"flight_iata": flight_number}, priority)
         
         # Check if request was successful
         if response.status_code != 200:
@@ -133,7 +466,7 @@ def get_flight_data(flight_number):
             return {"error": f"API request failed with status code {response.status_code}"}
         
         # Parse response
-        data = response.json()
+        data = decode_response(response)
         
         # Check for API errors
         if "error" in data:
@@ -145,111 +478,405 @@ def get_flight_data(flight_number):
         if not data.get("data") or len(data["data"]) == 0:
             return {"error": "Flight not found"}
         
+        # Use the first result
+        return format_flight_info(data["data"][0], flight_number)
+        
+    except QuotaExceededError:
+        return {"error": QUOTA_ERROR}
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Request error: {str(e)}")
+        return {"error": f"Request error: {str(e)}"}
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        return {"error": f"Unexpected error: {str(e)}"}
+
+def decode_response(response):
+    """Parse an AviationStack response body, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+def compile_fields(fields):
+    """
+    Group a name -> (section, key) field spec by section
+    
+    Args:
+        fields (dict): Field spec such as FLIGHT_INFO_FIELDS
+        
+    Returns:
+        tuple: (section, ((name, key), ...)) pairs for extract_fields
+    """
+    sections = {}
+    for name, (section, key) in fields.items():
+        sections.setdefault(section, []).append((name, key))
+    return tuple((section, tuple(keys)) for section, keys in sections.items())
+
+_FLIGHT_INFO_PLAN = compile_fields(FLIGHT_INFO_FIELDS)
+
+def extract_fields(record, plan=_FLIGHT_INFO_PLAN):
+    """
+    Read the nested fields of an API record in one pass
+    
+    Missing sections, sections that aren't objects (e.g. "live": null) and
+    missing keys all come out as None.
+    
+    Args:
+        record (dict): A single entry from the API's "data" list
+        plan (tuple): Compiled field spec from compile_fields
+        
+    Returns:
+        dict: Field name -> value
+    """
+    values = {}
+    for section, keys in plan:
+        obj = record.get(section)
+        if isinstance(obj, dict):
+            for name, key in keys:
+                values[name] = obj.get(key)
+        else:
+            for name, _ in keys:
+                values[name] = None
+    return values
+
+def _debug_record(flight_info):
+    """Log a sample of raw flight records, formatting them only when DEBUG logging is on"""
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < DEBUG_SAMPLE_RATE:
+        logger.debug(f"Flight info: {flight_info}")
+
+def format_flight_info(flight_info, flight_number):
+    """
+    Convert one AviationStack flight record into our flight data format
+    
+    Args:
+        flight_info (dict): A single entry from the API's "data" list
+        flight_number (str): The flight number that was looked up
+        
+    Returns:
+        dict: Flight information or error message
+    """
+    try:
         # For debugging
-        logger.debug(f"API response data: {data}")
+        _debug_record(flight_info)
         
-        try:
-            # Extract flight information from the first result
-            flight_info = data["data"][0]
-            
-            # For debugging
-            logger.debug(f"Flight info: {flight_info}")
-            
-            # Safely get nested values
-            def safe_get(obj, *keys):
-                try:
-                    for key in keys:
-                        if obj is None:
-                            return None
-                        obj = obj.get(key)
-                    return obj
-                except (AttributeError, KeyError, TypeError):
-                    return None
-            
-            # Get airport codes
-            departure_airport = safe_get(flight_info, "departure", "iata")
-            arrival_airport = safe_get(flight_info, "arrival", "iata")
-            
-            # Get coordinates from our lookup table if API doesn't provide them
-            departure_lat = safe_get(flight_info, "departure", "latitude")
-            departure_lon = safe_get(flight_info, "departure", "longitude")
-            arrival_lat = safe_get(flight_info, "arrival", "latitude")
-            arrival_lon = safe_get(flight_info, "arrival", "longitude")
-            
-            # If coordinates are missing, try to get them from our lookup table
-            if not departure_lat and not departure_lon and departure_airport in AIRPORT_COORDINATES:
-                departure_lat, departure_lon = AIRPORT_COORDINATES[departure_airport]
-                logger.info(f"Using lookup table coordinates for {departure_airport}: {departure_lat}, {departure_lon}")
-                
-            if not arrival_lat and not arrival_lon and arrival_airport in AIRPORT_COORDINATES:
-                arrival_lat, arrival_lon = AIRPORT_COORDINATES[arrival_airport]
-                logger.info(f"Using lookup table coordinates for {arrival_airport}: {arrival_lat}, {arrival_lon}")
-            
-            # Get current position (if available)
-            current_lat = safe_get(flight_info, "live", "latitude")
-            current_lon = safe_get(flight_info, "live", "longitude")
-            
-            # If we don't have current position but we have both airports,
-            # we can estimate a position along the route based on flight status
-            if not current_lat and not current_lon and departure_lat and departure_lon and arrival_lat and arrival_lon:
-                status = flight_info.get("flight_status", "").lower()
-                
-                if status == "scheduled":
-                    # Not departed yet, use departure airport
-                    current_lat, current_lon = departure_lat, departure_lon
-                elif status == "landed" or status == "arrived":
-                    # Already arrived, use arrival airport
-                    current_lat, current_lon = arrival_lat, arrival_lon
-                elif status == "active" or status == "en-route":
-                    # In flight, estimate position halfway between airports
-                    current_lat = (departure_lat + arrival_lat) / 2
-                    current_lon = (departure_lon + arrival_lon) / 2
-            
-            # Format the return data
-            formatted_data = {
-                "flight_number": safe_get(flight_info, "flight", "iata") or flight_number,
-                "airline": safe_get(flight_info, "airline", "name"),
-                "departure_airport": departure_airport,
-                "arrival_airport": arrival_airport,
-                "scheduled_departure": format_date(safe_get(flight_info, "departure", "scheduled")),
-                "scheduled_arrival": format_date(safe_get(flight_info, "arrival", "scheduled")),
-                "actual_departure": format_date(safe_get(flight_info, "departure", "actual")),
-                "actual_arrival": format_date(safe_get(flight_info, "arrival", "actual")),
-                "status": flight_info.get("flight_status"),
-                "departure_lat": departure_lat,
-                "departure_lon": departure_lon,
-                "arrival_lat": arrival_lat,
-                "arrival_lon": arrival_lon,
-                "current_lat": current_lat,
-                "current_lon": current_lon, 
-                "altitude": safe_get(flight_info, "live", "altitude"),
-                "speed": safe_get(flight_info, "live", "speed_horizontal")
-            }
+        fields = extract_fields(flight_info)
+        
+        # Get airport codes
+        departure_airport = fields["departure_airport"]
+        arrival_airport = fields["arrival_airport"]
+        
+        # Get coordinates from the airport database if API doesn't provide them
+        departure_lat = fields["departure_lat"]
+        departure_lon = fields["departure_lon"]
+        arrival_lat = fields["arrival_lat"]
+        arrival_lon = fields["arrival_lon"]
+        
+        # If coordinates are missing, try to get them from the airport database
+        if not departure_lat and not departure_lon:
+            coordinates = get_airports().coordinates(departure_airport)
+            if coordinates:
+                departure_lat, departure_lon = coordinates
+                logger.debug(f"Using airport database coordinates for {departure_airport}: {departure_lat}, {departure_lon}")
             
-            # Check if we got any meaningful data
-            has_data = any([
-                formatted_data["airline"],
-                formatted_data["departure_airport"],
-                formatted_data["arrival_airport"],
-                formatted_data["scheduled_departure"],
-                formatted_data["scheduled_arrival"],
-                formatted_data["status"]
-            ])
+        if not arrival_lat and not arrival_lon:
+            coordinates = get_airports().coordinates(arrival_airport)
+            if coordinates:
+                arrival_lat, arrival_lon = coordinates
+                logger.debug(f"Using airport database coordinates for {arrival_airport}: {arrival_lat}, {arrival_lon}")
+        
+        # Get current position (if available)
+        current_lat = fields["current_lat"]
+        current_lon = fields["current_lon"]
+        position_source = "live" if current_lat and current_lon else None
+        
+        # If we don't have current position but we have both airports,
+        # we can estimate a position along the route based on flight status
+        if not current_lat and not current_lon and departure_lat and departure_lon and arrival_lat and arrival_lon:
+            status = (flight_info.get("flight_status") or "").lower()
             
-            if not has_data:
-                return {"error": "No flight data available for this flight number"}
+            if status == "scheduled":
+                # Not departed yet, use departure airport
+                current_lat, current_lon = departure_lat, departure_lon
+            elif status == "landed" or status == "arrived":
+                # Already arrived, use arrival airport
+                current_lat, current_lon = arrival_lat, arrival_lon
+            elif status in AIRBORNE_STATUSES:
+                # In flight, estimate how far along the great-circle route it is by now
+                departure_time, arrival_time = route_times(
+                    fields["departure_scheduled"],
+                    fields["departure_actual"] or fields["departure_estimated"],
+                    fields["arrival_scheduled"],
+                    fields["arrival_actual"] or fields["arrival_estimated"]
+                )
+                current_lat, current_lon = estimate_position(
+                    departure_lat, departure_lon, arrival_lat, arrival_lon, departure_time, arrival_time
+                )
+                if current_lat is None:
+                    # No usable times: fall back to the middle of the route
+                    current_lat, current_lon = (float(value) for value in interpolate_great_circle(
+                        departure_lat, departure_lon, arrival_lat, arrival_lon, 0.5
+                    ))
+            if current_lat and current_lon:
+                position_source = "estimated"
+        
+        # Format the return data
+        formatted_data = {
+            "flight_number": fields["flight_iata"] or flight_number,
+            "airline": fields["airline"],
+            "departure_airport": departure_airport,
+            "arrival_airport": arrival_airport,
+            "scheduled_departure": format_date(fields["departure_scheduled"]),
+            "scheduled_arrival": format_date(fields["arrival_scheduled"]),
+            "actual_departure": format_date(fields["departure_actual"]),
+            "actual_arrival": format_date(fields["arrival_actual"]),
+            "status": flight_info.get("flight_status"),
+            "departure_lat": departure_lat,
+            "departure_lon": departure_lon,
+            "arrival_lat": arrival_lat,
+            "arrival_lon": arrival_lon,
+            "current_lat": current_lat,
+            "current_lon": current_lon, 
+            "position_source": position_source,
+            "altitude": fields["altitude"],
+            "speed": fields["speed"]
+        }
+        
+        # Check if we got any meaningful data
+        has_data = any([
+            formatted_data["airline"],
+            formatted_data["departure_airport"],
+            formatted_data["arrival_airport"],
+            formatted_data["scheduled_departure"],
+            formatted_data["scheduled_arrival"],
+            formatted_data["status"]
+        ])
+        
+        if not has_data:
+            return {"error": "No flight data available for this flight number"}
+    except Exception as e:
+        logger.error(f"Error processing flight data: {str(e)}")
+        return {"error": f"Error processing flight data: {str(e)}"}
+    
+    return formatted_data
+
+def _run_concurrently(fn, items, max_workers, deadline):
+    """
+    Call fn(item) for each item on a bounded thread pool
+    
+    Returns:
+        tuple: (dict of item -> result for calls that finished, list of items
+        that were still running when the deadline expired)
+    """
+    executor = ThreadPoolExecutor(
+        max_workers=min(max_workers, len(items)),
+        thread_name_prefix="flight-refresh"
+    )
+    try:
+        futures = {executor.submit(fn, item): item for item in items}
+        done, not_done = wait(futures, timeout=deadline)
+    finally:
+        # Don't block on stragglers; they finish (or time out) in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    results = {}
+    for future in done:
+        item = futures[future]
+        try:
+            results[item] = future.result()
         except Exception as e:
-            logger.error(f"Error processing flight data: {str(e)}")
-            return {"error": f"Error processing flight data: {str(e)}"}
+            logger.error(f"Unexpected error fetching {item}: {str(e)}")
+            results[item] = {"error": f"Unexpected error: {str(e)}"}
+    
+    return results, [futures[future] for future in not_done]
+
+def fetch_flights_concurrently(flight_numbers, max_workers=None, deadline=None, priorities=None):
+    """
+    Fetch data for several flights from AviationStack in parallel
+    
+    Lookups run on a bounded thread pool. Any lookup that has not finished
+    when the deadline expires is reported as timed out, so callers always
+    get back whatever results arrived in time.
+    
+    Args:
+        flight_numbers (list): The flight numbers to look up
+        max_workers (int): Maximum number of concurrent upstream requests
+        deadline (float): Seconds to wait for all lookups to finish
+        priorities (dict): Optional flight number -> quota priority; flights not
+            listed are fetched at background priority
         
-        return formatted_data
+    Returns:
+        dict: Flight number -> flight information or error message
+    """
+    flight_numbers = list(dict.fromkeys(flight_numbers))
+    if not flight_numbers:
+        return {}
+    priorities = priorities or {}
+    
+    deadline = deadline if deadline is not None else REFRESH_DEADLINE
+    results, timed_out = _run_concurrently(
+        lambda flight_number: get_flight_data(
+            flight_number, priority=priorities.get(flight_number, PRIORITY_BACKGROUND)
+        ),
+        flight_numbers, max_workers or REFRESH_MAX_WORKERS, deadline
+    )
+    
+    for flight_number in timed_out:
+        logger.warning(f"Lookup for {flight_number} did not finish within {deadline}s")
+        results[flight_number] = {"error": TIMEOUT_ERROR}
+    
+    return results
+
+@timed_lookup
+def get_flights_data(flight_numbers, departure_airports=None, deadline=None, priorities=None):
+    """
+    Fetch data for several flights using as few upstream requests as possible
+    
+    Flights are grouped by airline (and departure airport, when known) and
+    each group is fetched with one filtered, paginated /flights query.
+    Groups too small to be worth a batch query, and flights a batch query
+    did not turn up, fall back to individual lookups. Lookups are queued for
+    the request budget by priority; a batch query runs at the priority of
+    its most urgent flight.
+    
+    Args:
+        flight_numbers (list): The flight numbers to look up
+        departure_airports (dict): Optional flight number -> departure IATA code,
+            used to narrow batch queries
+        deadline (float): Seconds to wait for all lookups to finish
+        priorities (dict): Optional flight number -> quota priority (quota.PRIORITY_*);
+            flights not listed are fetched at background priority
         
+    Returns:
+        dict: Flight number (as passed in) -> flight information or error message
+    """
+    departure_airports = departure_airports or {}
+    priorities = priorities or {}
+    deadline = deadline if deadline is not None else REFRESH_DEADLINE
+    started = time.monotonic()
+    
+    requested = {}
+    key_priorities = {}
+    for flight_number in flight_numbers:
+        cache_key = normalize_flight_number(flight_number)
+        requested.setdefault(cache_key, flight_number)
+        key_priorities[cache_key] = min(
+            priorities.get(flight_number, PRIORITY_BACKGROUND),
+            key_priorities.get(cache_key, PRIORITY_BACKGROUND)
+        )
+    
+    cache = get_cache()
+    found = {}
+    groups = {}
+    fallback = []
+    for cache_key, flight_number in requested.items():
+        try:
+            cached = cache.get(cache_key)
+        except Exception as e:
+            logger.error(f"Flight cache read failed for {cache_key}: {str(e)}")
+            cached = None
+        if cached is not None:
+            found[cache_key] = cached
+            continue
+        
+        match = FLIGHT_IATA_PATTERN.match(cache_key)
+        if not match:
+            fallback.append(cache_key)
+            continue
+        departure = (departure_airports.get(flight_number) or "").upper() or None
+        groups.setdefault((match.group(1), departure), []).append(cache_key)
+    
+    batches = {}
+    for group, members in groups.items():
+        # An airline-wide query may page through BATCH_MAX_PAGES pages, so it
+        # only pays off for groups larger than that
+        threshold = BATCH_MIN_GROUP if group[1] else BATCH_MAX_PAGES + 1
+        if len(members) >= threshold:
+            batches[group] = members
+        else:
+            fallback.extend(members)
+    
+    if batches:
+        batch_results, timed_out = _run_concurrently(
+            lambda group: _fetch_flight_batch(
+                group[0], group[1], set(batches[group]),
+                min(key_priorities[cache_key] for cache_key in batches[group])
+            ),
+            list(batches), REFRESH_MAX_WORKERS, deadline
+        )
+        for group in timed_out:
+            logger.warning(f"Batch lookup for {group} did not finish within {deadline}s")
+        
+        for group, members in batches.items():
+            group_results = batch_results.get(group, {})
+            if "error" in group_results:
+                group_results = {}
+            for cache_key in members:
+                if cache_key in group_results:
+                    found[cache_key] = group_results[cache_key]
+                    ttl = ttl_for(group_results[cache_key])
+                    if ttl:
+                        try:
+                            cache.set(cache_key, group_results[cache_key], ttl)
+                        except Exception as e:
+                            logger.error(f"Flight cache write failed for {cache_key}: {str(e)}")
+                else:
+                    fallback.append(cache_key)
+    
+    if fallback:
+        remaining = max(deadline - (time.monotonic() - started), 0)
+        found.update(fetch_flights_concurrently(fallback, deadline=remaining, priorities=key_priorities))
+    
+    return {flight_number: found[cache_key] for cache_key, flight_number in requested.items()}
+
+def _fetch_flight_batch(airline_iata, departure_iata, wanted, priority=PRIORITY_BACKGROUND):
+    """
+    Fetch several flights of one airline with a paginated /flights query
+    
+    Args:
+        airline_iata (str): Airline IATA code to filter on
+        departure_iata (str): Optional departure airport IATA code to filter on
+        wanted (set): Normalized flight numbers we are looking for
+        priority (int): Quota priority of the requests
+        
+    Returns:
+        dict: Flight number -> flight information for the flights found, or an
+        error message if the query failed
+    """
+    params = {
+        "airline_iata": airline_iata,
+        "limit": BATCH_PAGE_LIMIT,
+        "offset": 0
+    }
+    if departure_iata:
+        params["dep_iata"] = departure_iata
+    
+    found = {}
+    try:
+        for _ in range(BATCH_MAX_PAGES):
+            response = get_client().get("flights", params, priority)
+            if response.status_code != 200:
+                logger.error(f"Batch request failed with status code {response.status_code}: {response.text}")
+                return {"error": f"API request failed with status code {response.status_code}"}
+            
+            data = decode_response(response)
+            if "error" in data:
+                logger.error(f"API returned an error: {data['error']}")
+                return {"error": f"API error: {data['error'].get('message', 'Unknown error')}"}
+            
+            for flight_info in data.get("data") or []:
+                flight_iata = normalize_flight_number((flight_info.get("flight") or {}).get("iata"))
+                # Keep the first record per flight, like single lookups do
+                if flight_iata in wanted and flight_iata not in found:
+                    found[flight_iata] = format_flight_info(flight_info, flight_iata)
+            
+            pagination = data.get("pagination") or {}
+            params["offset"] += BATCH_PAGE_LIMIT
+            if len(found) == len(wanted) or params["offset"] >= pagination.get("total", 0):
+                break
     except requests.exceptions.RequestException as e:
-        logger.error(f"Request error: {str(e)}")
+        logger.error(f"Batch request error: {str(e)}")
         return {"error": f"Request error: {str(e)}"}
-    except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
-        return {"error": f"Unexpected error: {str(e)}"}
+    
+    return found
 
 def format_date(date_str):
     """Format date string to ISO format"""
@@ -257,10 +884,14 @@ def format_date(date_str):
         return None
     
     try:
-        # Parse the date string
-        dt = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S%z")
-        # Format as ISO 8601
-        return dt.isoformat()
-    except Exception as e:
+        # Parse the date string (fromisoformat is much faster than strptime)
+        dt = datetime.fromisoformat(date_str)
+    except (TypeError, ValueError) as e:
         logger.error(f"Error formatting date {date_str}: {str(e)}")
         return None
+    
+    # Timestamps without an offset are taken to be UTC, like geo.to_timestamp does
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    # Format as ISO 8601
+    return dt.isoformat()
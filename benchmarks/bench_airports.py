@@ -0,0 +1,84 @@
+"""
+Time the bundled airport database and check its spatial index
+
+Measures the lazy load, code lookups, nearest-airport and bounding-box
+queries, and compares the grid index against a linear scan of every airport.
+Nearest and bounding-box results are checked against the linear scan (the
+script exits non-zero on any mismatch).
+
+Usage: python -m benchmarks.bench_airports [--queries 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from airports import AirportDatabase, _distance_km  # noqa: E402
+
+
+def timed(fn, items):
+    start = time.perf_counter()
+    results = [fn(*item) for item in items]
+    return results, (time.perf_counter() - start) * 1e6 / len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Airport database benchmark")
+    parser.add_argument("--queries", type=int, default=2000, help="queries per measurement")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    start = time.perf_counter()
+    database = AirportDatabase.load()
+    print(f"loaded {len(database)} airports in {(time.perf_counter() - start) * 1000:.0f} ms")
+    airports = [airport for cell in database._grid.values() for airport in cell]
+
+    codes = [(airport.iata or airport.icao,) for airport in rng.sample(airports, args.queries)]
+    _, per_lookup = timed(database.get, codes)
+
+    # Points near real airports (the common case: flights and map views)
+    points = [
+        (airport.lat + rng.uniform(-1, 1), airport.lon + rng.uniform(-1, 1))
+        for airport in rng.sample(airports, args.queries)
+    ]
+    nearest, per_nearest = timed(lambda lat, lon: database.nearest(lat, lon)[1], points)
+    scan_points = points[:max(1, args.queries // 20)]
+    expected, per_nearest_scan = timed(
+        lambda lat, lon: min(_distance_km(lat, lon, a.lat, a.lon) for a in airports), scan_points
+    )
+    nearest_ok = all(abs(a - b) < 1e-9 for a, b in zip(nearest, expected))
+
+    boxes = []
+    for lat, lon in points:
+        size = rng.uniform(0.5, 5)
+        boxes.append((lat - size, lon - size, lat + size, lon + size))
+    # Include boxes that wrap across the antimeridian
+    boxes[:10] = [(lat - 5, 175 + i * 0.1, lat + 5, -175 + i * 0.1) for i, lat in enumerate(range(-50, 50, 10))]
+    found, per_bbox = timed(database.in_bbox, boxes)
+
+    def scan_bbox(south, west, north, east):
+        wraps = west > east
+        return [
+            a for a in airports
+            if south <= a.lat <= north and ((a.lon >= west or a.lon <= east) if wraps else west <= a.lon <= east)
+        ]
+
+    scan_boxes = boxes[:max(10, args.queries // 20)]
+    expected, per_bbox_scan = timed(scan_bbox, scan_boxes)
+    bbox_ok = all(
+        sorted(a.icao for a in got) == sorted(a.icao for a in want) for got, want in zip(found, expected)
+    )
+
+    print(f"{'query':>8} {'index (us)':>11} {'scan (us)':>10} {'speedup':>8} {'matches scan':>13}")
+    print(f"{'code':>8} {per_lookup:>11.2f} {'-':>10} {'-':>8} {'-':>13}")
+    print(f"{'nearest':>8} {per_nearest:>11.1f} {per_nearest_scan:>10.1f} {per_nearest_scan / per_nearest:>7.0f}x {str(nearest_ok):>13}")
+    print(f"{'bbox':>8} {per_bbox:>11.1f} {per_bbox_scan:>10.1f} {per_bbox_scan / per_bbox:>7.0f}x {str(bbox_ok):>13}")
+    if not (nearest_ok and bbox_ok):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
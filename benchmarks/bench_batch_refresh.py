@@ -0,0 +1,63 @@
+"""
+Compare upstream request counts for per-flight vs batched refreshes
+
+Tracks N flights spread over a few airlines against the local AviationStack
+stub and counts the upstream requests made by fetch_flights_concurrently
+(one request per flight) and get_flights_data (one request per page of each
+airline/departure-airport group).
+
+Usage: python -m benchmarks.bench_batch_refresh [--latency 0.05]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_aviationstack import make_flight, start_stub_server  # noqa: E402
+
+FLIGHT_COUNTS = [10, 50, 100, 250]
+AIRLINES = ["BA", "DL", "UA"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-flight vs batched refresh benchmark")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub response latency (s)")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency)
+
+    import aviation_api
+    from flight_cache import get_cache
+    aviation_api.BASE_URL = server.base_url
+    cache = get_cache()
+
+    print(f"stub latency={args.latency}s fleet={server.fleet_size} flights/airline")
+    print(f"{'flights':>8} {'per-flight calls':>17} {'batched calls':>14} {'per-flight (s)':>15} {'batched (s)':>12}")
+    for count in FLIGHT_COUNTS:
+        flight_numbers = [f"{AIRLINES[i % len(AIRLINES)]}{i // len(AIRLINES) + 1}" for i in range(count)]
+        departure_airports = {
+            flight_number: make_flight(flight_number)["departure"]["iata"] for flight_number in flight_numbers
+        }
+
+        cache.clear()
+        server.calls = 0
+        start = time.perf_counter()
+        aviation_api.fetch_flights_concurrently(flight_numbers)
+        single_time, single_calls = time.perf_counter() - start, server.calls
+
+        cache.clear()
+        server.calls = 0
+        start = time.perf_counter()
+        results = aviation_api.get_flights_data(flight_numbers, departure_airports)
+        batch_time, batch_calls = time.perf_counter() - start, server.calls
+        assert all("error" not in result for result in results.values())
+
+        print(f"{count:>8} {single_calls:>17} {batch_calls:>14} {single_time:>15.3f} {batch_time:>12.3f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compare full flight list polls with change feed (?since=) polls
+
+Fills one watchlist with N flights, then times GET /api/flights/details
+with no cursor (the whole list) and with ?since=<version> when nothing
+changed, when a few flights changed and after a flight was removed, and
+reports the payload size of each. Also checks that each delta holds exactly
+the changed flights and tombstones (the script exits non-zero if not).
+
+Uses DATABASE_URL if set, otherwise a temporary SQLite file.
+
+Usage: python -m benchmarks.bench_change_feed [--flights 50] [--repeat 50]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ["FLIGHT_SCHEDULER_ENABLED"] = "false"
+os.environ.setdefault("WATCHLIST_MAX_FLIGHTS", "1000")
+
+
+def poll(client, url, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url)
+    elapsed = (time.perf_counter() - start) / repeat
+    return response.get_json(), len(response.get_data()), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Change feed poll benchmark")
+    parser.add_argument("--flights", type=int, default=50, help="flights on the watchlist")
+    parser.add_argument("--repeat", type=int, default=50, help="polls per measurement")
+    args = parser.parse_args()
+
+    from main import app
+    from app import db, init_db
+    from models import Flight, SavedFlight, upsert_flights
+    from events import record_flight_event, record_flight_events
+    logging.disable(logging.CRITICAL)
+    with app.app_context():
+        init_db()
+
+    client = app.test_client()
+    client.get("/api/flights")
+    with client.session_transaction() as session:
+        owner_id = session["owner_id"]
+
+    flight_numbers = [f"CF{i}" for i in range(args.flights)]
+    with app.app_context():
+        db.session.execute(Flight.__table__.insert(), [
+            {"flight_number": flight_number, "airline": "Bench Air", "status": "scheduled",
+             "departure_airport": "LHR", "arrival_airport": "JFK", "departure_lat": 51.47,
+             "departure_lon": -0.4543, "arrival_lat": 40.6413, "arrival_lon": -73.7781,
+             "current_lat": 51.47, "current_lon": -0.4543, "position_source": "estimated"}
+            for flight_number in flight_numbers
+        ])
+        db.session.add_all(SavedFlight(owner_id=owner_id, flight_number=flight_number) for flight_number in flight_numbers)
+        record_flight_events(flight_numbers, "add", owner_id)
+        db.session.commit()
+
+    def change(numbers):
+        with app.app_context():
+            changed = upsert_flights({
+                flight_number: {**Flight.query.filter_by(flight_number=flight_number).first().to_dict(),
+                                "status": "active", "speed": float(time.perf_counter_ns() % 1000),
+                                "scheduled_departure": None, "scheduled_arrival": None,
+                                "actual_departure": None, "actual_arrival": None}
+                for flight_number in numbers
+            })
+            record_flight_events(changed)
+            db.session.commit()
+
+    def remove(flight_number):
+        with app.app_context():
+            SavedFlight.query.filter_by(owner_id=owner_id, flight_number=flight_number).delete()
+            record_flight_event(flight_number, "remove", owner_id)
+            db.session.commit()
+
+    passed = True
+    print(f"{args.flights} flights on the watchlist, {args.repeat} polls each")
+    print(f"{'poll':>22} {'flights':>8} {'removed':>8} {'payload (B)':>12} {'time (ms)':>10}")
+
+    def report(label, data, size, elapsed, expected_flights, expected_removed):
+        nonlocal passed
+        flights = sorted(flight["flight_number"] for flight in data["flights"])
+        removed = sorted(data.get("removed", []))
+        ok = flights == sorted(expected_flights) and removed == sorted(expected_removed)
+        passed = passed and ok
+        print(f"{label:>22} {len(flights):>8} {len(removed):>8} {size:>12} {elapsed * 1000:>10.2f}"
+              f"{'' if ok else '  MISMATCH'}")
+
+    data, size, elapsed = poll(client, "/api/flights/details", args.repeat)
+    report("full list", data, size, elapsed, flight_numbers, [])
+    version = data["version"]
+
+    data, size, elapsed = poll(client, f"/api/flights/details?since={version}", args.repeat)
+    report("since, no change", data, size, elapsed, [], [])
+
+    for count in (1, 5):
+        changed = flight_numbers[:count]
+        change(changed)
+        data, size, elapsed = poll(client, f"/api/flights/details?since={version}", args.repeat)
+        report(f"since, {count} changed", data, size, elapsed, changed, [])
+        version = data["version"]
+
+    remove(flight_numbers[-1])
+    data, size, elapsed = poll(client, f"/api/flights/details?since={version}", args.repeat)
+    report("since, 1 removed", data, size, elapsed, [], [flight_numbers[-1]])
+
+    with app.app_context():
+        plan = db.session.execute(db.text(
+            ("EXPLAIN QUERY PLAN " if db.engine.dialect.name == "sqlite" else "EXPLAIN ")
+            + "SELECT flight_number FROM flight WHERE version > :version"
+        ), {"version": version}).all()
+    print("changed flights query plan:", " / ".join(str(row[-1]) for row in plan))
+
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
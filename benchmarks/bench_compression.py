@@ -0,0 +1,80 @@
+"""
+Measure bytes on the wire for flight list polls and the tracker page
+
+Encodes flight lists of 10 to 1000 flights (records and columnar JSON) and
+the page with its script and stylesheet, then reports the size and
+compression time with no encoding, gzip and brotli (if installed) at the
+levels compression.py uses. A repeat visit only revalidates the page, since
+its assets are requested by content-hashed URLs.
+
+Usage: python -m benchmarks.bench_compression
+"""
+import gzip
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compression  # noqa: E402
+from compression import COMPRESS_BROTLI_QUALITY, COMPRESS_GZIP_LEVEL  # noqa: E402
+
+FLIGHT_COUNTS = [10, 50, 1000]
+STATIC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+PAGE_ASSETS = ["js/tracker.js", "css/custom.css"]
+
+
+def make_flights(count):
+    departure = datetime(2026, 1, 1, 8, 0)
+    return [
+        {"id": i, "flight_number": f"BA{i}", "airline": "British Airways", "departure_airport": "LHR",
+         "arrival_airport": "JFK", "scheduled_departure": departure + timedelta(minutes=i),
+         "scheduled_arrival": departure + timedelta(minutes=i + 480), "actual_departure": None,
+         "actual_arrival": None, "status": "active", "departure_lat": 51.47, "departure_lon": -0.4543,
+         "arrival_lat": 40.6413, "arrival_lon": -73.7781, "current_lat": 48.0 + i % 97 / 7,
+         "current_lon": -30.0 - i % 89 / 3, "position_source": "estimated", "altitude": 11277.6,
+         "speed": 870.4, "last_updated": departure + timedelta(seconds=i)}
+        for i in range(count)
+    ]
+
+
+def encodings(data):
+    results = [("identity", len(data), 0.0)]
+    start = time.perf_counter()
+    size = len(gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0))
+    results.append(("gzip", size, time.perf_counter() - start))
+    if compression.brotli is not None:
+        start = time.perf_counter()
+        size = len(compression.brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY))
+        results.append(("br", size, time.perf_counter() - start))
+    return results
+
+
+def report(label, data):
+    for encoding, size, elapsed in encodings(data):
+        print(f"{label:>24} {encoding:>9} {size / 1024:>10.1f} {elapsed * 1000:>10.2f} {size / len(data):>7.0%}")
+
+
+def main():
+    from serializers import FLIGHT_FIELDS, columnar, dumps
+
+    print(f"gzip level {COMPRESS_GZIP_LEVEL}, brotli "
+          f"{'quality ' + str(COMPRESS_BROTLI_QUALITY) if compression.brotli else 'not installed'}")
+    print(f"{'payload':>24} {'encoding':>9} {'size (KB)':>10} {'time (ms)':>10} {'ratio':>7}")
+    for count in FLIGHT_COUNTS:
+        flights = make_flights(count)
+        report(f"{count} flights, records", dumps({"success": True, "flights": flights}))
+        report(f"{count} flights, columns", dumps({"success": True, "flights": columnar(FLIGHT_FIELDS, flights)}))
+
+    with open(os.path.join(os.path.dirname(STATIC), "templates", "index.html"), "rb") as f:
+        page = f.read()
+    for asset in PAGE_ASSETS:
+        with open(os.path.join(STATIC, asset), "rb") as f:
+            page += f.read()
+    report("page + assets (first)", page)
+    print(f"{'page + assets (repeat)':>24} assets cached by content hash; the page answers 304 if unchanged")
+
+
+if __name__ == "__main__":
+    main()
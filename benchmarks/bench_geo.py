@@ -0,0 +1,146 @@
+"""
+Check and time the great-circle position estimates in geo.py
+
+Accuracy checks (the script exits non-zero if any fails):
+- route distances match published great-circle distances within 0.5%
+- interpolated points sit at the right distance along the route
+- routes across the antimeridian stay over the Pacific instead of jumping
+  to the arithmetic midpoint on the other side of the world
+- the vectorized code matches a scalar pure-Python implementation
+
+Then times estimate_positions for 1 to 100k flights against a pure-Python loop.
+
+Usage: python -m benchmarks.bench_geo
+"""
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo import (  # noqa: E402
+    EARTH_RADIUS_KM, estimate_positions, great_circle_distance, interpolate_great_circle
+)
+
+# (from, to, from lat/lon, to lat/lon, published great-circle distance in km; those
+# are ellipsoidal, hence the 0.5% tolerance for our spherical model)
+KNOWN_ROUTES = [
+    ("JFK", "LHR", (40.6413, -73.7781), (51.4700, -0.4543), 5555),
+    ("SYD", "LAX", (-33.9399, 151.1753), (33.9416, -118.4085), 12051),
+    ("SIN", "EWR", (1.3644, 103.9915), (40.6895, -74.1745), 15344),
+    ("NRT", "SFO", (35.7647, 140.3864), (37.6213, -122.3790), 8218),
+]
+
+FLIGHT_COUNTS = [1, 1000, 10000, 100000]
+
+
+def reference_position(lat1, lon1, lat2, lon2, fraction):
+    """Scalar slerp with the math module, for checking the vectorized version"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    angle = 2 * math.asin(math.sqrt(min(1.0, h)))
+    if math.sin(angle) < 1e-12:
+        a, b = 1 - fraction, fraction
+    else:
+        a = math.sin((1 - fraction) * angle) / math.sin(angle)
+        b = math.sin(fraction * angle) / math.sin(angle)
+    x = a * math.cos(lat1) * math.cos(lon1) + b * math.cos(lat2) * math.cos(lon2)
+    y = a * math.cos(lat1) * math.sin(lon1) + b * math.cos(lat2) * math.sin(lon2)
+    z = a * math.sin(lat1) + b * math.sin(lat2)
+    return math.degrees(math.atan2(z, math.hypot(x, y))), math.degrees(math.atan2(y, x))
+
+
+def check(condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'} {message}")
+    return condition
+
+
+def accuracy_checks():
+    passed = True
+    for origin, destination, (lat1, lon1), (lat2, lon2), published in KNOWN_ROUTES:
+        distance = float(great_circle_distance(lat1, lon1, lat2, lon2))
+        passed &= check(
+            abs(distance - published) / published < 0.005,
+            f"{origin}-{destination} distance {distance:.0f} km (published {published} km)"
+        )
+
+        fractions = np.linspace(0, 1, 11)
+        lats, lons = interpolate_great_circle(lat1, lon1, lat2, lon2, fractions)
+        along = great_circle_distance(lat1, lon1, lats, lons)
+        passed &= check(
+            np.allclose(along, fractions * distance, atol=1e-6),
+            f"{origin}-{destination} points are evenly spaced along the route"
+        )
+        passed &= check(
+            np.allclose([lats[0], lats[-1]], [lat1, lat2]) and np.allclose([lons[0], lons[-1]], [lon1, lon2]),
+            f"{origin}-{destination} starts and ends at the airports"
+        )
+
+    # NRT-SFO crosses the antimeridian; the naive midpoint lands near Africa (lon ~9)
+    lat, lon = interpolate_great_circle(35.7647, 140.3864, 37.6213, -122.3790, 0.5)
+    passed &= check(abs(float(lon)) > 170 and float(lat) > 45, f"NRT-SFO midpoint over the North Pacific ({float(lat):.1f}, {float(lon):.1f})")
+
+    # Departure and arrival on the same longitude across the pole
+    lat, lon = interpolate_great_circle(60.0, 0.0, 60.0, 180.0, 0.5)
+    passed &= check(abs(float(lat) - 90.0) < 1e-9, "polar route passes over the pole")
+
+    # Progress comes from the clock: a quarter of the way through the block time
+    lat, lon = estimate_positions(40.6413, -73.7781, 51.4700, -0.4543, 0.0, 4 * 3600.0, 3600.0)
+    expected = interpolate_great_circle(40.6413, -73.7781, 51.4700, -0.4543, 0.25)
+    passed &= check(np.allclose([lat, lon], expected), "time-based progress matches route fraction")
+    lat, _ = estimate_positions(40.6413, -73.7781, 51.4700, -0.4543, np.nan, 4 * 3600.0, 3600.0)
+    passed &= check(bool(np.isnan(lat)), "unknown departure time gives no estimate")
+
+    rng = np.random.default_rng(0)
+    count = 10000
+    routes = [rng.uniform(-80, 80, count), rng.uniform(-180, 180, count),
+              rng.uniform(-80, 80, count), rng.uniform(-180, 180, count)]
+    fractions = rng.uniform(0, 1, count)
+    lats, lons = interpolate_great_circle(*routes, fractions)
+    worst = 0.0
+    for i in range(count):
+        ref_lat, ref_lon = reference_position(*(route[i] for route in routes), fractions[i])
+        lon_error = abs((lons[i] - ref_lon + 180) % 360 - 180)
+        worst = max(worst, abs(lats[i] - ref_lat), lon_error * math.cos(math.radians(ref_lat)))
+    passed &= check(worst < 1e-9, f"vectorized matches scalar reference on {count} random routes (max error {worst:.1e} deg)")
+    return passed
+
+
+def timing():
+    rng = np.random.default_rng(1)
+    print(f"\n{'flights':>8} {'numpy (ms)':>11} {'python (ms)':>12} {'speedup':>8}")
+    for count in FLIGHT_COUNTS:
+        args = [rng.uniform(-60, 60, count), rng.uniform(-180, 180, count),
+                rng.uniform(-60, 60, count), rng.uniform(-180, 180, count)]
+        departure = np.zeros(count)
+        arrival = rng.uniform(3600, 16 * 3600, count)
+        now = 3 * 3600.0
+
+        start = time.perf_counter()
+        estimate_positions(*args, departure, arrival, now)
+        vectorized = (time.perf_counter() - start) * 1000
+
+        lists = [arg.tolist() for arg in args]
+        arrival_list = arrival.tolist()
+        start = time.perf_counter()
+        for i in range(count):
+            fraction = min(1.0, now / arrival_list[i])
+            reference_position(lists[0][i], lists[1][i], lists[2][i], lists[3][i], fraction)
+        scalar = (time.perf_counter() - start) * 1000
+
+        print(f"{count:>8} {vectorized:>11.2f} {scalar:>12.2f} {scalar / vectorized:>7.1f}x")
+
+
+def main():
+    print(f"Earth radius {EARTH_RADIUS_KM} km\n")
+    passed = accuracy_checks()
+    timing()
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Measure flight_number lookup latency with and without an index
+
+Fills a scratch flight table with N rows, then times point lookups by
+flight_number, a join against saved_flight and a cascading delete, first
+without indexes and then with the unique indexes added by migration
+0001_flight_number_keys.
+
+Uses BENCH_DATABASE_URL if set (point it at a scratch PostgreSQL database to
+get production-like numbers), otherwise a temporary SQLite file.
+
+Usage: python -m benchmarks.bench_lookup_indexes [--rows 1000000] [--lookups 1000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+BATCH_SIZE = 10000
+
+
+def create_tables(conn):
+    conn.execute(text("DROP TABLE IF EXISTS bench_saved_flight"))
+    conn.execute(text("DROP TABLE IF EXISTS bench_flight"))
+    conn.execute(text("CREATE TABLE bench_flight (id INTEGER PRIMARY KEY, flight_number VARCHAR(20) NOT NULL, status VARCHAR(50))"))
+    conn.execute(text("CREATE TABLE bench_saved_flight (id INTEGER PRIMARY KEY, flight_number VARCHAR(20) NOT NULL)"))
+
+
+def fill_tables(engine, rows):
+    with engine.begin() as conn:
+        for start in range(0, rows, BATCH_SIZE):
+            conn.execute(
+                text("INSERT INTO bench_flight (id, flight_number, status) VALUES (:id, :flight_number, 'scheduled')"),
+                [{"id": i, "flight_number": f"XX{i}"} for i in range(start, min(start + BATCH_SIZE, rows))]
+            )
+        # Roughly one saved flight per hundred details rows
+        conn.execute(
+            text("INSERT INTO bench_saved_flight (id, flight_number) VALUES (:id, :flight_number)"),
+            [{"id": i, "flight_number": f"XX{i * 100}"} for i in range(rows // 100)]
+        )
+
+
+def time_lookups(engine, rows, lookups):
+    """Return mean milliseconds for a point lookup, a join and a delete"""
+    targets = [f"XX{random.randrange(rows)}" for _ in range(lookups)]
+    timings = {}
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for flight_number in targets:
+            conn.execute(text("SELECT * FROM bench_flight WHERE flight_number = :n"), {"n": flight_number}).first()
+        timings["lookup"] = (time.perf_counter() - start) * 1000 / lookups
+
+        start = time.perf_counter()
+        for flight_number in targets:
+            conn.execute(text(
+                "SELECT f.* FROM bench_saved_flight s JOIN bench_flight f ON f.flight_number = s.flight_number "
+                "WHERE s.flight_number = :n"
+            ), {"n": flight_number}).all()
+        timings["join"] = (time.perf_counter() - start) * 1000 / lookups
+
+        # Deletes touch both tables, like remove_flight with the cascade
+        start = time.perf_counter()
+        for flight_number in targets[:max(1, lookups // 10)]:
+            conn.execute(text("DELETE FROM bench_saved_flight WHERE flight_number = :n"), {"n": flight_number})
+            conn.execute(text("DELETE FROM bench_flight WHERE flight_number = :n"), {"n": flight_number})
+        conn.rollback()
+        timings["delete"] = (time.perf_counter() - start) * 1000 / max(1, lookups // 10)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="flight_number index benchmark")
+    parser.add_argument("--rows", type=int, default=1000000, help="rows in the flight table")
+    parser.add_argument("--lookups", type=int, default=1000, help="lookups per measurement")
+    args = parser.parse_args()
+
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if not url:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(url)
+
+    with engine.begin() as conn:
+        create_tables(conn)
+    start = time.perf_counter()
+    fill_tables(engine, args.rows)
+    print(f"{engine.dialect.name}: inserted {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+    # Without indexes every lookup is a sequential scan, so keep the sample small
+    unindexed = time_lookups(engine, args.rows, max(1, args.lookups // 100))
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE UNIQUE INDEX ix_bench_flight_flight_number ON bench_flight (flight_number)"))
+        conn.execute(text("CREATE UNIQUE INDEX ix_bench_saved_flight_flight_number ON bench_saved_flight (flight_number)"))
+    indexed = time_lookups(engine, args.rows, args.lookups)
+
+    print(f"{'query':>8} {'no index (ms)':>14} {'indexed (ms)':>13} {'speedup':>8}")
+    for name in ("lookup", "join", "delete"):
+        print(f"{name:>8} {unindexed[name]:>14.3f} {indexed[name]:>13.3f} {unindexed[name] / indexed[name]:>7.0f}x")
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE bench_saved_flight"))
+        conn.execute(text("DROP TABLE bench_flight"))
+
+
+if __name__ == "__main__":
+    main()
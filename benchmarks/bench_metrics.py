@@ -0,0 +1,90 @@
+"""
+Measure the overhead of request metrics and Server-Timing headers
+
+Times requests through the Flask test client with metrics.py switched off,
+with metrics only, and with metrics plus the Server-Timing header, for an
+endpoint without database access (/api/airports/<code>) and one with
+(/api/flights/details over a watchlist of N flights). The modes are
+interleaved and the best of --rounds is kept, to even out noise. Also
+times rendering /metrics once every route has been hit.
+
+Uses DATABASE_URL if set, otherwise a temporary SQLite file.
+
+Usage: python -m benchmarks.bench_metrics [--flights 50] [--requests 1000] [--rounds 5]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ["FLIGHT_SCHEDULER_ENABLED"] = "false"
+
+
+def per_request(client, url, count):
+    client.get(url)
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get(url)
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request metrics overhead benchmark")
+    parser.add_argument("--flights", type=int, default=50, help="flights on the watchlist")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per measurement")
+    parser.add_argument("--rounds", type=int, default=5, help="measurements per mode (the best is kept)")
+    args = parser.parse_args()
+
+    from main import app
+    from app import db, init_db
+    from models import Flight, SavedFlight
+    import metrics
+    logging.disable(logging.CRITICAL)
+    with app.app_context():
+        init_db()
+
+    client = app.test_client()
+    client.get("/api/flights")
+    with client.session_transaction() as session:
+        owner_id = session["owner_id"]
+    flight_numbers = [f"MT{i}" for i in range(args.flights)]
+    with app.app_context():
+        db.session.execute(Flight.__table__.insert(), [
+            {"flight_number": flight_number, "airline": "Bench Air", "status": "scheduled",
+             "departure_airport": "LHR", "arrival_airport": "JFK"}
+            for flight_number in flight_numbers
+        ])
+        db.session.add_all(SavedFlight(owner_id=owner_id, flight_number=flight_number) for flight_number in flight_numbers)
+        db.session.commit()
+
+    modes = [
+        ("off", False, False),
+        ("metrics", True, False),
+        ("metrics + Server-Timing", True, True),
+    ]
+    print(f"best of {args.rounds} x {args.requests} requests, {args.flights} flights on the watchlist")
+    print(f"{'endpoint':>22} {'mode':>24} {'us/request':>11} {'overhead':>9}")
+    for url in ("/api/airports/LHR", "/api/flights/details"):
+        best = {}
+        for _ in range(args.rounds):
+            for label, enabled, server_timing in modes:
+                metrics.METRICS_ENABLED = enabled
+                metrics.SERVER_TIMING_ENABLED = server_timing
+                elapsed = per_request(client, url, args.requests)
+                best[label] = min(best.get(label, elapsed), elapsed)
+        for label, _, _ in modes:
+            print(f"{url:>22} {label:>24} {best[label] * 1e6:>11.1f} {(best[label] / best['off'] - 1) * 100:>8.1f}%")
+
+    metrics.METRICS_ENABLED = True
+    start = time.perf_counter()
+    body = client.get("/metrics").get_data()
+    print(f"/metrics: {len(body.splitlines())} lines rendered in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
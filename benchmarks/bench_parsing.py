@@ -0,0 +1,216 @@
+"""
+Time the parsing of AviationStack responses into flight data
+
+Decodes a recorded /flights response (benchmarks/fixtures/aviationstack_flights.json,
+or --payload) and converts every record with format_flight_info, and
+compares that with the previous implementation: stdlib JSON decoding,
+f-string debug dumps of the whole response and of each record (formatted
+even when DEBUG logging is off), a safe_get closure defined per call and
+strptime per date. Logging goes to /dev/null at INFO, as in production,
+and then at DEBUG with the record sample rate at 1% and 100%.
+
+Checks that both implementations produce the same flight data (the script
+exits non-zero if not). --profile prints the top functions of the current
+implementation under cProfile.
+
+Usage: python -m benchmarks.bench_parsing [--payload path.json] [--iterations 20000] [--profile]
+"""
+import argparse
+import cProfile
+import json
+import logging
+import math
+import os
+import pstats
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aviation_api  # noqa: E402
+from airports import get_airports  # noqa: E402
+from geo import AIRBORNE_STATUSES, estimate_position, interpolate_great_circle, route_times  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "aviationstack_flights.json")
+
+logger = logging.getLogger("aviation_api")
+
+
+def legacy_format_date(date_str):
+    if not date_str:
+        return None
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S%z").isoformat()
+    except Exception as e:
+        logger.error(f"Error formatting date {date_str}: {str(e)}")
+        return None
+
+
+def legacy_format_flight_info(flight_info, flight_number):
+    """format_flight_info before the extraction spec, kept for comparison"""
+    try:
+        logger.debug(f"Flight info: {flight_info}")
+
+        def safe_get(obj, *keys):
+            try:
+                for key in keys:
+                    if obj is None:
+                        return None
+                    obj = obj.get(key)
+                return obj
+            except (AttributeError, KeyError, TypeError):
+                return None
+
+        departure_airport = safe_get(flight_info, "departure", "iata")
+        arrival_airport = safe_get(flight_info, "arrival", "iata")
+        departure_lat = safe_get(flight_info, "departure", "latitude")
+        departure_lon = safe_get(flight_info, "departure", "longitude")
+        arrival_lat = safe_get(flight_info, "arrival", "latitude")
+        arrival_lon = safe_get(flight_info, "arrival", "longitude")
+        if not departure_lat and not departure_lon:
+            coordinates = get_airports().coordinates(departure_airport)
+            if coordinates:
+                departure_lat, departure_lon = coordinates
+                logger.info(f"Using airport database coordinates for {departure_airport}: {departure_lat}, {departure_lon}")
+        if not arrival_lat and not arrival_lon:
+            coordinates = get_airports().coordinates(arrival_airport)
+            if coordinates:
+                arrival_lat, arrival_lon = coordinates
+                logger.info(f"Using airport database coordinates for {arrival_airport}: {arrival_lat}, {arrival_lon}")
+        current_lat = safe_get(flight_info, "live", "latitude")
+        current_lon = safe_get(flight_info, "live", "longitude")
+        position_source = "live" if current_lat and current_lon else None
+        if not current_lat and not current_lon and departure_lat and departure_lon and arrival_lat and arrival_lon:
+            status = flight_info.get("flight_status", "").lower()
+            if status == "scheduled":
+                current_lat, current_lon = departure_lat, departure_lon
+            elif status == "landed" or status == "arrived":
+                current_lat, current_lon = arrival_lat, arrival_lon
+            elif status in AIRBORNE_STATUSES:
+                departure_time, arrival_time = route_times(
+                    safe_get(flight_info, "departure", "scheduled"),
+                    safe_get(flight_info, "departure", "actual") or safe_get(flight_info, "departure", "estimated"),
+                    safe_get(flight_info, "arrival", "scheduled"),
+                    safe_get(flight_info, "arrival", "actual") or safe_get(flight_info, "arrival", "estimated")
+                )
+                current_lat, current_lon = estimate_position(
+                    departure_lat, departure_lon, arrival_lat, arrival_lon, departure_time, arrival_time
+                )
+                if current_lat is None:
+                    current_lat, current_lon = (float(value) for value in interpolate_great_circle(
+                        departure_lat, departure_lon, arrival_lat, arrival_lon, 0.5
+                    ))
+            if current_lat and current_lon:
+                position_source = "estimated"
+        return {
+            "flight_number": safe_get(flight_info, "flight", "iata") or flight_number,
+            "airline": safe_get(flight_info, "airline", "name"),
+            "departure_airport": departure_airport,
+            "arrival_airport": arrival_airport,
+            "scheduled_departure": legacy_format_date(safe_get(flight_info, "departure", "scheduled")),
+            "scheduled_arrival": legacy_format_date(safe_get(flight_info, "arrival", "scheduled")),
+            "actual_departure": legacy_format_date(safe_get(flight_info, "departure", "actual")),
+            "actual_arrival": legacy_format_date(safe_get(flight_info, "arrival", "actual")),
+            "status": flight_info.get("flight_status"),
+            "departure_lat": departure_lat,
+            "departure_lon": departure_lon,
+            "arrival_lat": arrival_lat,
+            "arrival_lon": arrival_lon,
+            "current_lat": current_lat,
+            "current_lon": current_lon,
+            "position_source": position_source,
+            "altitude": safe_get(flight_info, "live", "altitude"),
+            "speed": safe_get(flight_info, "live", "speed_horizontal"),
+        }
+    except Exception as e:
+        logger.error(f"Error processing flight data: {str(e)}")
+        return {"error": f"Error processing flight data: {str(e)}"}
+
+
+class FakeResponse:
+    """Just enough of requests.Response for decode_response"""
+
+    def __init__(self, content):
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content.decode())
+
+
+def parse_legacy(body):
+    data = json.loads(body.decode())
+    logger.debug(f"API response data: {data}")
+    return [legacy_format_flight_info(record, record["flight"]["iata"]) for record in data["data"]]
+
+
+def parse_current(body):
+    data = aviation_api.decode_response(FakeResponse(body))
+    return [aviation_api.format_flight_info(record, record["flight"]["iata"]) for record in data["data"]]
+
+
+def same_flights(legacy, current):
+    for old, new in zip(legacy, current):
+        for key, value in old.items():
+            # Estimated positions move with the clock between the two calls
+            if key in ("current_lat", "current_lon") and value is not None:
+                if not math.isclose(value, new[key], abs_tol=0.01):
+                    return False
+            elif new[key] != value:
+                return False
+    return len(legacy) == len(current)
+
+
+def per_response(parse, body, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse(body)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AviationStack response parsing benchmark")
+    parser.add_argument("--payload", default=FIXTURE, help="recorded /flights response (JSON)")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--profile", action="store_true", help="profile the current implementation")
+    args = parser.parse_args()
+
+    with open(args.payload, "rb") as f:
+        body = f.read()
+    records = len(json.loads(body)["data"])
+
+    # Production-like logging: records below the level are discarded
+    handler = logging.FileHandler(os.devnull)
+    logging.basicConfig(level=logging.INFO, handlers=[handler])
+    get_airports()
+
+    passed = same_flights(parse_legacy(body), parse_current(body))
+    print(f"{'ok  ' if passed else 'FAIL'} current implementation matches the previous one on {records} records")
+    print(f"orjson {'installed' if aviation_api.orjson else 'not installed'}, {len(body)} byte response, "
+          f"{args.iterations} iterations")
+    print(f"{'implementation':>28} {'log level':>10} {'us/response':>12} {'us/record':>10}")
+
+    runs = [
+        ("previous", logging.INFO, 1.0, parse_legacy),
+        ("current", logging.INFO, 1.0, parse_current),
+        ("previous", logging.DEBUG, 1.0, parse_legacy),
+        ("current, 1% sampled", logging.DEBUG, 0.01, parse_current),
+        ("current, all records", logging.DEBUG, 1.0, parse_current),
+    ]
+    for label, level, sample_rate, parse in runs:
+        logging.getLogger().setLevel(level)
+        aviation_api.DEBUG_SAMPLE_RATE = sample_rate
+        elapsed = per_response(parse, body, args.iterations)
+        print(f"{label:>28} {logging.getLevelName(level):>10} {elapsed * 1e6:>12.1f} {elapsed * 1e6 / records:>10.1f}")
+
+    if args.profile:
+        logging.getLogger().setLevel(logging.INFO)
+        profiler = cProfile.Profile()
+        profiler.runcall(per_response, parse_current, body, args.iterations)
+        pstats.Stats(profiler).sort_stats("tottime").print_stats(12)
+
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
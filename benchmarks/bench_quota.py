@@ -0,0 +1,121 @@
+"""
+Check how the upstream request budget is shared between request priorities
+
+1. Contention: threads of every priority ask a rate-limited QuotaManager for
+   tokens at once; reports the average wait and grant order per priority.
+   User lookups should be served first and background refreshes last.
+2. Degradation: rounds of lookups for flights of every priority against the
+   local AviationStack stub, with a small daily budget and cache entries
+   that expire between rounds. Reports fresh / stale / failed results per
+   priority; as the budget runs low, background and scheduled refreshes
+   should fall back to stale data first and user lookups last.
+
+Usage: python -m benchmarks.bench_quota [--daily 60] [--rounds 4]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Cached data expires between rounds, so every round needs the upstream again
+os.environ.setdefault("FLIGHT_CACHE_TTL_ACTIVE", "1")
+os.environ.setdefault("FLIGHT_CACHE_TTL_SCHEDULED", "1")
+os.environ.setdefault("FLIGHT_CACHE_TTL_LANDED", "1")
+os.environ.setdefault("FLIGHT_CACHE_TTL_DEFAULT", "1")
+
+from benchmarks.stub_aviationstack import start_stub_server  # noqa: E402
+from quota import PRIORITY_NAMES, QuotaManager  # noqa: E402
+
+FLIGHTS_PER_PRIORITY = 10
+
+
+def contention(threads_per_priority, rate):
+    manager = QuotaManager(rate=rate, burst=1)
+    manager.acquire()  # empty the bucket so every thread has to queue
+    barrier = threading.Barrier(threads_per_priority * len(PRIORITY_NAMES))
+    order = []
+    waits = {priority: [] for priority in PRIORITY_NAMES}
+    lock = threading.Lock()
+
+    def worker(priority):
+        barrier.wait()
+        started = time.perf_counter()
+        granted = manager.acquire(priority, timeout=60)
+        with lock:
+            waits[priority].append(time.perf_counter() - started)
+            if granted:
+                order.append(priority)
+
+    threads = [
+        threading.Thread(target=worker, args=(priority,))
+        for priority in PRIORITY_NAMES for _ in range(threads_per_priority)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"{len(threads)} requests at {rate}/s")
+    print(f"{'priority':>11} {'mean wait (s)':>14} {'mean grant position':>20}")
+    for priority, name in PRIORITY_NAMES.items():
+        positions = [index for index, granted in enumerate(order) if granted == priority]
+        print(f"{name:>11} {sum(waits[priority]) / len(waits[priority]):>14.2f} "
+              f"{sum(positions) / max(len(positions), 1):>20.1f}")
+
+
+def degradation(daily, rounds):
+    import aviation_api
+    import quota
+
+    server = start_stub_server(latency=0.005)
+    aviation_api.BASE_URL = server.base_url
+    quota._quota = QuotaManager(daily=daily)
+
+    # Each priority gets its own flights, so results can't be shared between them
+    flights = {
+        priority: [f"Q{priority}{number}" for number in range(100, 100 + FLIGHTS_PER_PRIORITY)]
+        for priority in PRIORITY_NAMES
+    }
+    lookups = [(priority, flight) for priority, numbers in flights.items() for flight in numbers]
+
+    print(f"\ndaily budget {daily}, reserve {quota.QUOTA_RESERVE_FRACTION:.0%}, "
+          f"{len(lookups)} lookups per round")
+    print(f"{'round':>5} {'priority':>11} {'fresh':>6} {'stale':>6} {'failed':>7}")
+    for round_number in range(1, rounds + 1):
+        random.shuffle(lookups)
+        counts = {priority: [0, 0, 0] for priority in PRIORITY_NAMES}
+        for priority, flight in lookups:
+            result = aviation_api.get_flight_data(flight, priority=priority)
+            if "error" in result:
+                counts[priority][2] += 1
+            elif result.get("stale"):
+                counts[priority][1] += 1
+            else:
+                counts[priority][0] += 1
+        for priority, name in PRIORITY_NAMES.items():
+            fresh, stale, failed = counts[priority]
+            print(f"{round_number:>5} {name:>11} {fresh:>6} {stale:>6} {failed:>7}")
+        time.sleep(1.1)
+
+    stats = quota.get_quota().stats()
+    print(f"upstream calls {server.calls}, day used {stats['day_used']}/{stats['daily_limit']}, mode {stats['mode']}")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request budget priority check")
+    parser.add_argument("--threads", type=int, default=10, help="contending threads per priority")
+    parser.add_argument("--rate", type=float, default=50, help="token bucket rate for the contention test")
+    parser.add_argument("--daily", type=int, default=60, help="daily budget for the degradation test")
+    parser.add_argument("--rounds", type=int, default=4)
+    args = parser.parse_args()
+
+    contention(args.threads, args.rate)
+    degradation(args.daily, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
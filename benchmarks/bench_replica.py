@@ -0,0 +1,232 @@
+"""
+Compare connection pool liveness settings and read-replica routing
+
+Runs concurrent GET /api/flights/details requests (a read-only endpoint)
+through the Flask test client under several configurations, each in its
+own process since the settings are read at startup:
+
+- primary only, pinging every connection on checkout (the old default)
+- primary only, pinging only connections idle for 30s (DB_POOL_PING_IDLE=30)
+- primary only, never pinging (DB_POOL_PING_IDLE=-1)
+- reads routed to the replica (DATABASE_REPLICA_URL), pinging idle connections
+
+and reports requests/sec, p50/p95 latency, pool checkouts and the queries
+sent to each database. Then checks read-your-writes: right after a session
+adds a flight, its next read must go to the primary and include the flight
+(the script exits non-zero if not).
+
+Set BENCH_PRIMARY_URL and BENCH_REPLICA_URL to two local PostgreSQL
+instances, the second a streaming replica of the first, e.g.:
+
+    initdb -D /tmp/pg-primary && pg_ctl -D /tmp/pg-primary -o "-p 5433" start
+    createdb -p 5433 flighttracker
+    pg_basebackup -p 5433 -D /tmp/pg-replica -R && pg_ctl -D /tmp/pg-replica -o "-p 5434" start
+    BENCH_PRIMARY_URL=postgresql://localhost:5433/flighttracker \\
+    BENCH_REPLICA_URL=postgresql://localhost:5434/flighttracker python -m benchmarks.bench_replica
+
+Without them it uses two SQLite files, copying the primary over the replica
+after seeding: routing and read-your-writes are checked, but the timings say
+nothing about PostgreSQL.
+
+Usage: python -m benchmarks.bench_replica [--flights 50] [--requests 2000] [--concurrency 8]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+OWNER_ID = "bench-replica"
+
+CONFIGURATIONS = [
+    ("primary, ping every checkout", False, "0"),
+    ("primary, ping after 30s idle", False, "30"),
+    ("primary, never ping", False, "-1"),
+    ("replica, ping after 30s idle", True, "30"),
+]
+
+
+def load_app():
+    import logging
+
+    from main import app
+    from app import db, init_db
+    logging.disable(logging.CRITICAL)
+    with app.app_context():
+        init_db()
+    return app, db
+
+
+def seed(flights):
+    """Store flights on the primary and put them on one watchlist"""
+    app, db = load_app()
+    from models import Flight, SavedFlight
+
+    with app.app_context():
+        SavedFlight.query.filter_by(owner_id=OWNER_ID).delete()
+        Flight.query.filter(Flight.flight_number.like("RP%")).delete(synchronize_session=False)
+        db.session.execute(Flight.__table__.insert(), [
+            {"flight_number": f"RP{i}", "airline": "Bench Air", "status": "scheduled",
+             "departure_airport": "LHR", "arrival_airport": "JFK"}
+            for i in range(flights + 1)
+        ])
+        db.session.add_all(SavedFlight(owner_id=OWNER_ID, flight_number=f"RP{i}") for i in range(flights))
+        db.session.commit()
+
+
+def count_engine_events(app, db):
+    """Count queries per engine and pool checkouts"""
+    from sqlalchemy import event
+
+    counts = {"primary": 0, "replica": 0, "checkouts": 0}
+    lock = threading.Lock()
+
+    def counter(name):
+        def count(*args):
+            with lock:
+                counts[name] += 1
+        return count
+
+    with app.app_context():
+        for key, engine in db.engines.items():
+            event.listen(engine, "before_cursor_execute", counter("replica" if key == "replica" else "primary"))
+            event.listen(engine.pool, "checkout", counter("checkouts"))
+    return counts
+
+
+def run(requests_total, concurrency):
+    """Time concurrent watchlist reads in this process; prints one JSON line"""
+    app, db = load_app()
+    import replicas
+
+    counts = count_engine_events(app, db)
+    local = threading.local()
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+            with local.client.session_transaction() as session:
+                session["owner_id"] = OWNER_ID
+        return local.client
+
+    def one(_):
+        started = time.perf_counter()
+        ok = client().get("/api/flights/details").status_code == 200
+        with lock:
+            latencies.append(time.perf_counter() - started if ok else float("inf"))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(concurrency)))  # warm up the pool
+    latencies.clear()
+    for name in counts:
+        counts[name] = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_total)))
+    wall = time.perf_counter() - started
+    cuts = statistics.quantiles(latencies, n=100)
+    result = {"rps": requests_total / wall, "p50": cuts[49], "p95": cuts[94],
+              "failed": sum(latency == float("inf") for latency in latencies), **counts}
+
+    if replicas.DATABASE_REPLICA_URL:
+        # Read your writes: the read after an add goes to the primary and sees the flight
+        writer = app.test_client()
+        with writer.session_transaction() as session:
+            session["owner_id"] = "bench-writer"
+        writer.delete("/api/flights/remove/RP0")
+        writer.post("/api/flights/add", json={"flight_number": "RP0"})
+        before = dict(counts)
+        flights = writer.get("/api/flights").get_json()["flights"]
+        result["ryw_sees_write"] = any(flight["flight_number"] == "RP0" for flight in flights)
+        result["ryw_primary"] = counts["primary"] > before["primary"] and counts["replica"] == before["replica"]
+        # Once the window has passed, the same session reads from the replica again
+        replicas.REPLICA_READ_YOUR_WRITES = 0
+        before = dict(counts)
+        writer.get("/api/flights")
+        result["after_window_replica"] = counts["replica"] > before["replica"]
+        writer.delete("/api/flights/remove/RP0")
+
+    print(json.dumps(result))
+
+
+def subprocess_env(primary_url, replica_url, ping_idle):
+    env = dict(os.environ, DATABASE_URL=primary_url, DB_POOL_PING_IDLE=ping_idle, FLIGHT_SCHEDULER_ENABLED="false")
+    env.pop("DATABASE_REPLICA_URL", None)
+    if replica_url:
+        env["DATABASE_REPLICA_URL"] = replica_url
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connection pool and read-replica benchmark")
+    parser.add_argument("--flights", type=int, default=50, help="flights on the watchlist")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per configuration")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--seed", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.flights)
+        return
+    if args.run:
+        run(args.requests, args.concurrency)
+        return
+
+    primary_url = os.environ.get("BENCH_PRIMARY_URL")
+    replica_url = os.environ.get("BENCH_REPLICA_URL")
+    sqlite_dir = None
+    if not (primary_url and replica_url):
+        sqlite_dir = tempfile.mkdtemp()
+        primary_url = f"sqlite:///{os.path.join(sqlite_dir, 'primary.db')}"
+        replica_url = f"sqlite:///{os.path.join(sqlite_dir, 'replica.db')}"
+
+    def child(flag, env):
+        return subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_replica", flag, "--flights", str(args.flights),
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout
+
+    child("--seed", subprocess_env(primary_url, None, "0"))
+    if sqlite_dir:
+        # "Replicate" by copying the seeded database
+        shutil.copy(os.path.join(sqlite_dir, "primary.db"), os.path.join(sqlite_dir, "replica.db"))
+
+    print(f"{primary_url.split(':')[0]}: {args.flights} flights on the watchlist, "
+          f"{args.requests} requests, {args.concurrency} clients")
+    print(f"{'configuration':>30} {'req/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'checkouts':>10} "
+          f"{'primary q':>10} {'replica q':>10} {'failed':>7}")
+    passed = True
+    for label, use_replica, ping_idle in CONFIGURATIONS:
+        output = child("--run", subprocess_env(primary_url, replica_url if use_replica else None, ping_idle))
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{label:>30} {result['rps']:>8.1f} {result['p50'] * 1000:>7.2f} {result['p95'] * 1000:>7.2f} "
+              f"{result['checkouts']:>10} {result['primary']:>10} {result['replica']:>10} {result['failed']:>7}")
+        if use_replica:
+            checks = [
+                (result["replica"] > 0 and result["primary"] == 0, "watchlist reads go to the replica"),
+                (result["ryw_primary"], "the read right after an add goes to the primary"),
+                (result["ryw_sees_write"], "and includes the added flight"),
+                (result["after_window_replica"], "reads go back to the replica after the window"),
+            ]
+            for ok, message in checks:
+                print(f"{'ok  ' if ok else 'FAIL'} {message}")
+                passed = passed and ok
+
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
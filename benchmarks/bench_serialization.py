@@ -0,0 +1,116 @@
+"""
+Compare flight list serialization paths
+
+Stores N synthetic flights, then times loading and encoding all of them:
+
+- orm:      Flight objects -> Flight.to_dict() -> jsonify (the old path)
+- records:  column tuples -> dicts -> serializers.dumps with the stdlib encoder
+- orjson:   the same with orjson (skipped if it isn't installed)
+- columns:  one array per field, JSON
+- msgpack:  one array per field, MessagePack (skipped if it isn't installed)
+
+Times include the database query, since skipping ORM objects is part of
+the saving. Uses DATABASE_URL if set, otherwise a temporary SQLite file.
+
+Usage: python -m benchmarks.bench_serialization [--flights 10 1000 100000]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+
+def best_of(repeat, function):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flight list serialization benchmark")
+    parser.add_argument("--flights", type=int, nargs="+", default=[10, 1000, 100000], help="numbers of flights")
+    args = parser.parse_args()
+
+    from flask import jsonify
+    from app import create_app, db, init_db
+    from models import Flight
+    import serializers
+    from serializers import FLIGHT_FIELDS, columnar, dumps, flight_columns, records
+    logging.disable(logging.CRITICAL)
+    app = create_app()
+
+    def orm():
+        return jsonify({"success": True, "flights": [flight.to_dict() for flight in Flight.query.all()]}).get_data()
+
+    def tuples():
+        return records(FLIGHT_FIELDS, db.session.query(*flight_columns()))
+
+    def with_encoder(encoder):
+        def encode():
+            saved, serializers.orjson = serializers.orjson, encoder
+            try:
+                return dumps({"success": True, "flights": tuples()})
+            finally:
+                serializers.orjson = saved
+        return encode
+
+    def columns():
+        return dumps({"success": True, "flights": columnar(FLIGHT_FIELDS, tuples())})
+
+    def packed():
+        return serializers.msgpack.packb(
+            {"success": True, "flights": columnar(FLIGHT_FIELDS, tuples())}, default=serializers._default
+        )
+
+    paths = [("orm", orm), ("records", with_encoder(None))]
+    if serializers.orjson is not None:
+        paths.append(("orjson", with_encoder(serializers.orjson)))
+    paths.append(("columns", columns))
+    if serializers.msgpack is not None:
+        paths.append(("msgpack", packed))
+
+    with app.test_request_context():
+        init_db()
+        print(f"{db.engine.dialect.name}, orjson {'on' if serializers.orjson else 'not installed'}, "
+              f"msgpack {'on' if serializers.msgpack else 'not installed'}")
+        print(f"{'flights':>8} {'path':>8} {'time (ms)':>10} {'vs orm':>7} {'size (KB)':>10}")
+        for count in args.flights:
+            Flight.query.delete()
+            departure = datetime(2026, 1, 1, 8, 0)
+            db.session.execute(Flight.__table__.insert(), [
+                {"flight_number": f"BS{i}", "airline": "Bench Air", "departure_airport": "LHR",
+                 "arrival_airport": "JFK", "scheduled_departure": departure + timedelta(minutes=i % 1440),
+                 "scheduled_arrival": departure + timedelta(minutes=i % 1440 + 480),
+                 "actual_departure": departure + timedelta(minutes=i % 1440 + 12), "status": "active",
+                 "departure_lat": 51.47, "departure_lon": -0.4543, "arrival_lat": 40.6413, "arrival_lon": -73.7781,
+                 "current_lat": 48.0 + i % 100 / 7, "current_lon": -30.0 - i % 100 / 3, "position_source": "live",
+                 "altitude": 11277.6, "speed": 870.4, "last_updated": departure}
+                for i in range(count)
+            ])
+            db.session.commit()
+
+            repeat = 20 if count <= 1000 else 3
+            baseline = None
+            for name, path in paths:
+                elapsed, body = best_of(repeat, path)
+                db.session.remove()
+                baseline = baseline or elapsed
+                print(f"{count:>8} {name:>8} {elapsed * 1000:>10.2f} {baseline / elapsed:>6.1f}x {len(body) / 1024:>10.1f}")
+
+        Flight.query.delete()
+        db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Load test for request coalescing of duplicate flight lookups
+
+Fires N concurrent get_flight_data calls for the same flight against the
+local AviationStack stub and reports how many upstream requests were made.
+With single-flight coalescing the upstream count stays at 1 for every N.
+
+Usage: python -m benchmarks.bench_single_flight [--latency 0.5]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_aviationstack import start_stub_server  # noqa: E402
+
+CONCURRENCY_LEVELS = [1, 10, 50, 200]
+
+
+def run_burst(get_flight_data, flight_number, concurrency):
+    barrier = threading.Barrier(concurrency)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(get_flight_data(flight_number, use_cache=False))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-flight coalescing load test")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub response latency (s)")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency)
+
+    import aviation_api
+    aviation_api.BASE_URL = server.base_url
+
+    print(f"stub latency={args.latency}s (cache bypassed, use_cache=False)")
+    print(f"{'callers':>8} {'upstream calls':>15} {'errors':>7} {'wall (s)':>9}")
+    failed = False
+    for concurrency in CONCURRENCY_LEVELS:
+        server.calls = 0
+        results, elapsed = run_burst(aviation_api.get_flight_data, "BA123", concurrency)
+        errors = sum(1 for result in results if "error" in result)
+        print(f"{concurrency:>8} {server.calls:>15} {errors:>7} {elapsed:>9.3f}")
+        failed = failed or server.calls != 1 or errors
+
+    server.shutdown()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
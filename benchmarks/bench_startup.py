@@ -0,0 +1,146 @@
+"""
+Measure how long a fresh worker takes to become ready
+
+Starts a new Python process per run, as a gunicorn worker would, and times
+importing main (which builds the app through create_app()), then the first
+request to a database-backed endpoint (/api/flights) and the first airport
+lookup (/api/airports/LHR, which loads the airport table on first use).
+Runs three cases:
+
+- ready: the schema was set up beforehand with `flask --app app init-db`
+- init_db at startup: also runs init_db() while starting, as every worker
+  used to at import time
+- database down: DATABASE_URL points at a database that can't be opened;
+  the app must still start, and only the database request fails
+
+Prints the median of --runs for each, and the slowest imports from
+`python -X importtime -c "import main"`. Exits non-zero if a ready worker
+takes longer than --budget seconds to answer its first request.
+
+Uses DATABASE_URL if set, otherwise a temporary SQLite file.
+
+Usage: python -m benchmarks.bench_startup [--runs 5] [--budget 1.0] [--top 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(init_at_startup):
+    """Start the app in this process and report timings as one JSON line"""
+    start = time.perf_counter()
+    import logging
+    logging.disable(logging.CRITICAL)
+    from main import app
+    ready = time.perf_counter()
+    if init_at_startup:
+        from app import init_db
+        with app.app_context():
+            init_db()
+    ready_with_schema = time.perf_counter()
+    client = app.test_client()
+    flights = client.get("/api/flights")
+    first_request = time.perf_counter()
+    airport = client.get("/api/airports/LHR")
+    first_airport = time.perf_counter()
+    print(json.dumps({
+        "import": ready - start,
+        "ready": ready_with_schema - start,
+        "flights": first_request - ready_with_schema,
+        "flights_status": flights.status_code,
+        "airport": first_airport - first_request,
+        "airport_status": airport.status_code,
+    }))
+
+
+def run_child(env, init_at_startup):
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--child"]
+    if init_at_startup:
+        command.append("--init-db")
+    start = time.perf_counter()
+    output = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - start
+    return result
+
+
+def slowest_imports(env, top):
+    """(self µs, cumulative µs, module) of the imports under main that take longest on their own"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(own), int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker startup benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="processes started per case (the median is shown)")
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds allowed until a ready worker answers")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--init-db", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.init_db)
+        return
+
+    env = dict(os.environ, FLIGHT_SCHEDULER_ENABLED="false")
+    if not env.get("DATABASE_URL"):
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "init-db"], cwd=ROOT, env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    # SQLite can't create a file in a directory that doesn't exist, so every connection fails
+    down_env = dict(env, DATABASE_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'missing', 'bench.db')}")
+
+    cases = [
+        ("ready", env, False),
+        ("init_db at startup", env, True),
+        ("database down", down_env, False),
+    ]
+    print(f"{env['DATABASE_URL'].split(':')[0]}, median of {args.runs} processes")
+    print(f"{'case':>20} {'import ms':>10} {'ready ms':>9} {'/api/flights ms':>16} {'airport ms':>11} "
+          f"{'process ms':>11} {'statuses':>9}")
+    passed = True
+    for label, case_env, init_at_startup in cases:
+        results = [run_child(case_env, init_at_startup) for _ in range(args.runs)]
+
+        def median(key):
+            return statistics.median(result[key] for result in results) * 1000
+
+        statuses = f"{results[0]['flights_status']}/{results[0]['airport_status']}"
+        print(f"{label:>20} {median('import'):>10.1f} {median('ready'):>9.1f} {median('flights'):>16.1f} "
+              f"{median('airport'):>11.1f} {median('process'):>11.1f} {statuses:>9}")
+        if label == "ready":
+            answered = (median("ready") + median("flights")) / 1000
+            passed = results[0]["flights_status"] == 200 and answered <= args.budget
+            print(f"{'ok  ' if passed else 'FAIL'} first request answered {answered:.2f}s after start "
+                  f"(budget {args.budget:.2f}s)")
+        if label == "database down":
+            started = results[0]["airport_status"] == 200
+            print(f"{'ok  ' if started else 'FAIL'} the app starts and serves airports without its database")
+            passed = passed and started
+
+    print(f"\n{'slowest imports under main':<40} {'self ms':>8} {'cumulative ms':>14}")
+    for own, cumulative, name in slowest_imports(env, args.top):
+        print(f"{name:<40} {own / 1000:>8.1f} {cumulative / 1000:>14.1f}")
+
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
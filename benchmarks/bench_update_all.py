@@ -0,0 +1,60 @@
+"""
+Benchmark serial vs concurrent refresh of N tracked flights
+
+Runs aviation_api against the local AviationStack stub and reports how
+wall-clock refresh time scales with the number of flights.
+
+Usage: python -m benchmarks.bench_update_all [--latency 0.2] [--workers 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_aviationstack import start_stub_server  # noqa: E402
+
+FLIGHT_COUNTS = [1, 5, 10, 25, 50, 100]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs concurrent update-all benchmark")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub response latency (s)")
+    parser.add_argument("--workers", type=int, default=8, help="concurrency cap")
+    parser.add_argument("--deadline", type=float, default=30.0, help="refresh deadline (s)")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency)
+    os.environ["AVIATION_API_BASE_URL"] = server.base_url
+
+    import aviation_api
+    from flight_cache import get_cache
+    aviation_api.BASE_URL = server.base_url
+    cache = get_cache()
+
+    print(f"stub latency={args.latency}s workers={args.workers}")
+    print(f"{'flights':>8} {'serial (s)':>12} {'concurrent (s)':>15} {'speedup':>8}")
+    for count in FLIGHT_COUNTS:
+        flight_numbers = [f"BA{1000 + i}" for i in range(count)]
+
+        cache.clear()
+        start = time.perf_counter()
+        for flight_number in flight_numbers:
+            aviation_api.get_flight_data(flight_number)
+        serial = time.perf_counter() - start
+
+        cache.clear()
+        start = time.perf_counter()
+        aviation_api.fetch_flights_concurrently(
+            flight_numbers, max_workers=args.workers, deadline=args.deadline
+        )
+        concurrent = time.perf_counter() - start
+
+        print(f"{count:>8} {serial:>12.3f} {concurrent:>15.3f} {serial / concurrent:>7.1f}x")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
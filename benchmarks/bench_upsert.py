@@ -0,0 +1,82 @@
+"""
+Compare per-row ORM updates with the bulk upsert used on refresh
+
+Stores N synthetic flights, then times refreshing all of them through
+Flight.apply_flight_data (one ORM object per flight) and through
+upsert_flights (one INSERT ... ON CONFLICT per batch), once with every flight
+changed and once with nothing changed.
+
+Uses DATABASE_URL if set, otherwise a temporary SQLite file.
+
+Usage: python -m benchmarks.bench_upsert [--flights 1000]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from benchmarks.stub_aviationstack import make_flight  # noqa: E402
+
+
+def refresh_orm(db, Flight, results):
+    flights = {
+        flight.flight_number: flight
+        for flight in Flight.query.filter(Flight.flight_number.in_(list(results))).all()
+    }
+    changed = [flight_number for flight_number, flight_data in results.items()
+               if flights[flight_number].apply_flight_data(flight_data)]
+    db.session.commit()
+    return changed
+
+
+def refresh_upsert(db, upsert_flights, results):
+    changed = upsert_flights(results)
+    db.session.commit()
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ORM vs bulk upsert refresh benchmark")
+    parser.add_argument("--flights", type=int, default=1000, help="number of stored flights")
+    args = parser.parse_args()
+
+    from app import create_app, db, init_db
+    from models import Flight, upsert_flights
+    from aviation_api import format_flight_info
+    logging.disable(logging.CRITICAL)
+    app = create_app()
+
+    flight_numbers = [f"BA{i + 1}" for i in range(args.flights)]
+    original = {n: format_flight_info(make_flight(n), n) for n in flight_numbers}
+    moved = {n: dict(data, current_lat=(data["current_lat"] or 0) + 0.1) for n, data in original.items()}
+
+    with app.app_context():
+        init_db()
+        Flight.query.filter(Flight.flight_number.in_(flight_numbers)).delete()
+        db.session.commit()
+        upsert_flights(original)
+        db.session.commit()
+
+        print(f"{db.engine.dialect.name}: {args.flights} flights")
+        print(f"{'path':>8} {'data':>10} {'changed':>8} {'time (ms)':>10}")
+        # Alternate between the two payloads so every "changed" pass really changes every row
+        for name, refresh, target in (("orm", refresh_orm, Flight), ("upsert", refresh_upsert, upsert_flights)):
+            for label, results in (("changed", moved), ("unchanged", moved), ("changed", original)):
+                start = time.perf_counter()
+                changed = refresh(db, target, results)
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"{name:>8} {label:>10} {len(changed):>8} {elapsed:>10.1f}")
+            db.session.remove()
+
+        Flight.query.filter(Flight.flight_number.in_(flight_numbers)).delete()
+        db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
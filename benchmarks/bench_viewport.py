@@ -0,0 +1,124 @@
+"""
+Compare the map viewport query with sending every flight to the client
+
+Stores N synthetic flights spread over the world on one watchlist, then for a few viewports
+(the whole world, Europe, a city, and a box across the antimeridian) times
+flights_in_bbox and measures its JSON payload, next to serializing every
+stored flight as the flight list does. Also checks that flights plus
+cluster counts add up to the number of flights in the box (the script exits
+non-zero if they don't).
+
+Uses DATABASE_URL if set, otherwise a temporary SQLite file.
+
+Usage: python -m benchmarks.bench_viewport [--flights 1000 10000 100000]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+OWNER_ID = "bench-viewport"
+
+# (name, south, west, north, east, zoom)
+VIEWPORTS = [
+    ("world", -85.0, -180.0, 85.0, 180.0, 2),
+    ("europe", 35.0, -12.0, 62.0, 30.0, 5),
+    ("london", 51.2, -0.6, 51.8, 0.4, 10),
+    ("pacific", -50.0, 160.0, 10.0, -150.0, 4),
+]
+
+
+def in_box(lat, lon, south, west, north, east):
+    if not south <= lat <= north:
+        return False
+    if west <= east:
+        return west <= lon <= east
+    return lon >= west or lon <= east
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Map viewport query benchmark")
+    parser.add_argument("--flights", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="numbers of stored flights")
+    args = parser.parse_args()
+
+    from app import create_app, db, init_db
+    from models import Flight, SavedFlight
+    from viewport import flights_in_bbox
+    logging.disable(logging.CRITICAL)
+    app = create_app()
+
+    rng = random.Random(0)
+    passed = True
+    with app.app_context():
+        init_db()
+        print(f"{db.engine.dialect.name}")
+        print(f"{'flights':>8} {'viewport':>9} {'in box':>7} {'shown':>6} {'clusters':>9} "
+              f"{'time (ms)':>10} {'payload (KB)':>13} {'all flights (KB)':>17}")
+        for count in args.flights:
+            Flight.query.delete()
+            db.session.commit()
+            # Half the flights around busy hubs, the rest anywhere
+            hubs = [(51.47, -0.45), (40.64, -73.78), (1.36, 103.99), (-33.94, 151.18), (21.32, -157.92)]
+            positions = []
+            for i in range(count):
+                if i % 2:
+                    lat, lon = rng.choice(hubs)
+                    lat, lon = lat + rng.gauss(0, 2), (lon + rng.gauss(0, 3) + 180) % 360 - 180
+                else:
+                    lat, lon = rng.uniform(-70, 70), rng.uniform(-180, 180)
+                positions.append((max(-89.0, min(89.0, lat)), lon))
+            db.session.execute(Flight.__table__.insert(), [
+                {"flight_number": f"BV{i}", "airline": "Bench Air", "status": "active",
+                 "departure_airport": "LHR", "arrival_airport": "JFK",
+                 "current_lat": lat, "current_lon": lon, "position_source": "live",
+                 "altitude": 11000.0, "speed": 850.0}
+                for i, (lat, lon) in enumerate(positions)
+            ])
+            db.session.execute(SavedFlight.__table__.insert(), [
+                {"owner_id": OWNER_ID, "flight_number": f"BV{i}"} for i in range(count)
+            ])
+            # Another session's flights, which must never show up
+            db.session.execute(Flight.__table__.insert(), [
+                {"flight_number": "BVX", "airline": "Bench Air", "status": "active",
+                 "current_lat": 51.5, "current_lon": -0.1, "position_source": "live"}
+            ])
+            db.session.execute(SavedFlight.__table__.insert(), [{"owner_id": "someone-else", "flight_number": "BVX"}])
+            db.session.commit()
+
+            everything = json.dumps([flight.to_dict() for flight in Flight.query.all()])
+            all_kb = len(everything) / 1024
+            db.session.remove()
+
+            for name, south, west, north, east, zoom in VIEWPORTS:
+                start = time.perf_counter()
+                result = flights_in_bbox(OWNER_ID, south, west, north, east, zoom)
+                payload = json.dumps(result)
+                elapsed = (time.perf_counter() - start) * 1000
+
+                expected = sum(in_box(lat, lon, south, west, north, east) for lat, lon in positions)
+                total = len(result["flights"]) + sum(cluster["count"] for cluster in result["clusters"])
+                if total != expected:
+                    print(f"FAIL {name}: {total} flights returned, {expected} in the box")
+                    passed = False
+                print(f"{count:>8} {name:>9} {expected:>7} {len(result['flights']):>6} "
+                      f"{len(result['clusters']):>9} {elapsed:>10.1f} {len(payload) / 1024:>13.1f} {all_kb:>17.1f}")
+                db.session.remove()
+
+        Flight.query.delete()
+        db.session.commit()
+
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Compare gunicorn worker classes under a slow upstream
+
+Starts the app under gunicorn with sync, gthread and gevent workers in turn
+(gevent is skipped unless it is installed: pip install .[async]) and fires
+concurrent GET /api/flights/details/<flight> requests at it. Each request
+looks up a flight that isn't stored or cached, so it waits on the local
+AviationStack stub, which answers after --latency seconds. Reports
+requests/sec, p50/p99 latency and errors for each worker class.
+
+The load generator, stub and server share the machine, so give it a few
+cores; on one core they compete for CPU and the gevent numbers flatten out.
+
+Uses DATABASE_URL if set, otherwise a temporary SQLite file.
+
+Usage: python -m benchmarks.bench_worker_classes [--latency 0.5] [--concurrency 200] [--requests 1000]
+"""
+import argparse
+import importlib.util
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return True
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    return False
+
+
+def start_gunicorn(worker_class, workers, port, env):
+    command = [
+        sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py",
+        "-b", f"127.0.0.1:{port}", "-w", str(workers), "-k", worker_class,
+    ]
+    if worker_class == "sync":
+        # gunicorn.conf.py sets threads, which would turn sync workers into gthread
+        command += ["--threads", "1"]
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run_load(base_url, concurrency, total):
+    local = threading.local()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(index):
+        nonlocal errors
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            ok = local.session.get(f"{base_url}/api/flights/details/ZZ{index}", timeout=60).status_code == 200
+        except requests.exceptions.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            errors += not ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    cuts = statistics.quantiles(latencies, n=100)
+    return total / wall, cuts[49], cuts[98], errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gunicorn worker class comparison")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub response latency (s)")
+    parser.add_argument("--concurrency", type=int, default=200, help="concurrent client connections")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per worker class")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    args = parser.parse_args()
+
+    stub_port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_aviationstack", "--port", str(stub_port), "--latency", str(args.latency)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    env = dict(
+        os.environ,
+        AVIATION_API_BASE_URL=f"http://127.0.0.1:{stub_port}/v1",
+        AVIATION_API_POOL_SIZE=str(args.concurrency),
+        FLIGHT_SCHEDULER_ENABLED="false",
+    )
+    if not env.get("DATABASE_URL"):
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "init-db"], cwd=ROOT, env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+    worker_classes = ["sync", "gthread"]
+    if importlib.util.find_spec("gevent") and importlib.util.find_spec("psycogreen"):
+        worker_classes.append("gevent")
+    else:
+        print("gevent not installed (pip install .[async]); skipping the gevent worker")
+
+    print(f"stub latency {args.latency}s, {args.workers} workers, {args.concurrency} concurrent clients, "
+          f"{args.requests} requests, gthread threads {env.get('GUNICORN_THREADS', '32')}")
+    print(f"{'worker class':>12} {'req/s':>8} {'p50 (s)':>8} {'p99 (s)':>8} {'errors':>7}")
+    try:
+        for worker_class in worker_classes:
+            port = free_port()
+            server = start_gunicorn(worker_class, args.workers, port, env)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                if not wait_for(f"{base_url}/api/stats"):
+                    print(f"{worker_class:>12} did not start")
+                    continue
+                rate, p50, p99, errors = run_load(base_url, args.concurrency, args.requests)
+                print(f"{worker_class:>12} {rate:>8.1f} {p50:>8.2f} {p99:>8.2f} {errors:>7}")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
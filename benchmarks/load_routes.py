@@ -0,0 +1,315 @@
+"""
+Load test every API endpoint against the simulated upstream
+
+Serves the app over HTTP (threaded werkzeug server, in this process) with
+AviationStack replaced by benchmarks/stub_aviationstack.py, then runs one
+phase per endpoint: every simulated session adds a watchlist, polls each
+read endpoint, opens the live update stream and finally removes its
+flights. For each phase it reports requests/sec, p50/p95/p99 latency,
+failed requests (5xx or no response), and upstream API calls and database
+queries per request.
+
+Each run is appended to a JSON lines file (--results) together with the
+git commit and settings. The table compares p95 latency and query and
+upstream counts with the last stored run that used the same settings and
+flags regressions (--fail-on-regression exits non-zero on any).
+
+Upstream behaviour comes from the stub: --replay serves recorded flights
+instead of synthetic ones, and --upstream-latency, --error-rate and
+--rate-limit inject slow responses, 500s and 429s.
+
+Uses DATABASE_URL if set, otherwise a temporary SQLite file.
+
+Usage: python -m benchmarks.load_routes [--users 20] [--flights-per-user 10] [--requests-per-user 10] [--concurrency 8]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+os.environ["FLIGHT_SCHEDULER_ENABLED"] = "false"
+
+from benchmarks.stub_aviationstack import Recordings, start_stub_server  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, "benchmarks", "results", "load_routes.jsonl")
+
+# A phase regresses when its p95 grows by more than this share (and by at
+# least REGRESSION_MIN_SECONDS), or when it makes more queries or upstream
+# calls per request than the previous run
+REGRESSION_TOLERANCE = 0.25
+REGRESSION_MIN_SECONDS = 0.002
+
+
+class User:
+    """One browser session with its own watchlist"""
+
+    def __init__(self, flights):
+        self.session = requests.Session()
+        self.flights = flights
+        self.version = 0
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args):
+        with self._lock:
+            self.value += 1
+
+
+def read_first_event(user, response):
+    """Read the stream up to the end of its first event, then hang up"""
+    for line in response.iter_lines():
+        if not line:
+            break
+    response.close()
+
+
+def run_phase(base_url, workers, build, stub, queries):
+    """
+    Send each worker's requests from its own thread
+
+    Args:
+        workers (list): Lists of users, one per thread
+        build (callable): user -> list of (method, path, json body, response hook)
+
+    Returns:
+        dict: Phase results
+    """
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    def work(users):
+        nonlocal failures
+        for user in users:
+            for method, path, body, hook in build(user):
+                started = time.perf_counter()
+                try:
+                    response = user.session.request(method, base_url + path, json=body, timeout=60,
+                                                    stream=hook is read_first_event)
+                    ok = response.status_code < 500
+                    if hook:
+                        hook(user, response)
+                except requests.exceptions.RequestException:
+                    ok = False
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    failures += not ok
+
+    upstream_before, queries_before = stub.calls, queries.value
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(workers)) as pool:
+        list(pool.map(work, workers))
+    wall = time.perf_counter() - started
+
+    count = len(latencies)
+    cuts = statistics.quantiles(latencies, n=100) if count > 1 else [latencies[0] if latencies else 0.0] * 99
+    return {
+        "requests": count,
+        "rps": count / wall if wall else 0.0,
+        "p50": cuts[49],
+        "p95": cuts[94],
+        "p99": cuts[98],
+        "failures": failures,
+        "upstream_per_request": (stub.calls - upstream_before) / max(count, 1),
+        "queries_per_request": (queries.value - queries_before) / max(count, 1),
+    }
+
+
+def regressions(phase, current, previous):
+    """Regression descriptions for one phase against the previous run"""
+    if not previous:
+        return []
+    found = []
+    if (current["p95"] > previous["p95"] * (1 + REGRESSION_TOLERANCE)
+            and current["p95"] - previous["p95"] > REGRESSION_MIN_SECONDS):
+        found.append(f"{phase}: p95 {previous['p95'] * 1000:.1f} -> {current['p95'] * 1000:.1f} ms")
+    if current["queries_per_request"] > previous["queries_per_request"] + 0.5:
+        found.append(f"{phase}: queries/request {previous['queries_per_request']:.1f} -> "
+                     f"{current['queries_per_request']:.1f}")
+    if current["upstream_per_request"] > previous["upstream_per_request"] + 0.05:
+        found.append(f"{phase}: upstream calls/request {previous['upstream_per_request']:.2f} -> "
+                     f"{current['upstream_per_request']:.2f}")
+    if current["failures"] > previous["failures"]:
+        found.append(f"{phase}: failures {previous['failures']} -> {current['failures']}")
+    return found
+
+
+def previous_run(path, settings):
+    """The last stored run with the same settings, if any"""
+    if not os.path.exists(path):
+        return None
+    found = None
+    with open(path) as f:
+        for line in f:
+            run = json.loads(line)
+            if run.get("settings") == settings:
+                found = run
+    return found
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of every API endpoint")
+    parser.add_argument("--users", type=int, default=20, help="simulated sessions")
+    parser.add_argument("--flights-per-user", type=int, default=10, help="watchlist length")
+    parser.add_argument("--catalog", type=int, default=200, help="distinct flights to pick from (synthetic mode)")
+    parser.add_argument("--requests-per-user", type=int, default=10, help="requests per session for read endpoints")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent client threads")
+    parser.add_argument("--replay", help="recorded /flights response to serve instead of synthetic flights")
+    parser.add_argument("--upstream-latency", type=float, default=0.02, help="stub response latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of upstream requests that fail with a 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="upstream requests/sec before 429s (0: no limit)")
+    parser.add_argument("--results", default=RESULTS, help="JSON lines file runs are appended to")
+    parser.add_argument("--no-save", action="store_true", help="don't store this run")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    stub = start_stub_server(
+        latency=args.upstream_latency, mode="replay" if args.replay else "synthetic", recordings=args.replay,
+        error_rate=args.error_rate, rate_limit=args.rate_limit, burst=max(1, int(args.rate_limit)), seed=0,
+    )
+    os.environ["AVIATION_API_BASE_URL"] = stub.base_url
+    os.environ.setdefault("WATCHLIST_MAX_FLIGHTS", str(max(50, args.flights_per_user)))
+
+    import aviation_api
+    aviation_api.BASE_URL = stub.base_url
+    from werkzeug.serving import make_server
+    from sqlalchemy import event
+    from main import app
+    from app import db, init_db
+    logging.disable(logging.CRITICAL)
+
+    queries = Counter()
+    with app.app_context():
+        init_db()
+        event.listen(db.engine, "before_cursor_execute", queries)
+        dialect = db.engine.dialect.name
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    rng = random.Random(0)
+    if args.replay:
+        catalog = sorted(Recordings(args.replay).records)
+    else:
+        catalog = [f"{rng.choice(['BA', 'DL', 'UA', 'LH', 'AF'])}{100 + i}" for i in range(args.catalog)]
+    users = [User(rng.sample(catalog, min(args.flights_per_user, len(catalog)))) for _ in range(args.users)]
+    workers = [users[i::args.concurrency] for i in range(min(args.concurrency, len(users)))]
+    repeat = args.requests_per_user
+
+    def keep_version(user, response):
+        user.version = (response.json() or {}).get("version", user.version)
+
+    def each_flight(method, template, hook=None):
+        return lambda user: [(method, template.format(flight=flight), None, hook) for flight in user.flights]
+
+    def cycle(template, hook=None):
+        return lambda user: [
+            ("GET", template.format(flight=user.flights[i % len(user.flights)] if user.flights else "BA1"), None, hook)
+            for i in range(repeat)
+        ]
+
+    phases = [
+        ("add", lambda user: [("POST", "/api/flights/add", {"flight_number": flight}, None) for flight in user.flights]),
+        ("index", cycle("/")),
+        ("list", cycle("/api/flights")),
+        ("details", cycle("/api/flights/details", keep_version)),
+        ("details since", lambda user: [
+            ("GET", f"/api/flights/details?since={user.version}", None, None) for _ in range(repeat)
+        ]),
+        ("flight details", cycle("/api/flights/details/{flight}")),
+        ("flight update", cycle("/api/flights/update/{flight}")),
+        ("flight track", cycle("/api/flights/{flight}/track")),
+        ("in bbox", cycle("/api/flights/in-bbox?bbox=-60,-180,75,180&zoom=3")),
+        ("update all", cycle("/api/flights/update-all")),
+        ("airports", cycle("/api/airports?bbox=51,-1,52,0")),
+        ("nearest airport", cycle("/api/airports/nearest?lat=51.47&lon=-0.45")),
+        ("airport", cycle("/api/airports/LHR")),
+        ("stats", cycle("/api/stats")),
+        ("stream", lambda user: [("GET", "/api/flights/stream", None, read_first_event)]),
+        ("remove", each_flight("DELETE", "/api/flights/remove/{flight}")),
+    ]
+
+    # Give every session its cookie (and so its watchlist) before timing anything
+    for user in users:
+        user.session.get(f"{base_url}/api/flights")
+
+    results = {}
+    for name, build in phases:
+        results[name] = run_phase(base_url, workers, build, stub, queries)
+
+    settings = {key: value for key, value in vars(args).items()
+                if key not in ("results", "no_save", "fail_on_regression")}
+    settings["database"] = dialect
+    previous = previous_run(args.results, settings)
+    previous_phases = (previous or {}).get("phases", {})
+
+    print(f"{dialect}: {args.users} sessions x {args.flights_per_user} flights, {args.concurrency} client threads, "
+          f"upstream {'replay' if args.replay else 'synthetic'} at {args.upstream_latency}s")
+    if previous:
+        print(f"comparing with the run of {previous['timestamp']} ({previous.get('commit') or 'unknown commit'})")
+    print(f"{'endpoint':>16} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'failed':>6} {'upstream':>8} {'queries':>8} {'p95 vs prev':>12}")
+    found = []
+    for name, result in results.items():
+        before = previous_phases.get(name)
+        change = f"{(result['p95'] / before['p95'] - 1) * 100:+.0f}%" if before and before["p95"] else ""
+        problems = regressions(name, result, before)
+        found.extend(problems)
+        print(f"{name:>16} {result['requests']:>8} {result['rps']:>8.1f} {result['p50'] * 1000:>8.1f} "
+              f"{result['p95'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} {result['failures']:>6} "
+              f"{result['upstream_per_request']:>8.2f} {result['queries_per_request']:>8.1f} "
+              f"{change:>12}{'  REGRESSION' if problems else ''}")
+    stub_stats = stub.stats()
+    print(f"upstream: {stub_stats['calls']} calls, {stub_stats['errors']} injected errors, "
+          f"{stub_stats['rate_limited']} rate limited")
+    for problem in found:
+        print(f"regression: {problem}")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+        with open(args.results, "a") as f:
+            f.write(json.dumps({
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "commit": git_commit(),
+                "settings": settings,
+                "phases": results,
+            }) + "\n")
+        print(f"results appended to {args.results}")
+
+    server.shutdown()
+    stub.shutdown()
+    if found and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Load test for per-user watchlists
+
+Simulates many browser sessions, each adding a watchlist of flights drawn
+from a shared catalog with a skewed (Zipf-like) popularity, so popular
+flights end up on thousands of watchlists. Then every session polls its
+list. Reports:
+
+- watchlist entries vs stored flight rows vs upstream API calls (a flight
+  on many watchlists should be fetched and stored once)
+- add and list latency percentiles
+- the query plan of the per-user list query (it should use the owner index)
+
+Runs against the local AviationStack stub. Uses DATABASE_URL if set,
+otherwise a temporary SQLite file.
+
+Usage: python -m benchmarks.load_watchlists [--users 1000] [--flights-per-user 20]
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+os.environ["FLIGHT_SCHEDULER_ENABLED"] = "false"
+
+from benchmarks.stub_aviationstack import start_stub_server  # noqa: E402
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        return "n/a"
+    cuts = statistics.quantiles(samples, n=100)
+    return f"p50 {cuts[49] * 1000:.1f} ms, p95 {cuts[94] * 1000:.1f} ms, p99 {cuts[98] * 1000:.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-user watchlist load test")
+    parser.add_argument("--users", type=int, default=1000, help="number of simulated sessions")
+    parser.add_argument("--flights-per-user", type=int, default=20, help="watchlist length")
+    parser.add_argument("--catalog", type=int, default=2000, help="number of distinct flights to pick from")
+    parser.add_argument("--polls", type=int, default=3, help="list requests per session")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent sessions")
+    parser.add_argument("--latency", type=float, default=0.02, help="stub response latency (s)")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency)
+    os.environ["AVIATION_API_BASE_URL"] = server.base_url
+    os.environ.setdefault("WATCHLIST_MAX_FLIGHTS", str(max(50, args.flights_per_user)))
+
+    import aviation_api
+    aviation_api.BASE_URL = server.base_url
+    from main import app
+    from app import db, init_db
+    from models import Flight, SavedFlight
+    from watchlists import watchlist_query
+    logging.disable(logging.CRITICAL)
+    with app.app_context():
+        init_db()
+
+    rng = random.Random(0)
+    catalog = [f"{rng.choice(['BA', 'DL', 'UA', 'LH', 'AF'])}{100 + i}" for i in range(args.catalog)]
+    weights = [1 / (rank + 1) for rank in range(len(catalog))]
+    watchlists = []
+    for _ in range(args.users):
+        picks = set()
+        while len(picks) < min(args.flights_per_user, len(catalog)):
+            picks.update(rng.choices(catalog, weights, k=args.flights_per_user - len(picks)))
+        watchlists.append(sorted(picks))
+
+    add_times = []
+    list_times = []
+    failures = []
+
+    def simulate(watchlist):
+        client = app.test_client()
+        for flight_number in watchlist:
+            start = time.perf_counter()
+            response = client.post("/api/flights/add", json={"flight_number": flight_number})
+            add_times.append(time.perf_counter() - start)
+            if response.status_code != 201:
+                failures.append((flight_number, response.status_code))
+        for _ in range(args.polls):
+            start = time.perf_counter()
+            response = client.get("/api/flights/details")
+            list_times.append(time.perf_counter() - start)
+            if len(response.get_json()["flights"]) != len(watchlist):
+                failures.append(("list", response.status_code))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(simulate, watchlists))
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        entries = SavedFlight.query.count()
+        flights = Flight.query.count()
+        busiest = max(
+            db.session.query(SavedFlight.flight_number, db.func.count()).group_by(SavedFlight.flight_number),
+            key=lambda row: row[1]
+        )
+        query = watchlist_query("owner").statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+        explain = "EXPLAIN QUERY PLAN " if db.engine.dialect.name == "sqlite" else "EXPLAIN "
+        plan = [" ".join(str(column) for column in row) for row in db.session.execute(db.text(explain + str(query)))]
+        dialect = db.engine.dialect.name
+
+    print(f"{dialect}: {args.users} sessions x {args.flights_per_user} flights "
+          f"from a catalog of {args.catalog}, {args.threads} threads")
+    print(f"finished in {elapsed:.1f}s, {len(failures)} failed requests")
+    print(f"watchlist entries  {entries}")
+    print(f"stored flights     {flights}")
+    print(f"upstream API calls {server.calls}")
+    print(f"most watched       {busiest[0]} on {busiest[1]} watchlists")
+    print(f"add flight         {percentiles(add_times)}")
+    print(f"list watchlist     {percentiles(list_times)}")
+    print("list query plan:")
+    for line in plan:
+        print(f"  {line}")
+
+    server.shutdown()
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Local stand-in for the AviationStack /flights endpoint
+
+Serves flight records with a configurable response latency so benchmarks
+can exercise aviation_api without spending real API quota.
+Supports single lookups (flight_iata) and paginated airline queries
+(airline_iata, optional dep_iata). Records come from one of three modes:
+
+- synthetic (default): deterministic records for any flight number, over a
+  synthetic fleet per airline
+- replay: records from a recorded /flights response (such as
+  benchmarks/fixtures/aviationstack_flights.json); flights that weren't
+  recorded are not found
+- record: requests are forwarded to the real API (with the access key the
+  app sends) and the records it returns are saved for replay
+
+Failures can be injected: --error-rate answers a share of requests with a
+500, and --rate-limit answers requests beyond a token bucket with a 429,
+a Retry-After header and AviationStack's rate_limit_reached error body.
+
+Point the app at it with AVIATION_API_BASE_URL=http://127.0.0.1:<port>/v1
+"""
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+AIRPORTS = ["JFK", "LAX", "ORD", "SEA", "LHR", "CDG", "FRA", "HND", "SIN", "DXB"]
+STATUSES = ["scheduled", "active", "landed"]
+
+# Real API used in record mode
+UPSTREAM_URL = "http://api.aviationstack.com/v1"
+
+
+def make_flight(flight_iata):
+    """Build a deterministic AviationStack-style record for a flight number"""
+    seed = zlib.crc32(flight_iata.encode())
+    departure = AIRPORTS[seed % len(AIRPORTS)]
+    arrival = AIRPORTS[(seed // 7 + 1) % len(AIRPORTS)]
+    if arrival == departure:
+        arrival = AIRPORTS[(seed + 1) % len(AIRPORTS)]
+    scheduled = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=seed % 1440)
+    return {
+        "flight_date": scheduled.date().isoformat(),
+        "flight_status": STATUSES[seed % len(STATUSES)],
+        "departure": {
+            "airport": departure,
+            "iata": departure,
+            "scheduled": scheduled.isoformat(),
+            "actual": None,
+        },
+        "arrival": {
+            "airport": arrival,
+            "iata": arrival,
+            "scheduled": (scheduled + timedelta(hours=6)).isoformat(),
+            "actual": None,
+        },
+        "airline": {"name": f"Airline {flight_iata[:2]}", "iata": flight_iata[:2]},
+        "flight": {"number": flight_iata[2:], "iata": flight_iata},
+        "live": None,
+    }
+
+
+def flight_iata_of(record):
+    return ((record.get("flight") or {}).get("iata") or "").upper()
+
+
+class Recordings:
+    """Flight records by flight number, loaded from and saved to a /flights response file"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.records = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for record in json.load(f).get("data") or []:
+                    self.records.setdefault(flight_iata_of(record), record)
+
+    def get(self, flight_iata):
+        return self.records.get(flight_iata)
+
+    def airline(self, airline_iata):
+        return [record for flight_iata, record in sorted(self.records.items()) if flight_iata[:2] == airline_iata]
+
+    def add(self, records):
+        """Keep the records and rewrite the file"""
+        with self._lock:
+            for record in records:
+                if flight_iata_of(record):
+                    self.records[flight_iata_of(record)] = record
+            if self.path:
+                data = list(self.records.values())
+                with open(self.path, "w") as f:
+                    json.dump({"pagination": {"count": len(data), "total": len(data)}, "data": data}, f, indent=2)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.endswith("/flights"):
+            self.send_error(404)
+            return
+
+        self.server.record_call()
+        retry_after = self.server.take_token()
+        if retry_after is not None:
+            self.server.record_failure("rate_limited")
+            self._send_json(429, {"error": {
+                "code": "rate_limit_reached",
+                "message": "The given user account has sent too many requests in a given amount of time.",
+            }}, {"Retry-After": str(retry_after)})
+            return
+
+        time.sleep(self.server.response_latency())
+        if self.server.error_rate and self.server.random() < self.server.error_rate:
+            self.server.record_failure("errors")
+            self._send_json(500, {"error": {"code": "internal_error", "message": "Simulated upstream failure"}})
+            return
+
+        if self.server.mode == "record":
+            self._forward(url)
+            return
+
+        params = parse_qs(url.query)
+        flight_iata = params.get("flight_iata", [""])[0].upper()
+        airline_iata = params.get("airline_iata", [""])[0].upper()
+        dep_iata = params.get("dep_iata", [""])[0].upper()
+        limit = int(params.get("limit", ["100"])[0])
+        offset = int(params.get("offset", ["0"])[0])
+
+        if self.server.mode == "replay":
+            if flight_iata:
+                matches = [record for record in [self.server.recordings.get(flight_iata)] if record]
+            else:
+                matches = self.server.recordings.airline(airline_iata) if airline_iata else []
+        elif flight_iata:
+            matches = [make_flight(flight_iata)]
+        elif airline_iata:
+            matches = [make_flight(f"{airline_iata}{number}") for number in range(1, self.server.fleet_size + 1)]
+        else:
+            matches = []
+        if dep_iata:
+            matches = [flight for flight in matches if (flight.get("departure") or {}).get("iata") == dep_iata]
+
+        data = matches[offset:offset + limit]
+        self._send_json(200, {
+            "pagination": {"limit": limit, "offset": offset, "count": len(data), "total": len(matches)},
+            "data": data,
+        })
+
+    def _forward(self, url):
+        import requests
+
+        try:
+            response = requests.get(f"{self.server.upstream_url}/flights?{url.query}", timeout=30)
+        except requests.exceptions.RequestException as e:
+            self.server.record_failure("errors")
+            self._send_json(502, {"error": {"code": "upstream_unreachable", "message": str(e)}})
+            return
+        if response.status_code == 200:
+            try:
+                self.server.recordings.add(response.json().get("data") or [])
+            except ValueError:
+                pass
+        body = response.content
+        self.send_response(response.status_code)
+        self.send_header("Content-Type", response.headers.get("Content-Type", "application/json"))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open hundreds of connections at once
+    request_queue_size = 1024
+
+    def __init__(self, address, latency, fleet_size=500, mode="synthetic", recordings=None,
+                 upstream_url=UPSTREAM_URL, jitter=0.0, error_rate=0.0, rate_limit=0.0, burst=1,
+                 seed=None):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.fleet_size = fleet_size
+        self.mode = mode
+        self.recordings = Recordings(recordings)
+        self.upstream_url = upstream_url.rstrip("/")
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = max(burst, 1)
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._calls_lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+
+    def record_call(self):
+        with self._calls_lock:
+            self.calls += 1
+
+    def record_failure(self, counter):
+        with self._calls_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def random(self):
+        with self._calls_lock:
+            return self._random.random()
+
+    def response_latency(self):
+        """Latency for one response: the base latency plus up to `jitter` seconds"""
+        if not self.jitter:
+            return self.latency
+        return self.latency + self.random() * self.jitter
+
+    def take_token(self):
+        """Take a token from the rate limit bucket; returns None, or whole seconds until the next token"""
+        if not self.rate_limit:
+            return None
+        with self._calls_lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return None
+            return max(1, round((1 - self._tokens) / self.rate_limit))
+
+    def stats(self):
+        return {"calls": self.calls, "errors": self.errors, "rate_limited": self.rate_limited}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_stub_server(latency=0.2, host="127.0.0.1", port=0, fleet_size=500, **options):
+    """Start the stub in a background thread and return the server (options as for StubServer)"""
+    server = StubServer((host, port), latency, fleet_size, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.2, help="response latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--mode", choices=["synthetic", "replay", "record"], default="synthetic")
+    parser.add_argument("--recordings", help="recorded /flights response to replay from or record to")
+    parser.add_argument("--upstream", default=UPSTREAM_URL, help="real API base URL for record mode")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests per second before 429s (0: no limit)")
+    parser.add_argument("--burst", type=int, default=1, help="rate limit burst size")
+    parser.add_argument("--seed", type=int, help="random seed for latency jitter and injected errors")
+    args = parser.parse_args()
+    if args.mode != "synthetic" and not args.recordings:
+        parser.error(f"--mode {args.mode} needs --recordings")
+
+    server = StubServer(
+        ("127.0.0.1", args.port), args.latency, mode=args.mode, recordings=args.recordings,
+        upstream_url=args.upstream, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit=args.rate_limit, burst=args.burst, seed=args.seed,
+    )
+    print(f"Serving {args.mode} AviationStack API at {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,78 @@
+import os
+import gzip
+import logging
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: pip install .[compression]
+    brotli = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+
+# gzip level (1-9) and brotli quality (0-11); mid-range values keep the CPU
+# cost per response low, since most responses are compressed on every request
+COMPRESS_GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json", "application/msgpack", "application/javascript", "text/javascript",
+    "text/css", "text/html", "text/plain", "image/svg+xml",
+}
+
+
+def _encoding():
+    """The best encoding the client accepts, or None"""
+    offered = ("br", "gzip") if brotli is not None else ("gzip",)
+    return request.accept_encodings.best_match(offered)
+
+
+def compress_response(response):
+    """
+    Compress a response body with brotli or gzip if the client accepts it
+    
+    Skips small bodies, non-text types, partial and streamed responses
+    (Server-Sent Events); static files are read and compressed. A strong
+    ETag becomes weak, since the bytes on the wire now depend on the encoding.
+    """
+    if response.status_code != 200 or "Content-Encoding" in response.headers:
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    if response.is_streamed and not response.direct_passthrough:
+        return response
+    if response.content_length is not None and response.content_length < COMPRESS_MIN_SIZE:
+        return response
+    
+    response.vary.add("Accept-Encoding")
+    encoding = _encoding()
+    if encoding is None:
+        return response
+    
+    # Static files are passed through as file wrappers; read them into memory
+    response.direct_passthrough = False
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    
+    if encoding == "br":
+        compressed = brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Compress eligible responses of a Flask app"""
+    app.after_request(compress_response)
@@ -0,0 +1,364 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, insert, update
+
+from app import db
+from models import Flight, FlightEvent, SavedFlight
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for new flight events (one query per worker, shared by all streams)
+STREAM_POLL_INTERVAL = float(os.environ.get("STREAM_POLL_INTERVAL", "2"))
+
+# Seconds between keep-alive comments on an idle stream
+STREAM_HEARTBEAT = float(os.environ.get("STREAM_HEARTBEAT", "15"))
+
+# Streams are closed after this many seconds; EventSource reconnects and resumes
+STREAM_MAX_DURATION = float(os.environ.get("STREAM_MAX_DURATION", "3600"))
+
+# Seconds a logged event's transaction may take to commit. PostgreSQL hands
+# out ids when rows are inserted but shows them at commit, so an event can
+# appear after one with a higher id; cursors only move past events this old
+# and newer ones are read again. SQLite serializes writers, so its ids show
+# up in order and need no window.
+EVENT_SETTLE_SECONDS = float(os.environ.get("FLIGHT_EVENT_SETTLE_SECONDS", "15"))
+
+# Open streams per worker. Under threaded workers each stream holds one of
+# the GUNICORN_THREADS threads, so by default streams may take a quarter of
+# them and the rest stay free for other requests; gevent streams only cost a
+# greenlet and are not limited (0 means no limit)
+STREAM_MAX_CONNECTIONS = int(os.environ.get(
+    "STREAM_MAX_CONNECTIONS",
+    "0" if os.environ.get("GUNICORN_WORKER_CLASS") == "gevent" else str(int(os.environ.get("GUNICORN_THREADS", "32")) // 4)
+))
+
+# Seconds a client turned away by STREAM_MAX_CONNECTIONS waits before trying again
+STREAM_BUSY_RETRY = float(os.environ.get("STREAM_BUSY_RETRY", "60"))
+
+# Messages buffered per client before a slow client is told to resync
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", "256"))
+
+# How long flight events are kept for clients resuming with Last-Event-ID
+EVENT_RETENTION = timedelta(hours=int(os.environ.get("FLIGHT_EVENT_RETENTION_HOURS", "24")))
+
+# Sent to clients that fell too far behind; they should reload the full list
+RESET_MESSAGE = "event: reset\ndata: {}\n\n"
+
+# Sent to clients when this worker has no stream to spare; they should poll until they get one
+BUSY_MESSAGE = "event: busy\ndata: {}\n\n"
+
+
+def record_flight_events(flight_numbers, event_type="update", owner_id=None):
+    """
+    Log flight events in the current session (committed by the caller)
+
+    Flights logged as updated get the new event's id as their version.
+
+    Args:
+        flight_numbers (list): The flights the events are about
+        event_type (str): "update" or "remove", or "add"/"remove" for a
+            single watchlist
+        owner_id (str): The watchlist, for events that only concern one
+    """
+    if not flight_numbers:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {"flight_number": flight_number, "event_type": event_type, "owner_id": owner_id, "created_at": now}
+        for flight_number in flight_numbers
+    ]
+    events = db.session.execute(
+        insert(FlightEvent).returning(FlightEvent.id, FlightEvent.flight_number, sort_by_parameter_order=True),
+        rows
+    ).all()
+
+    if event_type == "update" and owner_id is None:
+        table = Flight.__table__
+        db.session.execute(
+            update(table).where(table.c.flight_number == bindparam("b_flight_number")).values(version=bindparam("b_version")),
+            [{"b_flight_number": flight_number, "b_version": event_id} for event_id, flight_number in events]
+        )
+
+
+def record_flight_event(flight_number, event_type="update", owner_id=None):
+    """Log one flight event in the current session (committed by the caller)"""
+    record_flight_events([flight_number], event_type, owner_id)
+
+
+def format_events(events, cursor):
+    """
+    Turn flight events into Server-Sent Events messages
+
+    Only the latest event per flight is sent, and update events carry the
+    flight's current stored data.
+
+    Args:
+        events (list): FlightEvent rows in id order
+        cursor (int): Settled event id the client has seen everything up to,
+            sent as the message id so a reconnect resumes from it
+
+    Returns:
+        list: (event id, SSE message text) tuples in id order
+    """
+    latest = {}
+    for event in events:
+        latest.pop(event.flight_number, None)
+        latest[event.flight_number] = event
+
+    updated = [event.flight_number for event in latest.values() if event.event_type == "update"]
+    flights = {}
+    if updated:
+        flights = {
+            flight.flight_number: flight
+            for flight in Flight.query.filter(Flight.flight_number.in_(updated)).all()
+        }
+
+    messages = []
+    for event in latest.values():
+        if event.event_type == "update":
+            flight = flights.get(event.flight_number)
+            if flight is None:
+                continue
+            data = flight.to_dict()
+        else:
+            data = {"flight_number": event.flight_number}
+        messages.append((event.id, f"id: {cursor}\nevent: {event.event_type}\ndata: {json.dumps(data)}\n\n"))
+    return messages
+
+
+class FlightEventBroadcaster:
+    """
+    Fan flight events out to every open stream in this worker
+
+    A single background thread polls the event log and pushes new messages
+    onto each subscriber's queue, so the database sees one query per poll
+    interval regardless of how many clients are connected. Events after the
+    settled id are read again on the next poll, in case one with a lower id
+    commits late; the ids already sent are remembered so each goes out once.
+    Each stream only gets events for the flights on its own watchlist; the
+    watchlist's add/remove events keep that set current.
+    """
+
+    def __init__(self, app, poll_interval=STREAM_POLL_INTERVAL):
+        self.app = app
+        self.poll_interval = poll_interval
+        # Subscriber queue -> (owner id, set of watched flight numbers)
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_id = None
+        self._delivered = set()
+        self._last_pruned = 0.0
+
+    def subscribe(self, cursor, owner_id, flight_numbers):
+        """
+        Start receiving messages about the flights on a watchlist
+
+        Args:
+            cursor (int): Settled event id read before subscribing; if the
+                broadcaster is idle, it sends every event after it
+            owner_id (str): The stream's watchlist
+            flight_numbers (iterable): The flights on it when subscribing
+
+        Returns:
+            queue.Queue: The subscriber's message queue, or None if
+                STREAM_MAX_CONNECTIONS streams are already open
+        """
+        subscriber = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        with self._lock:
+            if STREAM_MAX_CONNECTIONS and len(self._subscribers) >= STREAM_MAX_CONNECTIONS:
+                return None
+            if self._last_id is None:
+                self._last_id = cursor
+            self._subscribers[subscriber] = (owner_id, set(flight_numbers))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="flight-events", daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.pop(subscriber, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"Error polling flight events: {str(e)}")
+
+    def poll_once(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            owners = {owner_id for owner_id, _ in self._subscribers.values()}
+            if not subscribers:
+                # Nobody is listening; start from the next subscriber's cursor
+                self._last_id = None
+                self._delivered = set()
+                return
+
+        with self.app.app_context():
+            try:
+                # Read the cursor first, so every event up to it is visible below
+                settled = settled_event_id()
+                events = [
+                    event for event in FlightEvent.query.filter(
+                        FlightEvent.id > self._last_id,
+                        db.or_(FlightEvent.owner_id.is_(None), FlightEvent.owner_id.in_(owners))
+                    ).order_by(FlightEvent.id)
+                    if event.id not in self._delivered
+                ]
+                self._last_id = max(self._last_id, settled)
+                self._delivered = {event_id for event_id in self._delivered if event_id > self._last_id}
+                self._delivered.update(event.id for event in events if event.id > self._last_id)
+                flight_events = [event for event in events if event.owner_id is None]
+                messages = format_events(flight_events, self._last_id) if flight_events else []
+                flight_numbers = {event.id: event.flight_number for event in flight_events}
+                watchlist_events = [
+                    (event.owner_id, event.event_type, event.flight_number)
+                    for event in events if event.owner_id is not None
+                ]
+
+                self._prune_old_events()
+            finally:
+                db.session.remove()
+
+        deliveries = []
+        with self._lock:
+            for subscriber in subscribers:
+                if subscriber not in self._subscribers:
+                    continue
+                owner_id, watched = self._subscribers[subscriber]
+                # A flight added or removed in this batch still gets its messages
+                relevant = set(watched)
+                for event_owner_id, event_type, flight_number in watchlist_events:
+                    if event_owner_id != owner_id:
+                        continue
+                    if event_type == "add":
+                        watched.add(flight_number)
+                        relevant.add(flight_number)
+                    else:
+                        watched.discard(flight_number)
+                deliveries.append((subscriber, [
+                    message for message in messages if flight_numbers[message[0]] in relevant
+                ]))
+
+        for subscriber, messages in deliveries:
+            for message in messages:
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    # Too slow to keep up: drop its backlog and make it resync
+                    with subscriber.mutex:
+                        subscriber.queue.clear()
+                    subscriber.put_nowait((None, RESET_MESSAGE))
+                    break
+
+    def _prune_old_events(self):
+        if time.monotonic() - self._last_pruned < 3600:
+            return
+        self._last_pruned = time.monotonic()
+        deleted = FlightEvent.query.filter(FlightEvent.created_at < datetime.utcnow() - EVENT_RETENTION).delete()
+        db.session.commit()
+        if deleted:
+            logger.info(f"Pruned {deleted} old flight events")
+
+
+def settled_event_id():
+    """
+    Latest event id that no event can still appear below
+
+    Every event up to it is committed, so a reader that has seen them can
+    move its cursor here without missing a late commit. Outside SQLite that
+    is the latest event logged more than EVENT_SETTLE_SECONDS ago.
+    """
+    query = db.session.query(db.func.max(FlightEvent.id))
+    if EVENT_SETTLE_SECONDS > 0 and db.session.get_bind().dialect.name != "sqlite":
+        query = query.filter(FlightEvent.created_at < datetime.utcnow() - timedelta(seconds=EVENT_SETTLE_SECONDS))
+    return query.scalar() or 0
+
+
+def stream_flight_events(broadcaster, owner_id, last_event_id=None):
+    """
+    Generate a Server-Sent Events stream of changes to a watchlist's flights
+
+    Args:
+        broadcaster (FlightEventBroadcaster): This worker's broadcaster
+        owner_id (str): The watchlist the stream follows
+        last_event_id (int): Resume after this cursor (from Last-Event-ID)
+
+    Yields:
+        str: SSE message text
+    """
+    # Read the cursor, then subscribe before reading the log: the broadcaster
+    # sends everything after the cursor, and the replay everything visible now
+    try:
+        cursor = settled_event_id()
+        watched = {
+            flight_number for flight_number, in
+            db.session.query(SavedFlight.flight_number).filter(SavedFlight.owner_id == owner_id)
+        }
+    finally:
+        db.session.remove()
+    subscriber = broadcaster.subscribe(cursor, owner_id, watched)
+    if subscriber is None:
+        # Every stream this worker allows is open; come back later
+        logger.warning(f"Turned away a flight stream: {STREAM_MAX_CONNECTIONS} streams already open")
+        yield f"retry: {int(STREAM_BUSY_RETRY * 1000)}\n\n"
+        yield BUSY_MESSAGE
+        return
+    try:
+        yield "retry: 5000\n\n"
+
+        replayed = set()
+        if last_event_id is not None:
+            try:
+                oldest = db.session.query(db.func.min(FlightEvent.id)).scalar()
+                if oldest is not None and oldest > last_event_id + 1:
+                    # Events the client missed have been pruned
+                    yield RESET_MESSAGE
+                events = FlightEvent.query.filter(
+                    FlightEvent.id > last_event_id, FlightEvent.owner_id.is_(None),
+                    FlightEvent.flight_number.in_(watched)
+                ).order_by(FlightEvent.id).all()
+                replayed = {event.id for event in events}
+                for _, message in format_events(events, max(cursor, last_event_id)):
+                    yield message
+            finally:
+                # Don't hold a database connection for the life of the stream
+                db.session.remove()
+
+        deadline = time.monotonic() + STREAM_MAX_DURATION
+        while time.monotonic() < deadline:
+            try:
+                event_id, message = subscriber.get(timeout=STREAM_HEARTBEAT)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if event_id in replayed:
+                continue
+            yield message
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster(app):
+    """Return this worker's flight event broadcaster, creating it on first use"""
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                _broadcaster = FlightEventBroadcaster(app)
+    return _broadcaster
@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Cache backend: "memory" (per worker process) or "redis" (shared by all workers)
+CACHE_BACKEND = os.environ.get("FLIGHT_CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.environ.get("FLIGHT_CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.environ.get("FLIGHT_CACHE_MAX_ENTRIES", "1024"))
+
+# Time-to-live (seconds) by flight status
+CACHE_TTL_ACTIVE = int(os.environ.get("FLIGHT_CACHE_TTL_ACTIVE", "60"))
+CACHE_TTL_SCHEDULED = int(os.environ.get("FLIGHT_CACHE_TTL_SCHEDULED", "900"))
+CACHE_TTL_LANDED = int(os.environ.get("FLIGHT_CACHE_TTL_LANDED", "3600"))
+CACHE_TTL_DEFAULT = int(os.environ.get("FLIGHT_CACHE_TTL_DEFAULT", "300"))
+CACHE_TTL_NOT_FOUND = int(os.environ.get("FLIGHT_CACHE_TTL_NOT_FOUND", "600"))
+
+# How long (seconds) expired flight data is kept around to serve when the
+# upstream request budget runs out
+CACHE_STALE_TTL = int(os.environ.get("FLIGHT_CACHE_STALE_TTL", "86400"))
+
+# Seconds between writes of the Redis cache's hit/miss counters; lookups in
+# between are counted in memory, so a get() is a single round trip
+CACHE_STATS_FLUSH_INTERVAL = float(os.environ.get("FLIGHT_CACHE_STATS_FLUSH_INTERVAL", "5"))
+
+# Errors that mean "this flight doesn't exist" and are safe to cache
+NOT_FOUND_ERRORS = {
+    "Flight not found",
+    "No flight data available for this flight number",
+}
+
+
+def normalize_flight_number(flight_number):
+    """Normalize a flight number for use as a cache key (e.g. ' ba 123' -> 'BA123')"""
+    return "".join((flight_number or "").split()).upper()
+
+
+def ttl_for(flight_data):
+    """
+    Pick a cache lifetime for a get_flight_data result
+    
+    Args:
+        flight_data (dict): Flight information or error message
+        
+    Returns:
+        int: TTL in seconds, or None if the result should not be cached
+    """
+    if not flight_data:
+        return None
+    
+    if "error" in flight_data:
+        # Only cache definitive misses, never transient upstream failures
+        return CACHE_TTL_NOT_FOUND if flight_data["error"] in NOT_FOUND_ERRORS else None
+    
+    status = (flight_data.get("status") or "").lower()
+    if status in ("active", "en-route"):
+        return CACHE_TTL_ACTIVE
+    if status == "scheduled":
+        return CACHE_TTL_SCHEDULED
+    if status in ("landed", "arrived", "cancelled"):
+        return CACHE_TTL_LANDED
+    return CACHE_TTL_DEFAULT
+
+
+class MemoryCache:
+    """In-process TTL cache with bounded LRU eviction"""
+    
+    backend = "memory"
+    
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Expired flight data by key: key -> (stored at, value)
+        self._stale = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._keep_stale(key, value)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(value)
+    
+    def get_stale(self, key):
+        """Last flight data stored for a key, even if expired, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and "error" not in entry[1]:
+                return dict(entry[1])
+            stale = self._stale.get(key)
+            if stale is None or stale[0] + CACHE_STALE_TTL <= time.monotonic():
+                return None
+            return dict(stale[1])
+    
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, dict(value))
+            self._entries.move_to_end(key)
+            self._stale.pop(key, None)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def _keep_stale(self, key, value):
+        if "error" in value:
+            return
+        self._stale[key] = (time.monotonic(), value)
+        self._stale.move_to_end(key)
+        while len(self._stale) > self.max_entries:
+            self._stale.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._stale.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stale.clear()
+    
+    def lock(self, key, timeout):
+        # A single process already coalesces lookups in memory
+        return None
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._entries),
+                "stale": len(self._stale),
+                "max_entries": self.max_entries,
+            }
+
+
+class RedisCache:
+    """
+    Cache shared by all gunicorn workers through Redis
+    
+    Entry expiry uses Redis TTLs. Bounded LRU eviction is delegated to the
+    Redis server (configure maxmemory with an allkeys-lru policy). Hit and
+    miss counts are kept in memory and added to the shared counters every
+    CACHE_STATS_FLUSH_INTERVAL seconds.
+    """
+    
+    backend = "redis"
+    key_prefix = "flight_cache:"
+    
+    def __init__(self, url=CACHE_REDIS_URL):
+        import redis
+        
+        self.client = redis.Redis.from_url(url)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._flushed_at = time.monotonic()
+        # Don't lose the last counts before the process exits
+        atexit.register(self.flush_stats)
+    
+    def get(self, key):
+        raw = self.client.get(self.key_prefix + key)
+        with self._lock:
+            if raw is not None:
+                self._hits += 1
+            else:
+                self._misses += 1
+            due = time.monotonic() - self._flushed_at >= CACHE_STATS_FLUSH_INTERVAL
+        if due:
+            self.flush_stats()
+        return json.loads(raw) if raw is not None else None
+    
+    def flush_stats(self):
+        """Add the hits and misses counted since the last flush to the shared counters"""
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            self._hits = self._misses = 0
+            self._flushed_at = time.monotonic()
+        if not (hits or misses):
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.incrby(self.key_prefix + "stats:hits", hits)
+            pipe.incrby(self.key_prefix + "stats:misses", misses)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Could not record flight cache stats: {str(e)}")
+            with self._lock:
+                self._hits += hits
+                self._misses += misses
+    
+    def get_stale(self, key):
+        """Last flight data stored for a key, even if expired, or None"""
+        raw = self.client.get(self.key_prefix + "stale:" + key)
+        return json.loads(raw) if raw is not None else None
+    
+    def set(self, key, value, ttl):
+        raw = json.dumps(value)
+        pipe = self.client.pipeline()
+        pipe.set(self.key_prefix + key, raw, ex=ttl)
+        if "error" not in value:
+            pipe.set(self.key_prefix + "stale:" + key, raw, ex=max(ttl, CACHE_STALE_TTL))
+        pipe.execute()
+    
+    def delete(self, key):
+        self.client.delete(self.key_prefix + key, self.key_prefix + "stale:" + key)
+    
+    def lock(self, key, timeout):
+        """Cross-worker lock used to coalesce duplicate upstream lookups"""
+        return self.client.lock(self.key_prefix + "lock:" + key, timeout=timeout, blocking_timeout=timeout)
+    
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.key_prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+    
+    def stats(self):
+        self.flush_stats()
+        hits, misses = self.client.mget(self.key_prefix + "stats:hits", self.key_prefix + "stats:misses")
+        info = self.client.info("stats")
+        return {
+            "backend": self.backend,
+            "hits": int(hits or 0),
+            "misses": int(misses or 0),
+            "evictions": info.get("evicted_keys", 0),
+            "expirations": info.get("expired_keys", 0),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide flight cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _create_cache()
+    return _cache
+
+
+def _create_cache():
+    if CACHE_BACKEND == "redis":
+        try:
+            cache = RedisCache()
+            logger.info(f"Using Redis flight cache at {CACHE_REDIS_URL}")
+            return cache
+        except Exception as e:
+            logger.error(f"Could not set up Redis flight cache, falling back to memory: {str(e)}")
+    return MemoryCache()
@@ -0,0 +1,219 @@
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Mean Earth radius (IUGG), in kilometres
+EARTH_RADIUS_KM = 6371.0088
+
+# Statuses for which a flight is somewhere between its airports
+AIRBORNE_STATUSES = ("active", "en-route")
+
+
+def to_timestamp(value):
+    """
+    Convert an ISO 8601 string or datetime to seconds since the epoch
+
+    Naive values are taken to be UTC. Returns None for missing or unparseable values.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def route_times(scheduled_departure, actual_departure, scheduled_arrival, actual_arrival):
+    """
+    Departure and expected arrival times of a flight, in seconds since the epoch
+
+    Without an actual arrival time, the scheduled arrival is pushed back by
+    the departure delay so the flight keeps its scheduled duration.
+
+    Returns:
+        tuple: (departure, arrival), either of which may be None
+    """
+    scheduled_departure, actual_departure, scheduled_arrival, actual_arrival = (
+        to_timestamp(value) for value in (scheduled_departure, actual_departure, scheduled_arrival, actual_arrival)
+    )
+    departure = actual_departure or scheduled_departure
+    arrival = actual_arrival
+    if arrival is None and scheduled_arrival is not None:
+        delay = actual_departure - scheduled_departure if actual_departure and scheduled_departure else 0
+        arrival = scheduled_arrival + delay
+    return departure, arrival
+
+
+def _unit_vectors(lat, lon):
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    cos_lat = np.cos(lat)
+    return cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)
+
+
+def _central_angle(lat1, lon1, lat2, lon2):
+    # Haversine form, well conditioned for short routes
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def great_circle_distance(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between points, in kilometres
+
+    Accepts scalars or equal-length arrays of degrees.
+
+    Returns:
+        numpy.ndarray: Distances in kilometres
+    """
+    lat1, lon1, lat2, lon2 = (np.asarray(value, dtype=np.float64) for value in (lat1, lon1, lat2, lon2))
+    return EARTH_RADIUS_KM * _central_angle(lat1, lon1, lat2, lon2)
+
+
+def interpolate_great_circle(lat1, lon1, lat2, lon2, fraction):
+    """
+    Points a given fraction of the way along the great circle between two points
+
+    Uses spherical linear interpolation of unit vectors, so routes crossing
+    the antimeridian or passing near a pole come out right.
+
+    Args:
+        lat1, lon1: Start points in degrees (scalars or arrays)
+        lat2, lon2: End points in degrees
+        fraction: 0 at the start, 1 at the end
+
+    Returns:
+        tuple: (latitudes, longitudes) in degrees, longitudes in [-180, 180]
+    """
+    lat1, lon1, lat2, lon2, fraction = (
+        np.asarray(value, dtype=np.float64) for value in (lat1, lon1, lat2, lon2, fraction)
+    )
+    angle = _central_angle(lat1, lon1, lat2, lon2)
+    sin_angle = np.sin(angle)
+
+    # Fall back to linear weights where the endpoints (nearly) coincide
+    with np.errstate(divide="ignore", invalid="ignore"):
+        short = sin_angle < 1e-12
+        start_weight = np.where(short, 1 - fraction, np.sin((1 - fraction) * angle) / sin_angle)
+        end_weight = np.where(short, fraction, np.sin(fraction * angle) / sin_angle)
+
+    x1, y1, z1 = _unit_vectors(lat1, lon1)
+    x2, y2, z2 = _unit_vectors(lat2, lon2)
+    x = start_weight * x1 + end_weight * x2
+    y = start_weight * y1 + end_weight * y2
+    z = start_weight * z1 + end_weight * z2
+    return np.degrees(np.arctan2(z, np.hypot(x, y))), np.degrees(np.arctan2(y, x))
+
+
+def flight_progress(departure_time, arrival_time, now):
+    """
+    Fraction of the flight completed at a given time
+
+    Args:
+        departure_time, arrival_time: Seconds since the epoch (NaN if unknown)
+        now: Seconds since the epoch
+
+    Returns:
+        numpy.ndarray: Fractions clipped to [0, 1], NaN where the times are unknown or inconsistent
+    """
+    departure_time, arrival_time, now = (
+        np.asarray(value, dtype=np.float64) for value in (departure_time, arrival_time, now)
+    )
+    duration = arrival_time - departure_time
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.clip((now - departure_time) / duration, 0.0, 1.0)
+    return np.where(duration > 0, fraction, np.nan)
+
+
+def estimate_positions(dep_lat, dep_lon, arr_lat, arr_lon, departure_time, arrival_time, now):
+    """
+    Estimate where flights are along their great-circle routes
+
+    All arguments are arrays of the same length (or scalars). Times are
+    seconds since the epoch.
+
+    Returns:
+        tuple: (latitudes, longitudes), NaN where no estimate is possible
+    """
+    fraction = flight_progress(departure_time, arrival_time, now)
+    lat, lon = interpolate_great_circle(dep_lat, dep_lon, arr_lat, arr_lon, np.nan_to_num(fraction))
+    missing = np.isnan(fraction)
+    return np.where(missing, np.nan, lat), np.where(missing, np.nan, lon)
+
+
+def estimate_position(dep_lat, dep_lon, arr_lat, arr_lon, departure_time, arrival_time, now=None):
+    """
+    Estimate one flight's position along its great-circle route
+
+    Args:
+        dep_lat, dep_lon, arr_lat, arr_lon (float): Airport coordinates
+        departure_time, arrival_time (float): Seconds since the epoch (see route_times)
+        now (float): Seconds since the epoch (defaults to the current time)
+
+    Returns:
+        tuple: (lat, lon), or (None, None) if the times are unknown
+    """
+    if departure_time is None or arrival_time is None:
+        return None, None
+    lat, lon = estimate_positions(
+        dep_lat, dep_lon, arr_lat, arr_lon, departure_time, arrival_time,
+        datetime.now(timezone.utc).timestamp() if now is None else now
+    )
+    if math.isnan(lat):
+        return None, None
+    return float(lat), float(lon)
+
+
+def refresh_estimated_positions(flights, now=None):
+    """
+    Move estimated positions of airborne flights to where they should be now
+
+    Stored estimates date from the last upstream fetch; this extrapolates
+    them along the route in one vectorized pass, so clients see flights move
+    between fetches. Live positions are left alone.
+
+    Args:
+        flights (list): Flight dicts (Flight.to_dict() format), updated in place
+        now (float): Seconds since the epoch (defaults to the current time)
+
+    Returns:
+        int: Number of flights whose position was moved
+    """
+    estimated = [
+        flight for flight in flights
+        if flight.get("position_source") == "estimated"
+        and (flight.get("status") or "").lower() in AIRBORNE_STATUSES
+        and None not in (flight.get("departure_lat"), flight.get("departure_lon"),
+                         flight.get("arrival_lat"), flight.get("arrival_lon"))
+    ]
+    if not estimated:
+        return 0
+
+    def column(key):
+        return np.array([flight[key] for flight in estimated], dtype=np.float64)
+
+    times = np.array([
+        route_times(
+            flight.get("scheduled_departure"), flight.get("actual_departure"),
+            flight.get("scheduled_arrival"), flight.get("actual_arrival")
+        )
+        for flight in estimated
+    ], dtype=np.float64)
+
+    lat, lon = estimate_positions(
+        column("departure_lat"), column("departure_lon"), column("arrival_lat"), column("arrival_lon"),
+        times[:, 0], times[:, 1], datetime.now(timezone.utc).timestamp() if now is None else now
+    )
+    moved = 0
+    for flight, flight_lat, flight_lon in zip(estimated, lat.tolist(), lon.tolist()):
+        if not math.isnan(flight_lat):
+            flight["current_lat"] = round(flight_lat, 5)
+            flight["current_lon"] = round(flight_lon, 5)
+            moved += 1
+    return moved
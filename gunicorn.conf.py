@@ -0,0 +1,27 @@
+import os
+import importlib.util
+
+# Gunicorn picks this file up automatically from the working directory.
+#
+# Threaded workers so long-lived /api/flights/stream connections don't each
+# tie up a whole worker process. A stream still holds a thread while it is
+# open, so events.py caps open streams at a quarter of GUNICORN_THREADS
+# (STREAM_MAX_CONNECTIONS) and asks further clients to poll instead. Use
+# gevent for many open streams. Set GUNICORN_WORKER_CLASS=gevent (requires
+# pip install .[async]) to serve each request in a greenlet instead: upstream
+# API calls and database queries then yield to other requests while they
+# wait, so a worker isn't limited to GUNICORN_THREADS slow requests at a time.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", "32"))
+
+# Concurrent requests per gevent worker
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+
+def post_worker_init(worker):
+    """Make psycopg2 wait for the database cooperatively under gevent"""
+    # Without psycopg2 (a local SQLite database) there is nothing to patch
+    if "gevent" in worker.cfg.worker_class_str and importlib.util.find_spec("psycopg2"):
+        from psycogreen.gevent import patch_psycopg
+
+        patch_psycopg()
@@ -1,7 +1,13 @@
-import logging
-from app import app
-from routes import *  # noqa: F401, F403
+from app import create_app, init_db
+from scheduler import start_scheduler
+
+app = create_app()
+
+# Refresh tracked flights in the background (no-op unless FLIGHT_SCHEDULER_ENABLED is set)
+start_scheduler(app)
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.DEBUG)
+    # The development server sets up its own database; deployments run `flask --app app init-db`
+    with app.app_context():
+        init_db()
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,346 @@
+import os
+import time
+import logging
+import threading
+from bisect import bisect_left
+from functools import wraps
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from flight_cache import get_cache
+from quota import get_quota
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Collect per-route latency, database query and flight lookup metrics and
+# serve them at /metrics (each gunicorn worker keeps its own)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Add a Server-Timing header with the database, lookup and total time of each request
+SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Histogram buckets: request and lookup latency, query latency (seconds),
+# and queries per request
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (seconds), safe to share between threads"""
+    
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, seconds):
+        with self._lock:
+            self._counts[bisect_left(self.buckets, seconds)] += 1
+            self._sum += seconds
+    
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket containing it"""
+        with self._lock:
+            total = sum(self._counts)
+            if not total:
+                return None
+            rank = q * total
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), self._counts):
+                running += count
+                if running >= rank:
+                    return bound
+    
+    def cumulative(self):
+        """
+        Cumulative bucket counts, as Prometheus histograms report them
+        
+        Returns:
+            tuple: ([(upper bound, observations <= bound), ..., (inf, count)], sum)
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+        running = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            pairs.append((bound, running))
+        return pairs, total_sum
+    
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+        labels = [f"le_{bound}" for bound in self.buckets] + ["le_inf"]
+        return {
+            "count": sum(counts),
+            "sum": round(total_sum, 6),
+            "buckets": dict(zip(labels, counts)),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Metrics:
+    """
+    Per-process request metrics
+    
+    Per (method, route): request counts by status, a latency histogram, a
+    histogram of queries per request, and the total time spent in database
+    queries and flight lookups. Also every query's latency and the latency of
+    each instrumented lookup function.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.request_latency = {}
+        self.request_queries = {}
+        self.request_db_seconds = {}
+        self.request_lookup_seconds = {}
+        self.query_latency = LatencyHistogram(QUERY_BUCKETS)
+        self.lookup_latency = {}
+    
+    def observe_request(self, method, route, status, seconds, queries, db_seconds, lookup_seconds):
+        key = (method, route)
+        with self._lock:
+            self.requests[key + (status,)] = self.requests.get(key + (status,), 0) + 1
+            self.request_db_seconds[key] = self.request_db_seconds.get(key, 0.0) + db_seconds
+            self.request_lookup_seconds[key] = self.request_lookup_seconds.get(key, 0.0) + lookup_seconds
+            latency = self.request_latency.get(key)
+            if latency is None:
+                latency = self.request_latency[key] = LatencyHistogram(REQUEST_BUCKETS)
+                self.request_queries[key] = LatencyHistogram(QUERY_COUNT_BUCKETS)
+            query_counts = self.request_queries[key]
+        latency.observe(seconds)
+        query_counts.observe(queries)
+    
+    def observe_lookup(self, function, seconds):
+        histogram = self.lookup_latency.get(function)
+        if histogram is None:
+            with self._lock:
+                histogram = self.lookup_latency.setdefault(function, LatencyHistogram(REQUEST_BUCKETS))
+        histogram.observe(seconds)
+    
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        from aviation_api import get_client
+        
+        with self._lock:
+            requests = dict(self.requests)
+            request_latency = dict(self.request_latency)
+            request_queries = dict(self.request_queries)
+            db_seconds = dict(self.request_db_seconds)
+            lookup_seconds = dict(self.request_lookup_seconds)
+            lookup_latency = dict(self.lookup_latency)
+        
+        lines = []
+        _family(lines, "http_requests_total", "counter", "Requests by route and status", [
+            ({"method": method, "route": route, "status": status}, count)
+            for (method, route, status), count in sorted(requests.items())
+        ])
+        _histograms(lines, "http_request_duration_seconds", "Request latency by route", [
+            ({"method": method, "route": route}, histogram)
+            for (method, route), histogram in sorted(request_latency.items())
+        ])
+        _histograms(lines, "http_request_db_queries", "Database queries per request, by route", [
+            ({"method": method, "route": route}, histogram)
+            for (method, route), histogram in sorted(request_queries.items())
+        ])
+        _family(lines, "http_request_db_seconds_total", "counter", "Time spent in database queries, by route", [
+            ({"method": method, "route": route}, seconds) for (method, route), seconds in sorted(db_seconds.items())
+        ])
+        _family(lines, "http_request_lookup_seconds_total", "counter",
+                "Time spent in flight data lookups (cache and AviationStack), by route", [
+                    ({"method": method, "route": route}, seconds)
+                    for (method, route), seconds in sorted(lookup_seconds.items())
+                ])
+        _histograms(lines, "db_query_duration_seconds", "Latency of every database query", [({}, self.query_latency)])
+        _histograms(lines, "flight_lookup_duration_seconds", "Latency of flight data lookups", [
+            ({"function": function}, histogram) for function, histogram in sorted(lookup_latency.items())
+        ])
+        
+        try:
+            cache = get_cache().stats()
+            lookups = cache["hits"] + cache["misses"]
+            for name in ("hits", "misses", "evictions", "expirations"):
+                _family(lines, f"flight_cache_{name}_total", "counter", f"Flight cache {name}",
+                        [({"backend": cache["backend"]}, cache[name])])
+            _family(lines, "flight_cache_hit_ratio", "gauge", "Share of flight cache lookups that were hits",
+                    [({"backend": cache["backend"]}, cache["hits"] / lookups if lookups else 0.0)])
+        except Exception as e:
+            logger.error(f"Could not read flight cache stats for metrics: {str(e)}")
+        
+        client = get_client()
+        upstream = client.stats()
+        for name in ("requests", "retries", "failures"):
+            _family(lines, f"aviationstack_{name}_total", "counter", f"AviationStack API {name}", [({}, upstream[name])])
+        _family(lines, "aviationstack_circuit_open", "gauge", "1 while the circuit breaker rejects calls",
+                [({}, 0 if upstream["circuit"] == "closed" else 1)])
+        _histograms(lines, "aviationstack_request_duration_seconds", "Latency of AviationStack API requests",
+                    [({}, client.latency)])
+        
+        try:
+            quota = get_quota().stats()
+            _family(lines, "aviationstack_quota_used", "gauge", "Upstream requests counted against the budget", [
+                ({"period": "day"}, quota["day_used"]), ({"period": "month"}, quota["month_used"])
+            ])
+        except Exception as e:
+            logger.error(f"Could not read quota stats for metrics: {str(e)}")
+        
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _family(lines, name, kind, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+
+def _histograms(lines, name, help_text, histograms):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in histograms:
+        pairs, total_sum = histogram.cumulative()
+        for bound, count in pairs:
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': _number(bound)})} {count}")
+        lines.append(f"{name}_sum{_labels(labels)} {_number(total_sum)}")
+        lines.append(f"{name}_count{_labels(labels)} {pairs[-1][1]}")
+
+
+_metrics = Metrics()
+_lookup_depth = threading.local()
+
+
+def get_metrics():
+    """The process-wide metrics registry"""
+    return _metrics
+
+
+def timed_lookup(fn):
+    """
+    Record how long a flight lookup function takes
+    
+    The time also counts towards the current request's lookup time, once
+    for the outermost instrumented call.
+    """
+    name = fn.__name__
+    
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not METRICS_ENABLED:
+            return fn(*args, **kwargs)
+        depth = getattr(_lookup_depth, "value", 0)
+        _lookup_depth.value = depth + 1
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            _lookup_depth.value = depth
+            _metrics.observe_lookup(name, elapsed)
+            if depth == 0 and has_request_context() and "metrics_started" in g:
+                g.metrics_lookup_seconds += elapsed
+    
+    return wrapper
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if METRICS_ENABLED:
+        conn.info.setdefault("metrics_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    _metrics.query_latency.observe(elapsed)
+    if has_request_context() and "metrics_started" in g:
+        g.metrics_queries += 1
+        g.metrics_db_seconds += elapsed
+
+
+def _handle_error(context):
+    # A failed query never reaches after_cursor_execute
+    started = context.connection.info.get("metrics_query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def _start_request():
+    if METRICS_ENABLED:
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_db_seconds = 0.0
+        g.metrics_lookup_seconds = 0.0
+
+
+def _finish_request(response):
+    if "metrics_started" not in g:
+        return response
+    elapsed = time.perf_counter() - g.metrics_started
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    _metrics.observe_request(
+        request.method, route, response.status_code, elapsed,
+        g.metrics_queries, g.metrics_db_seconds, g.metrics_lookup_seconds
+    )
+    if SERVER_TIMING_ENABLED:
+        db_ms = g.metrics_db_seconds * 1000
+        lookup_ms = g.metrics_lookup_seconds * 1000
+        total_ms = elapsed * 1000
+        response.headers["Server-Timing"] = (
+            f'db;dur={db_ms:.1f};desc="{g.metrics_queries} queries", '
+            f'lookup;dur={lookup_ms:.1f};desc="Flight data lookups", '
+            f'app;dur={max(total_ms - db_ms - lookup_ms, 0.0):.1f}, '
+            f'total;dur={total_ms:.1f}'
+        )
+    return response
+
+
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(_metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_metrics(app):
+    """
+    Time every request of a Flask app and serve the metrics at /metrics
+    
+    Register this before other after_request hooks (such as compression)
+    so their time is included; Flask runs those hooks in reverse order.
+    """
+    # Engine events are global, so only listen once however many apps are built
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule("/metrics", "metrics", metrics_endpoint)
@@ -0,0 +1,169 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def _flight_number_keys(conn):
+    """
+    Unique indexes on flight_number and a cascading FK from saved_flight to flight
+    
+    Databases created before this revision may contain duplicate rows and
+    saved flights without details, so clean those up before adding the
+    constraints.
+    """
+    dialect = conn.dialect.name
+    
+    # Keep the most recently created details row and the first saved row per flight
+    conn.execute(text(
+        "DELETE FROM flight WHERE id NOT IN "
+        "(SELECT keep_id FROM (SELECT MAX(id) AS keep_id FROM flight GROUP BY flight_number) AS keep)"
+    ))
+    conn.execute(text(
+        "DELETE FROM saved_flight WHERE id NOT IN "
+        "(SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM saved_flight GROUP BY flight_number) AS keep)"
+    ))
+    
+    # Every saved flight needs a details row to reference; the next refresh fills it in
+    conn.execute(text(
+        "INSERT INTO flight (flight_number) "
+        "SELECT s.flight_number FROM saved_flight s "
+        "WHERE NOT EXISTS (SELECT 1 FROM flight f WHERE f.flight_number = s.flight_number)"
+    ))
+    
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_flight_flight_number ON flight (flight_number)"))
+    
+    if not inspect(conn).get_foreign_keys("saved_flight"):
+        if dialect == "sqlite":
+            # SQLite can't add a constraint to an existing table, so rebuild it
+            conn.execute(text("DROP INDEX IF EXISTS ix_saved_flight_flight_number"))
+            conn.execute(text("ALTER TABLE saved_flight RENAME TO saved_flight_old"))
+            conn.execute(text(
+                "CREATE TABLE saved_flight ("
+                "id INTEGER NOT NULL PRIMARY KEY, "
+                "flight_number VARCHAR(20) NOT NULL REFERENCES flight (flight_number) ON DELETE CASCADE, "
+                "date_added DATETIME)"
+            ))
+            conn.execute(text(
+                "INSERT INTO saved_flight (id, flight_number, date_added) "
+                "SELECT id, flight_number, date_added FROM saved_flight_old"
+            ))
+            conn.execute(text("DROP TABLE saved_flight_old"))
+        else:
+            conn.execute(text(
+                "ALTER TABLE saved_flight ADD CONSTRAINT saved_flight_flight_number_fkey "
+                "FOREIGN KEY (flight_number) REFERENCES flight (flight_number) ON DELETE CASCADE"
+            ))
+    
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_saved_flight_flight_number ON saved_flight (flight_number)"))
+
+
+def _flight_position_source(conn):
+    """Record whether a flight's stored position was reported live or estimated"""
+    columns = {column["name"] for column in inspect(conn).get_columns("flight")}
+    if "position_source" not in columns:
+        conn.execute(text("ALTER TABLE flight ADD COLUMN position_source VARCHAR(10)"))
+
+
+def _flight_position_index(conn):
+    """Composite index for map viewport (bounding box) queries"""
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_flight_current_lat_current_lon ON flight (current_lat, current_lon)"))
+
+
+def _saved_flight_owner(conn):
+    """
+    Per-user watchlists: saved flights get an owner, and a flight number is
+    unique per owner instead of globally
+    
+    Flights saved before this revision were shared by every visitor; they
+    are kept under the "legacy" owner (0006 drops them).
+    """
+    columns = {column["name"] for column in inspect(conn).get_columns("saved_flight")}
+    if "owner_id" not in columns:
+        conn.execute(text("ALTER TABLE saved_flight ADD COLUMN owner_id VARCHAR(36) NOT NULL DEFAULT 'legacy'"))
+    
+    conn.execute(text("DROP INDEX IF EXISTS ix_saved_flight_flight_number"))
+    conn.execute(text("CREATE INDEX ix_saved_flight_flight_number ON saved_flight (flight_number)"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_saved_flight_owner_id_flight_number "
+        "ON saved_flight (owner_id, flight_number)"
+    ))
+
+
+def _flight_version(conn):
+    """
+    Change feed: a flight's version (id of the event that last changed it),
+    and watchlist-scoped add/remove events
+    """
+    columns = {column["name"] for column in inspect(conn).get_columns("flight")}
+    if "version" not in columns:
+        conn.execute(text("ALTER TABLE flight ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_flight_version ON flight (version)"))
+    
+    columns = {column["name"] for column in inspect(conn).get_columns("flight_event")}
+    if "owner_id" not in columns:
+        conn.execute(text("ALTER TABLE flight_event ADD COLUMN owner_id VARCHAR(36)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_flight_event_owner_id_id ON flight_event (owner_id, id)"))
+
+
+def _drop_legacy_watchlist(conn):
+    """
+    Drop the "legacy" watchlist left by 0004
+    
+    No session can see it, yet the scheduler kept refreshing its flights and
+    spending upstream requests on them. Flight details that no other
+    watchlist references go with it.
+    """
+    legacy = [row[0] for row in conn.execute(text("SELECT flight_number FROM saved_flight WHERE owner_id = 'legacy'"))]
+    conn.execute(text("DELETE FROM saved_flight WHERE owner_id = 'legacy'"))
+    for flight_number in legacy:
+        conn.execute(text(
+            "DELETE FROM flight WHERE flight_number = :flight_number "
+            "AND NOT EXISTS (SELECT 1 FROM saved_flight WHERE saved_flight.flight_number = flight.flight_number)"
+        ), {"flight_number": flight_number})
+
+
+# Ordered (version, function) pairs; never edit or reorder a migration once released
+MIGRATIONS = [
+    ("0001_flight_number_keys", _flight_number_keys),
+    ("0002_flight_position_source", _flight_position_source),
+    ("0003_flight_position_index", _flight_position_index),
+    ("0004_saved_flight_owner", _saved_flight_owner),
+    ("0005_flight_version", _flight_version),
+    ("0006_drop_legacy_watchlist", _drop_legacy_watchlist),
+]
+
+
+def upgrade(engine):
+    """
+    Apply any migrations this database hasn't seen yet
+    
+    Each migration runs in its own transaction and is idempotent, so it is
+    also safe on databases that db.create_all() just built from the models.
+    
+    Returns:
+        list: Versions applied by this call
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version VARCHAR(100) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+        ))
+        done = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+    
+    applied = []
+    for version, migration in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            logger.info(f"Applying database migration {version}")
+            migration(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, applied_at) VALUES (:version, :applied_at)"),
+                {"version": version, "applied_at": datetime.utcnow()}
+            )
+        applied.append(version)
+    return applied
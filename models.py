@@ -1,11 +1,15 @@
 from datetime import datetime
+
+from sqlalchemy import func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+
 from app import db
 
 
 class Flight(db.Model):
     """Model for storing flight tracking information"""
     id = db.Column(db.Integer, primary_key=True)
-    flight_number = db.Column(db.String(20), nullable=False)
+    flight_number = db.Column(db.String(20), nullable=False, unique=True, index=True)
     airline = db.Column(db.String(100))
     departure_airport = db.Column(db.String(5))
     arrival_airport = db.Column(db.String(5))
@@ -20,13 +24,54 @@ class Flight(db.Model):
     arrival_lon = db.Column(db.Float)
     current_lat = db.Column(db.Float)
     current_lon = db.Column(db.Float)
+    position_source = db.Column(db.String(10))  # "live" or "estimated"
     altitude = db.Column(db.Float)
     speed = db.Column(db.Float)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    # Id of the flight event that last changed a tracked field; clients poll
+    # with ?since=<version> to get only flights changed after it
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0", index=True)
+    
+    # Deleting a flight also removes it from every watchlist (ON DELETE CASCADE)
+    saved_flights = db.relationship(
+        "SavedFlight", backref="flight", cascade="all, delete-orphan", passive_deletes=True
+    )
+    
+    # Viewport queries range-scan latitude and filter longitude within the index
+    __table_args__ = (
+        db.Index("ix_flight_current_lat_current_lon", "current_lat", "current_lon"),
+    )
+    
+    # Fields that count as a change when pushing updates to clients
+    TRACKED_FIELDS = (
+        "airline", "departure_airport", "arrival_airport",
+        "scheduled_departure", "scheduled_arrival", "actual_departure", "actual_arrival",
+        "status", "departure_lat", "departure_lon", "arrival_lat", "arrival_lon",
+        "current_lat", "current_lon", "position_source", "altitude", "speed",
+    )
     
     def __repr__(self):
         return f"<Flight {self.flight_number}>"
     
+    # Times the API stops reporting keep their stored values
+    DATETIME_FIELDS = ("scheduled_departure", "scheduled_arrival", "actual_departure", "actual_arrival")
+    
+    def apply_flight_data(self, flight_data):
+        """
+        Copy the fields of a get_flight_data result onto this row
+        
+        Returns:
+            bool: True if any tracked field changed (last_updated aside)
+        """
+        before = self._tracked_values()
+        for field, value in flight_row(self.flight_number, flight_data).items():
+            if value is not None or field not in self.DATETIME_FIELDS:
+                setattr(self, field, value)
+        return self._tracked_values() != before
+    
+    def _tracked_values(self):
+        return tuple(getattr(self, field) for field in self.TRACKED_FIELDS)
+    
     def to_dict(self):
         return {
             "id": self.id,
@@ -45,20 +90,122 @@ class Flight(db.Model):
             "arrival_lon": self.arrival_lon,
             "current_lat": self.current_lat,
             "current_lon": self.current_lon,
+            "position_source": self.position_source,
             "altitude": self.altitude,
             "speed": self.speed,
-            "last_updated": self.last_updated.isoformat() if self.last_updated else None
+            "last_updated": self.last_updated.isoformat() if self.last_updated else None,
+            "version": self.version
         }
 
 
+def flight_row(flight_number, flight_data):
+    """
+    Map a get_flight_data result to flight table column values
+    
+    Args:
+        flight_number (str): The flight number the data was looked up for
+        flight_data (dict): Formatted flight data from the API
+    
+    Returns:
+        dict: Values for flight_number, last_updated and every tracked field
+    """
+    row = {"flight_number": flight_number, "last_updated": datetime.utcnow()}
+    for field in Flight.TRACKED_FIELDS:
+        value = flight_data.get(field)
+        if value and field in Flight.DATETIME_FIELDS:
+            # The columns have no time zone, so store the wall-clock time as reported
+            value = datetime.fromisoformat(value).replace(tzinfo=None)
+        row[field] = value
+    return row
+
+
+def upsert_flights(results):
+    """
+    Write a batch of get_flight_data results to the flight table
+    
+    On PostgreSQL and SQLite this is a bulk INSERT ... ON CONFLICT DO UPDATE,
+    and the conflict clause skips rows whose tracked fields haven't
+    changed, so refreshing an unchanged flight writes nothing. Runs in the
+    current session; the caller commits.
+    
+    Args:
+        results (dict): get_flight_data results by flight number; failed
+            lookups (with an "error" key) and stale cached data are ignored
+    
+    Returns:
+        list: Flight numbers that were inserted or changed
+    """
+    rows = [
+        flight_row(flight_number, flight_data)
+        for flight_number, flight_data in results.items()
+        if flight_data and "error" not in flight_data and not flight_data.get("stale")
+    ]
+    if not rows:
+        return []
+    
+    dialect = db.session.get_bind(mapper=Flight).dialect.name
+    if dialect == "postgresql":
+        insert = postgresql.insert
+    elif dialect == "sqlite":
+        insert = sqlite.insert
+    else:
+        return _update_flights_one_by_one(results)
+    
+    stmt = insert(Flight.__table__)
+    table = stmt.table
+    new_values = {field: stmt.excluded[field] for field in Flight.TRACKED_FIELDS}
+    for field in Flight.DATETIME_FIELDS:
+        new_values[field] = func.coalesce(stmt.excluded[field], table.c[field])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.flight_number],
+        set_={**new_values, "last_updated": stmt.excluded.last_updated},
+        where=or_(*(table.c[field].is_distinct_from(value) for field, value in new_values.items()))
+    ).returning(table.c.flight_number)
+    
+    # Executed with a list of rows, SQLAlchemy batches them into multi-row
+    # INSERTs ("insertmanyvalues") while reusing one compiled statement
+    return [flight_number for (flight_number,) in db.session.execute(stmt, rows)]
+
+
+def _update_flights_one_by_one(results):
+    """ORM fallback for databases without INSERT ... ON CONFLICT"""
+    flights = {
+        flight.flight_number: flight
+        for flight in Flight.query.filter(Flight.flight_number.in_(list(results))).all()
+    }
+    changed = []
+    for flight_number, flight_data in results.items():
+        if not flight_data or "error" in flight_data or flight_data.get("stale"):
+            continue
+        flight = flights.get(flight_number)
+        if flight is None:
+            flight = Flight(flight_number=flight_number)
+            db.session.add(flight)
+        if flight.apply_flight_data(flight_data):
+            changed.append(flight_number)
+    return changed
+
+
 class SavedFlight(db.Model):
-    """Model for storing user's saved flights"""
+    """Model for storing the flights on each user's watchlist"""
     id = db.Column(db.Integer, primary_key=True)
-    flight_number = db.Column(db.String(20), nullable=False)
+    owner_id = db.Column(db.String(36), nullable=False)
+    flight_number = db.Column(
+        db.String(20),
+        db.ForeignKey("flight.flight_number", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # A flight is on a watchlist at most once; the index also serves the
+    # per-owner list query
+    __table_args__ = (
+        db.Index("ix_saved_flight_owner_id_flight_number", "owner_id", "flight_number", unique=True),
+    )
+    
     def __repr__(self):
-        return f"<SavedFlight {self.flight_number}>"
+        return f"<SavedFlight {self.owner_id} {self.flight_number}>"
     
     def to_dict(self):
         return {
@@ -66,3 +213,50 @@ class SavedFlight(db.Model):
             "flight_number": self.flight_number,
             "date_added": self.date_added.isoformat() if self.date_added else None
         }
+
+
+class FlightEvent(db.Model):
+    """Append-only log of flight changes, used to push updates to clients"""
+    id = db.Column(db.Integer, primary_key=True)
+    flight_number = db.Column(db.String(20), nullable=False)
+    event_type = db.Column(db.String(10), nullable=False)  # "update", "add" or "remove"
+    # Set for a flight added to or removed from one watchlist; unset for
+    # changes to the flight itself, which every client hears about
+    owner_id = db.Column(db.String(36))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (
+        db.Index("ix_flight_event_owner_id_id", "owner_id", "id"),
+    )
+    
+    def __repr__(self):
+        return f"<FlightEvent {self.id} {self.event_type} {self.flight_number}>"
+
+
+class ApiQuotaUsage(db.Model):
+    """Upstream API requests made per day ("2026-10-16") and month ("2026-10")"""
+    period = db.Column(db.String(10), primary_key=True)
+    used = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<ApiQuotaUsage {self.period} {self.used}>"
+
+
+class FlightPosition(db.Model):
+    """Append-only history of flight positions, one row per sample"""
+    id = db.Column(db.Integer, primary_key=True)
+    flight_number = db.Column(db.String(20), nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False, index=True)
+    # Single precision is ~1 m at these magnitudes and halves the row size
+    lat = db.Column(db.REAL, nullable=False)
+    lon = db.Column(db.REAL, nullable=False)
+    altitude = db.Column(db.REAL)
+    speed = db.Column(db.REAL)
+    source = db.Column(db.String(10))  # "live" or "estimated"
+    
+    __table_args__ = (
+        db.Index("ix_flight_position_flight_number_recorded_at", "flight_number", "recorded_at"),
+    )
+    
+    def __repr__(self):
+        return f"<FlightPosition {self.flight_number} {self.recorded_at}>"
@@ -0,0 +1,371 @@
+import os
+import math
+import atexit
+import heapq
+import logging
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+from sqlalchemy import text
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Upstream requests allowed per calendar month (UTC); 0 disables the budget.
+# The AviationStack free tier allows 100.
+QUOTA_MONTHLY = int(os.environ.get("AVIATION_API_MONTHLY_QUOTA", "0"))
+
+# Upstream requests allowed per day (UTC); 0 spreads what is left of the
+# monthly budget evenly over the rest of the month
+QUOTA_DAILY = int(os.environ.get("AVIATION_API_DAILY_QUOTA", "0"))
+
+# Token bucket: sustained requests per second (0 = no rate limit) and burst size
+QUOTA_RATE = float(os.environ.get("AVIATION_API_RATE_LIMIT", "0"))
+QUOTA_BURST = int(os.environ.get("AVIATION_API_BURST", "5"))
+
+# Share of the daily budget kept for user lookups and imminent flights;
+# background refreshes get stale data once only this much is left
+QUOTA_RESERVE_FRACTION = float(os.environ.get("AVIATION_API_QUOTA_RESERVE", "0.2"))
+
+# Share of the daily budget below which refreshes of landed and far-off
+# flights stop, before scheduled refreshes do (should exceed the reserve above)
+QUOTA_BACKGROUND_RESERVE_FRACTION = float(os.environ.get("AVIATION_API_BACKGROUND_RESERVE", "0.4"))
+
+# Seconds a request waits for a rate-limit token before giving up
+QUOTA_MAX_WAIT = float(os.environ.get("AVIATION_API_QUOTA_MAX_WAIT", "5"))
+
+# Seconds between writes of the request counts to the database; requests
+# made in between are added up in memory and written together
+QUOTA_FLUSH_INTERVAL = float(os.environ.get("AVIATION_API_QUOTA_FLUSH_INTERVAL", "1"))
+
+# Flights departing or landing within this many seconds refresh at imminent priority
+QUOTA_IMMINENT_WINDOW = 3600
+
+# Request priorities, most important first
+PRIORITY_USER = 0        # a user is waiting on this lookup
+PRIORITY_IMMINENT = 1    # airborne, or departing/landing soon
+PRIORITY_SCHEDULED = 2   # other refreshes of tracked flights
+PRIORITY_BACKGROUND = 3  # flights that are far off or finished
+
+PRIORITY_NAMES = {
+    PRIORITY_USER: "user",
+    PRIORITY_IMMINENT: "imminent",
+    PRIORITY_SCHEDULED: "scheduled",
+    PRIORITY_BACKGROUND: "background",
+}
+
+QUOTA_ERROR = "AviationStack request budget exhausted"
+
+
+class QuotaExceededError(requests.exceptions.RequestException):
+    """Raised instead of calling the API when the request budget doesn't allow it"""
+
+
+def flight_priority(flight, now):
+    """
+    Priority for refreshing a stored flight
+    
+    Args:
+        flight (Flight): The stored flight
+        now (datetime): Current UTC time (naive)
+    
+    Returns:
+        int: One of the PRIORITY_* levels
+    """
+    status = (flight.status or "").lower()
+    if status in ("active", "en-route"):
+        return PRIORITY_IMMINENT
+    if status in ("landed", "arrived", "cancelled"):
+        return PRIORITY_BACKGROUND
+    
+    for moment in (flight.actual_departure or flight.scheduled_departure,
+                   flight.actual_arrival or flight.scheduled_arrival):
+        if moment is not None and abs((moment.replace(tzinfo=None) - now).total_seconds()) <= QUOTA_IMMINENT_WINDOW:
+            return PRIORITY_IMMINENT
+    return PRIORITY_SCHEDULED
+
+
+def _periods(now):
+    return now.strftime("%Y-%m-%d"), now.strftime("%Y-%m")
+
+
+def _days_left_in_month(now):
+    next_month = (now.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return (next_month.date() - now.date()).days
+
+
+class QuotaManager:
+    """
+    Budget and rate limiter for upstream API requests
+    
+    Every request needs a token from a token bucket (QUOTA_RATE, QUOTA_BURST);
+    when tokens run short, waiting requests are served in priority order
+    (without a rate limit there is never a queue, so only the budgets below
+    tell priorities apart).
+    Requests are also counted against daily and monthly budgets when they are
+    granted (and refunded if they are never sent), persisted in the
+    api_quota_usage table so all workers and restarts share them.
+    As the daily budget runs low, background refreshes are refused first,
+    then scheduled ones, then everything but user lookups, which may use up
+    the rest of the month.
+    """
+    
+    def __init__(self, monthly=QUOTA_MONTHLY, daily=QUOTA_DAILY, rate=QUOTA_RATE, burst=QUOTA_BURST,
+                 reserve_fraction=QUOTA_RESERVE_FRACTION,
+                 background_reserve_fraction=QUOTA_BACKGROUND_RESERVE_FRACTION, engine=None):
+        self.monthly = monthly
+        self.daily = daily
+        self.rate = rate
+        self.burst = burst
+        self.reserve_fraction = reserve_fraction
+        self.background_reserve_fraction = max(background_reserve_fraction, reserve_fraction)
+        self.engine = engine
+        
+        self._condition = threading.Condition()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._waiting = []
+        self._sequence = itertools.count()
+        
+        # Usage by period ("2026-10-16" and "2026-10"), loaded from the database on first use
+        self._usage = {}
+        self._day_start_used = None
+        self._loaded_day = None
+        # Requests not yet written to the database, by period
+        self._pending = {}
+        self._flushing = False
+        self._flushed_at = time.monotonic()
+        
+        self.granted = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        self.denied = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+    
+    def bind(self, engine):
+        """Persist usage through a SQLAlchemy engine"""
+        with self._condition:
+            self.engine = engine
+            self._loaded_day = None
+        # Don't lose the last requests counted before the process exits
+        atexit.register(self.flush)
+    
+    # Budgets
+    
+    def _load(self, now):
+        """
+        Read this day's and month's usage (once per day, or after bind)
+        
+        Called with the condition held once; it is released while the
+        database is queried, so other threads don't wait on the query.
+        """
+        day, month = _periods(now)
+        if self._loaded_day == day:
+            return
+        usage = {day: 0, month: 0}
+        if self.engine is not None:
+            engine = self.engine
+            self._condition.release()
+            try:
+                with engine.connect() as conn:
+                    rows = conn.execute(
+                        text("SELECT period, used FROM api_quota_usage WHERE period IN (:day, :month)"),
+                        {"day": day, "month": month}
+                    )
+                    usage.update({period: used for period, used in rows})
+            except Exception as e:
+                logger.error(f"Could not load API quota usage: {str(e)}")
+            finally:
+                self._condition.acquire()
+            if self._loaded_day == day:
+                # Another thread loaded it in the meantime
+                return
+        for period in usage:
+            usage[period] += self._pending.get(period, 0)
+        self._usage = usage
+        self._day_start_used = usage[month] - usage[day]
+        self._loaded_day = day
+    
+    def _daily_limit(self, now):
+        if self.daily:
+            return self.daily
+        if not self.monthly:
+            return None
+        # Spread what was left of the month at the start of the day over the days remaining
+        remaining = max(self.monthly - self._day_start_used, 0)
+        return math.ceil(remaining / _days_left_in_month(now))
+    
+    def _allowed(self, priority, now):
+        """Whether the budgets leave room for one more request at this priority"""
+        self._load(now)
+        day, month = _periods(now)
+        month_left = self.monthly - self._usage[month] if self.monthly else math.inf
+        if month_left <= 0:
+            return False
+        if priority == PRIORITY_USER:
+            return True
+        
+        daily = self._daily_limit(now)
+        if daily is None:
+            return True
+        day_left = daily - self._usage[day]
+        if priority <= PRIORITY_IMMINENT:
+            return day_left > 0
+        if priority == PRIORITY_SCHEDULED:
+            return day_left > daily * self.reserve_fraction
+        return day_left > daily * self.background_reserve_fraction
+    
+    def _count(self, now, count):
+        """Add to this day's and month's usage (called with the condition held, after _load)"""
+        for period in _periods(now):
+            self._usage[period] += count
+            self._pending[period] = self._pending.get(period, 0) + count
+            if not self._pending[period]:
+                del self._pending[period]
+    
+    def refund(self, now=None):
+        """Give back a request granted by acquire() that was never sent"""
+        now = now or datetime.utcnow()
+        with self._condition:
+            self._load(now)
+            self._count(now, -1)
+    
+    def flush(self):
+        """Write the requests counted since the last flush to the database"""
+        with self._condition:
+            if self.engine is None or self._flushing or not self._pending:
+                return
+            self._flushing = True
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+            engine = self.engine
+        
+        try:
+            with engine.begin() as conn:
+                totals = {
+                    period: conn.execute(text(
+                        "INSERT INTO api_quota_usage (period, used) VALUES (:period, :count) "
+                        "ON CONFLICT (period) DO UPDATE SET used = api_quota_usage.used + :count "
+                        "RETURNING used"
+                    ), {"period": period, "count": count}).scalar()
+                    for period, count in sorted(pending.items())
+                }
+            with self._condition:
+                # Pick up requests made by other workers
+                for period, used in totals.items():
+                    if period in self._usage:
+                        self._usage[period] = max(self._usage[period], used + self._pending.get(period, 0))
+        except Exception as e:
+            logger.error(f"Could not record API quota usage: {str(e)}")
+            with self._condition:
+                for period, count in pending.items():
+                    self._pending[period] = self._pending.get(period, 0) + count
+        finally:
+            with self._condition:
+                self._flushing = False
+    
+    # Rate limit
+    
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        else:
+            self._tokens = float(self.burst)
+        self._refilled_at = now
+    
+    def acquire(self, priority=PRIORITY_USER, timeout=QUOTA_MAX_WAIT):
+        """
+        Wait for permission to make one upstream request
+        
+        Args:
+            priority (int): One of the PRIORITY_* levels
+            timeout (float): Seconds to wait for a rate-limit token
+        
+        Returns:
+            bool: True if the request may go ahead, False if the budget is
+                used up for this priority or no token came free in time.
+                A granted request is counted against the budgets right away;
+                call refund() if it isn't sent after all.
+        """
+        name = PRIORITY_NAMES.get(priority, "background")
+        deadline = time.monotonic() + timeout
+        granted = False
+        with self._condition:
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = datetime.utcnow()
+                    if not self._allowed(priority, now):
+                        break
+                    
+                    self._refill()
+                    if self._waiting[0] == entry and self._tokens >= 1:
+                        self._tokens -= 1
+                        # Count it before letting go of the lock, so concurrent
+                        # requests can't all pass the same budget check
+                        self._count(now, 1)
+                        granted = True
+                        break
+                    
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    # Wake when the next token is due, or when the queue changes
+                    next_token = (1 - self._tokens) / self.rate if self.rate and self._tokens < 1 else remaining
+                    self._condition.wait(min(remaining, max(next_token, 0.001)))
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+            if granted:
+                self.granted[name] += 1
+            else:
+                self.denied[name] += 1
+            due = time.monotonic() - self._flushed_at >= QUOTA_FLUSH_INTERVAL
+        if granted and due:
+            self.flush()
+        return granted
+    
+    def stats(self):
+        now = datetime.utcnow()
+        with self._condition:
+            self._load(now)
+            day, month = _periods(now)
+            daily = self._daily_limit(now)
+            if self.monthly and self._usage[month] >= self.monthly:
+                mode = "exhausted"
+            elif daily is not None and self._usage[day] >= daily:
+                mode = "user-only"
+            elif daily is not None and daily - self._usage[day] <= daily * self.reserve_fraction:
+                mode = "reserve"
+            else:
+                mode = "normal"
+            self._refill()
+            return {
+                "mode": mode,
+                "monthly_limit": self.monthly or None,
+                "month_used": self._usage[month],
+                "daily_limit": daily,
+                "day_used": self._usage[day],
+                "rate_limit": self.rate or None,
+                "tokens": round(self._tokens, 2),
+                "waiting": len(self._waiting),
+                "granted": dict(self.granted),
+                "denied": dict(self.denied),
+            }
+
+
+_quota = None
+_quota_lock = threading.Lock()
+
+
+def get_quota():
+    """Return the process-wide quota manager, creating it on first use"""
+    global _quota
+    if _quota is None:
+        with _quota_lock:
+            if _quota is None:
+                _quota = QuotaManager()
+    return _quota
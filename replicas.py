@@ -0,0 +1,66 @@
+import os
+import time
+from functools import wraps
+
+from flask import g, has_request_context, session
+from flask_sqlalchemy.session import Session
+
+# Read-only replica of DATABASE_URL for the read endpoints (unset: every
+# query goes to DATABASE_URL)
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL")
+
+# Seconds after a browser session writes during which its reads stay on the
+# primary, so it sees its own changes however far the replica lags
+REPLICA_READ_YOUR_WRITES = float(os.environ.get("DB_REPLICA_READ_YOUR_WRITES", "5"))
+
+# Flask-SQLAlchemy bind key of the replica engine
+REPLICA_BIND = "replica"
+
+
+class RoutingSession(Session):
+    """
+    Session that sends the queries of read-only requests to the replica
+    
+    Only requests whose view is marked with @read_only use the replica, and
+    never while flushing; everything else (writes, background threads, the
+    scheduler) uses the primary.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get("db_use_replica"):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def wrote_recently():
+    """Whether this browser session wrote within the read-your-writes window"""
+    return time.time() - session.get("db_wrote_at", 0) < REPLICA_READ_YOUR_WRITES
+
+
+def note_write():
+    """Keep this browser session's reads on the primary for the read-your-writes window"""
+    if DATABASE_REPLICA_URL:
+        session["db_wrote_at"] = time.time()
+
+
+def read_only(view):
+    """Serve a view's queries from the replica, unless its session wrote recently"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_use_replica = bool(DATABASE_REPLICA_URL) and not wrote_recently()
+        return view(*args, **kwargs)
+    
+    return wrapper
+
+
+def init_replicas(app):
+    """
+    Register the replica as a Flask-SQLAlchemy bind
+    
+    Call before db.init_app(app). The replica bind has no tables of its
+    own, so create_all() and migrations only touch the primary.
+    """
+    if DATABASE_REPLICA_URL:
+        app.config.setdefault("SQLALCHEMY_BINDS", {})[REPLICA_BIND] = DATABASE_REPLICA_URL
@@ -1,23 +1,131 @@
+import os
+import json
+import time
+import hashlib
 import logging
-from flask import render_template, request, jsonify
-from app import app, db
-from models import Flight, SavedFlight
-from aviation_api import get_flight_data
 from datetime import datetime
+from flask import Blueprint, Response, current_app, make_response, render_template, request, jsonify, stream_with_context
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import Flight, FlightEvent, SavedFlight, upsert_flights
+from aviation_api import get_flight_data, get_flights_data, get_client, TIMEOUT_ERROR
+from quota import QUOTA_ERROR, flight_priority, get_quota
+from replicas import note_write, read_only
+from flight_cache import get_cache
+from scheduler import SCHEDULER_ENABLED
+from tracks import get_track, record_positions
+from geo import refresh_estimated_positions
+from airports import get_airports
+from viewport import MAP_FIELDS, flights_in_bbox
+from serializers import FLIGHT_FIELDS, FORMATS, flights_response, records, requested_format
+from watchlists import (
+    WATCHLIST_MAX_FLIGHTS, add_to_watchlist, current_owner_id, remove_from_watchlist, watchlist_changes,
+    watchlist_flights_query, watchlist_query
+)
+from events import get_broadcaster, record_flight_event, record_flight_events, settled_event_id, stream_flight_events
 import traceback
 
 logger = logging.getLogger(__name__)
 
-@app.route('/')
+bp = Blueprint('flights', __name__)
+
+# Fields that can be requested with /api/flights/details?fields=, in response order
+DETAIL_FIELDS = FLIGHT_FIELDS + ('date_added',)
+
+# Maximum airports returned by one bounding-box query
+AIRPORTS_MAX_RESULTS = 2000
+
+# Seconds a polled estimated position may lag behind before the flight list ETag changes
+ESTIMATED_POSITION_ETAG_SECONDS = int(os.environ.get("ESTIMATED_POSITION_ETAG_SECONDS", "60"))
+
+def parse_since():
+    """The ?since= version cursor, or None; raises ValueError if it isn't an integer"""
+    since = request.args.get('since')
+    return int(since) if since else None
+
+def watchlist_flights(owner_id, fields, since=None):
+    """
+    Read a watchlist's flights, or only those changed after a version
+    
+    Args:
+        owner_id (str): The watchlist owner
+        fields (tuple): Field names to read, from DETAIL_FIELDS
+        since (int): Version from an earlier response, or None for every flight
+    
+    Returns:
+        tuple: (list of flight dicts, dict of change feed keys for the response:
+            "version", plus "removed" and "reset" when since is given)
+    """
+    # Read the cursor first, so anything that changes while the rows are read is sent again next time
+    feed = {'version': settled_event_id()}
+    columns = [SavedFlight.date_added if field == 'date_added' else Flight.__table__.c[field] for field in fields]
+    query = watchlist_flights_query(owner_id, *columns)
+    if since is not None:
+        changes = watchlist_changes(owner_id, since)
+        if changes is None:
+            # The cursor is too old to diff against; send the whole list
+            feed.update(removed=[], reset=True)
+        else:
+            changed, removed = changes
+            query = query.filter(changed)
+            feed.update(removed=removed, reset=False)
+    
+    return records(fields, query), feed
+
+def watchlist_etag(owner_id, flights, feed, *variant, moved=False):
+    """
+    ETag for a flight list, built from the stored row versions rather than
+    the response body
+    
+    Estimated positions are moved to the current time on every read, so the
+    body of a list with airborne estimated flights never repeats. The tag
+    changes when one of the watchlist's rows or its membership changes, and
+    every ESTIMATED_POSITION_ETAG_SECONDS while positions are being moved.
+    The feed version is left out: it moves whenever any flight on any
+    watchlist changes. A client revalidated with 304 keeps its older version,
+    which still works as a ?since= cursor.
+    
+    Args:
+        owner_id (str): The watchlist owner
+        flights (list): Flight dicts with flight_number, version and date_added
+        feed (dict): Change feed keys of the response
+        *variant: Anything else the body depends on (fields, format, since)
+        moved (bool): Whether estimated positions were moved
+    
+    Returns:
+        str: The entity tag
+    """
+    rows = [(flight['flight_number'], flight['version'], flight['date_added']) for flight in flights]
+    membership = db.session.query(db.func.max(FlightEvent.id)).filter(FlightEvent.owner_id == owner_id).scalar()
+    changes = sorted((key, value) for key, value in feed.items() if key != 'version')
+    window = int(time.time() // max(1, ESTIMATED_POSITION_ETAG_SECONDS)) if moved else None
+    return hashlib.sha1(repr((rows, membership, changes, variant, window)).encode()).hexdigest()
+
+def release_db_connection():
+    """
+    Hand the request's database connection back to the pool before waiting
+    on the upstream API, so slow lookups don't hold connections other
+    requests need. Loaded objects stay usable; later queries check out a
+    connection again.
+    """
+    db.session.close()
+
+@bp.route('/')
 def index():
     """Render the main application page"""
-    return render_template('index.html')
+    # The page links its scripts by content hash, so revalidating it is enough
+    # to pick up new assets
+    response = make_response(render_template('index.html', max_flights=WATCHLIST_MAX_FLIGHTS))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
 
-@app.route('/api/flights', methods=['GET'])
+@bp.route('/api/flights', methods=['GET'])
+@read_only
 def get_flights():
-    """Get all tracked flights"""
+    """Get the flights on this session's watchlist"""
     try:
-        saved_flights = SavedFlight.query.all()
+        saved_flights = watchlist_query(current_owner_id()).all()
         return jsonify({
             'success': True,
             'flights': [flight.to_dict() for flight in saved_flights]
@@ -31,7 +139,7 @@ def get_flights():
             'details': str(e)
         }), 500
 
-@app.route('/api/flights/add', methods=['POST'])
+@bp.route('/api/flights/add', methods=['POST'])
 def add_flight():
     """Add a new flight to track"""
     try:
@@ -44,56 +152,70 @@ def add_flight():
                 'error': 'Flight number is required'
             }), 400
         
-        # Check if flight already exists
-        existing_flight = SavedFlight.query.filter_by(flight_number=flight_number).first()
+        owner_id = current_owner_id()
+        
+        # Check if flight is already on this watchlist
+        existing_flight = SavedFlight.query.filter_by(owner_id=owner_id, flight_number=flight_number).first()
         if existing_flight:
             return jsonify({
                 'success': False,
                 'error': 'Flight is already being tracked'
             }), 400
         
-        # Check if we've reached the limit of 3 flights
-        flight_count = SavedFlight.query.count()
-        if flight_count >= 3:
+        # Check if the watchlist is full (before spending an API request;
+        # add_to_watchlist checks again as it inserts)
+        flight_count = SavedFlight.query.filter_by(owner_id=owner_id).count()
+        if flight_count >= WATCHLIST_MAX_FLIGHTS:
             return jsonify({
                 'success': False,
-                'error': 'Maximum limit of 3 flights reached. Remove a flight to add a new one.'
+                'error': f'Maximum limit of {WATCHLIST_MAX_FLIGHTS} flights reached. Remove a flight to add a new one.'
             }), 400
         
-        # Get flight data from API
-        flight_data = get_flight_data(flight_number)
-        if not flight_data or 'error' in flight_data:
-            return jsonify({
-                'success': False,
-                'error': flight_data.get('error', 'Flight not found or invalid flight number')
-            }), 404
+        # A flight on another watchlist is already stored and kept fresh, so
+        # only flights nobody watches yet are fetched from the API
+        flight = Flight.query.filter_by(flight_number=flight_number).first()
+        if flight:
+            flight_data = flight.to_dict()
+            refresh_estimated_positions([flight_data])
+        else:
+            release_db_connection()
+            flight_data = get_flight_data(flight_number)
+            if flight_data.get('error') == QUOTA_ERROR or flight_data.get('stale'):
+                # A new flight needs current data; don't store an old copy as fresh
+                return jsonify({
+                    'success': False,
+                    'error': QUOTA_ERROR
+                }), 503
+            if not flight_data or 'error' in flight_data:
+                return jsonify({
+                    'success': False,
+                    'error': flight_data.get('error', 'Flight not found or invalid flight number')
+                }), 404
+            
+            # Store detailed flight data (the saved flight references this row)
+            record_positions({flight_number: flight_data}, upsert_flights({flight_number: flight_data}))
+            record_flight_event(flight_number)
         
         # Save the flight
-        new_saved_flight = SavedFlight(flight_number=flight_number)
-        db.session.add(new_saved_flight)
-        
-        # Store detailed flight data
-        new_flight = Flight(
-            flight_number=flight_number,
-            airline=flight_data.get('airline'),
-            departure_airport=flight_data.get('departure_airport'),
-            arrival_airport=flight_data.get('arrival_airport'),
-            scheduled_departure=datetime.fromisoformat(flight_data.get('scheduled_departure')) if flight_data.get('scheduled_departure') else None,
-            scheduled_arrival=datetime.fromisoformat(flight_data.get('scheduled_arrival')) if flight_data.get('scheduled_arrival') else None,
-            actual_departure=datetime.fromisoformat(flight_data.get('actual_departure')) if flight_data.get('actual_departure') else None,
-            actual_arrival=datetime.fromisoformat(flight_data.get('actual_arrival')) if flight_data.get('actual_arrival') else None,
-            status=flight_data.get('status'),
-            departure_lat=flight_data.get('departure_lat'),
-            departure_lon=flight_data.get('departure_lon'),
-            arrival_lat=flight_data.get('arrival_lat'),
-            arrival_lon=flight_data.get('arrival_lon'),
-            current_lat=flight_data.get('current_lat'),
-            current_lon=flight_data.get('current_lon'),
-            altitude=flight_data.get('altitude'),
-            speed=flight_data.get('speed')
-        )
-        db.session.add(new_flight)
-        db.session.commit()
+        try:
+            if not add_to_watchlist(owner_id, flight_number):
+                # Another request filled the last place in the meantime
+                db.session.rollback()
+                return jsonify({
+                    'success': False,
+                    'error': f'Maximum limit of {WATCHLIST_MAX_FLIGHTS} flights reached. Remove a flight to add a new one.'
+                }), 400
+            record_flight_event(flight_number, 'add', owner_id)
+            db.session.commit()
+            # Read this watchlist from the primary until the replica has the new flight
+            note_write()
+        except IntegrityError:
+            # The same session added it concurrently
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'error': 'Flight is already being tracked'
+            }), 400
         
         return jsonify({
             'success': True,
@@ -110,55 +232,40 @@ def add_flight():
             'details': str(e)
         }), 500
 
-@app.route('/api/flights/remove/<flight_number>', methods=['DELETE'])
+@bp.route('/api/flights/remove/<flight_number>', methods=['DELETE'])
 def remove_flight(flight_number):
-    """Remove a flight from tracking"""
+    """Remove a flight from this session's watchlist"""
     try:
         logger.info(f"Attempting to remove flight: {flight_number}")
         
-        # First get the flight to make sure it exists
-        saved_flight = SavedFlight.query.filter_by(flight_number=flight_number).first()
-        
-        if not saved_flight:
-            logger.warning(f"Flight {flight_number} not found for removal")
-            return jsonify({
-                'success': False,
-                'error': 'Flight not found'
-            }), 404
-        
-        # Get the flight ID to log it
-        flight_id = saved_flight.id
-        logger.info(f"Found flight {flight_number} with ID {flight_id} for removal")
-        
-        # Try to delete from saved flights
+        # The details row goes too once no other watchlist references it
         try:
-            db.session.delete(saved_flight)
-            logger.info(f"Deleted flight {flight_number} from saved_flights table")
+            owner_id = current_owner_id()
+            removed, orphaned = remove_from_watchlist(owner_id, flight_number)
+            if not removed:
+                logger.warning(f"Flight {flight_number} not found for removal")
+                return jsonify({
+                    'success': False,
+                    'error': 'Flight not found'
+                }), 404
+            # A tombstone for this watchlist's change feed, and for every
+            # stream once the flight itself is gone
+            record_flight_event(flight_number, 'remove', owner_id)
+            if orphaned:
+                record_flight_event(flight_number, 'remove')
+            logger.info(f"Removed flight {flight_number} from watchlist")
         except Exception as e:
             db.session.rollback()
-            logger.error(f"Error deleting flight {flight_number} from saved_flights: {str(e)}")
+            logger.error(f"Error deleting flight {flight_number}: {str(e)}")
             return jsonify({
                 'success': False,
-                'error': f'Database error when removing saved flight: {str(e)}'
+                'error': f'Database error when removing flight: {str(e)}'
             }), 500
         
-        # Also try to remove any detailed flight data
-        try:
-            flight_details = Flight.query.filter_by(flight_number=flight_number).first()
-            if flight_details:
-                flight_details_id = flight_details.id
-                db.session.delete(flight_details)
-                logger.info(f"Deleted flight details for {flight_number} with ID {flight_details_id}")
-            else:
-                logger.info(f"No flight details found for {flight_number}")
-        except Exception as e:
-            # Don't rollback here, we still want to commit the saved_flight deletion
-            logger.error(f"Error deleting flight details for {flight_number}: {str(e)}")
-            # We continue anyway since the saved flight is what matters most
-        
         # Commit the transaction
         try:
             db.session.commit()
+            note_write()
             logger.info(f"Successfully committed deletion of flight {flight_number}")
             return jsonify({
                 'success': True,
@@ -183,70 +290,39 @@ def remove_flight(flight_number):
             'details': str(e)
         }), 500
 
-@app.route('/api/flights/update/<flight_number>', methods=['GET'])
+@bp.route('/api/flights/update/<flight_number>', methods=['GET'])
 def update_flight(flight_number):
     """Update flight data"""
     try:
-        # Check if flight exists
-        saved_flight = SavedFlight.query.filter_by(flight_number=flight_number).first()
+        # Check if flight is on this watchlist
+        saved_flight = SavedFlight.query.filter_by(owner_id=current_owner_id(), flight_number=flight_number).first()
         if not saved_flight:
             return jsonify({
                 'success': False,
                 'error': 'Flight not found'
             }), 404
         
-        # Get updated flight data from API
+        # Get updated flight data from API (the last cached copy, flagged
+        # "stale", if the request budget is used up)
+        release_db_connection()
         flight_data = get_flight_data(flight_number)
+        if flight_data.get('error') == QUOTA_ERROR:
+            return jsonify({
+                'success': False,
+                'error': QUOTA_ERROR
+            }), 503
         if not flight_data or 'error' in flight_data:
             return jsonify({
                 'success': False,
                 'error': flight_data.get('error', 'Failed to retrieve flight data')
             }), 400
         
-        # Update flight details in database
-        flight = Flight.query.filter_by(flight_number=flight_number).first()
-        if flight:
-            flight.airline = flight_data.get('airline', flight.airline)
-            flight.departure_airport = flight_data.get('departure_airport', flight.departure_airport)
-            flight.arrival_airport = flight_data.get('arrival_airport', flight.arrival_airport)
-            flight.scheduled_departure = datetime.fromisoformat(flight_data.get('scheduled_departure')) if flight_data.get('scheduled_departure') else flight.scheduled_departure
-            flight.scheduled_arrival = datetime.fromisoformat(flight_data.get('scheduled_arrival')) if flight_data.get('scheduled_arrival') else flight.scheduled_arrival
-            flight.actual_departure = datetime.fromisoformat(flight_data.get('actual_departure')) if flight_data.get('actual_departure') else flight.actual_departure
-            flight.actual_arrival = datetime.fromisoformat(flight_data.get('actual_arrival')) if flight_data.get('actual_arrival') else flight.actual_arrival
-            flight.status = flight_data.get('status', flight.status)
-            flight.departure_lat = flight_data.get('departure_lat', flight.departure_lat)
-            flight.departure_lon = flight_data.get('departure_lon', flight.departure_lon)
-            flight.arrival_lat = flight_data.get('arrival_lat', flight.arrival_lat)
-            flight.arrival_lon = flight_data.get('arrival_lon', flight.arrival_lon)
-            flight.current_lat = flight_data.get('current_lat', flight.current_lat)
-            flight.current_lon = flight_data.get('current_lon', flight.current_lon)
-            flight.altitude = flight_data.get('altitude', flight.altitude)
-            flight.speed = flight_data.get('speed', flight.speed)
-            flight.last_updated = datetime.utcnow()
-            db.session.commit()
-        else:
-            # If for some reason the detailed flight data doesn't exist, create it
-            new_flight = Flight(
-                flight_number=flight_number,
-                airline=flight_data.get('airline'),
-                departure_airport=flight_data.get('departure_airport'),
-                arrival_airport=flight_data.get('arrival_airport'),
-                scheduled_departure=datetime.fromisoformat(flight_data.get('scheduled_departure')) if flight_data.get('scheduled_departure') else None,
-                scheduled_arrival=datetime.fromisoformat(flight_data.get('scheduled_arrival')) if flight_data.get('scheduled_arrival') else None,
-                actual_departure=datetime.fromisoformat(flight_data.get('actual_departure')) if flight_data.get('actual_departure') else None,
-                actual_arrival=datetime.fromisoformat(flight_data.get('actual_arrival')) if flight_data.get('actual_arrival') else None,
-                status=flight_data.get('status'),
-                departure_lat=flight_data.get('departure_lat'),
-                departure_lon=flight_data.get('departure_lon'),
-                arrival_lat=flight_data.get('arrival_lat'),
-                arrival_lon=flight_data.get('arrival_lon'),
-                current_lat=flight_data.get('current_lat'),
-                current_lon=flight_data.get('current_lon'),
-                altitude=flight_data.get('altitude'),
-                speed=flight_data.get('speed')
-            )
-            db.session.add(new_flight)
-            db.session.commit()
+        # Update flight details in database (no write if nothing changed)
+        changed = upsert_flights({flight_number: flight_data})
+        record_flight_events(changed)
+        record_positions({flight_number: flight_data}, changed)
+        db.session.commit()
+        note_write()
         
         return jsonify({
             'success': True,
@@ -262,18 +338,80 @@ def update_flight(flight_number):
             'details': str(e)
         }), 500
 
-@app.route('/api/flights/details/<flight_number>', methods=['GET'])
+@bp.route('/api/flights/details', methods=['GET'])
+@read_only
+def get_all_flight_details():
+    """Get the flights on this session's watchlist together with their details in one query"""
+    try:
+        fields = None
+        if request.args.get('fields'):
+            fields = {field.strip() for field in request.args['fields'].split(',') if field.strip()}
+            unknown = fields - set(DETAIL_FIELDS)
+            if unknown:
+                return jsonify({
+                    'success': False,
+                    'error': f"Unknown fields: {', '.join(sorted(unknown))}"
+                }), 400
+            fields.add('flight_number')
+        
+        fmt = requested_format(request)
+        if fmt is None:
+            return jsonify({
+                'success': False,
+                'error': f"format must be one of {', '.join(FORMATS)} (msgpack needs the msgpack package)"
+            }), 400
+        
+        try:
+            since = parse_since()
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'since must be a version from an earlier response'
+            }), 400
+        
+        # Plain column tuples, no ORM objects
+        owner_id = current_owner_id()
+        flights, feed = watchlist_flights(owner_id, DETAIL_FIELDS, since)
+        # Move estimated positions along their routes since the last fetch
+        moved = refresh_estimated_positions(flights)
+        etag = watchlist_etag(owner_id, flights, feed, fields and sorted(fields), fmt, since, moved=moved > 0)
+        selected = DETAIL_FIELDS
+        if fields:
+            selected = tuple(field for field in DETAIL_FIELDS if field in fields)
+            flights = [{field: details[field] for field in selected} for details in flights]
+        
+        # Clients revalidate with If-None-Match and get an empty 304 when nothing changed
+        response = flights_response(flights, selected, fmt, max_flights=WATCHLIST_MAX_FLIGHTS, **feed)
+        response.headers['Cache-Control'] = 'no-cache'
+        # Each session has its own watchlist
+        response.vary.update(('Cookie', 'Accept'))
+        response.set_etag(etag)
+        return response.make_conditional(request)
+    except Exception as e:
+        logger.error(f"Error retrieving flight details: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            'success': False,
+            'error': 'Failed to retrieve flight details',
+            'details': str(e)
+        }), 500
+
+@bp.route('/api/flights/details/<flight_number>', methods=['GET'])
+@read_only
 def get_flight_details(flight_number):
     """Get detailed information about a specific flight"""
     try:
         flight = Flight.query.filter_by(flight_number=flight_number).first()
         if flight:
+            details = flight.to_dict()
+            refresh_estimated_positions([details])
             return jsonify({
                 'success': True,
-                'flight': flight.to_dict()
+                'flight': details
             }), 200
         else:
             # If not in database, try to fetch from API
+            release_db_connection()
             flight_data = get_flight_data(flight_number)
             if flight_data and 'error' not in flight_data:
                 return jsonify({
@@ -293,66 +431,140 @@ def get_flight_details(flight_number):
             'details': str(e)
         }), 500
 
-@app.route('/api/flights/update-all', methods=['GET'])
+@bp.route('/api/flights/<flight_number>/track', methods=['GET'])
+@read_only
+def get_flight_track(flight_number):
+    """Get a flight's recorded positions, optionally only those after ?since= (epoch ms)"""
+    try:
+        since = request.args.get('since')
+        try:
+            since = int(since) if since else None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'since must be a time in milliseconds since the epoch'
+            }), 400
+        
+        track = get_track(flight_number.upper(), since)
+        return jsonify({
+            'success': True,
+            'flight_number': flight_number.upper(),
+            **track
+        }), 200
+    except Exception as e:
+        logger.error(f"Error retrieving flight track: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to retrieve flight track',
+            'details': str(e)
+        }), 500
+
+@bp.route('/api/flights/in-bbox', methods=['GET'])
+@read_only
+def get_flights_in_bbox():
+    """Get this session's flights (or clusters of them) inside ?bbox=south,west,north,east at ?zoom="""
+    try:
+        south, west, north, east = (float(value) for value in request.args.get('bbox', '').split(','))
+        zoom = int(request.args.get('zoom', 3))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'bbox must be south,west,north,east in degrees and zoom an integer'
+        }), 400
+    
+    fmt = requested_format(request)
+    if fmt is None:
+        return jsonify({
+            'success': False,
+            'error': f"format must be one of {', '.join(FORMATS)} (msgpack needs the msgpack package)"
+        }), 400
+    
+    try:
+        result = flights_in_bbox(current_owner_id(), south, west, north, east, max(0, min(zoom, 22)))
+        return flights_response(result['flights'], MAP_FIELDS, fmt, clusters=result['clusters'])
+    except Exception as e:
+        logger.error(f"Error retrieving flights in bbox: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to retrieve flights',
+            'details': str(e)
+        }), 500
+
+@bp.route('/api/flights/update-all', methods=['GET'])
 def update_all_flights():
-    """Update all tracked flights"""
+    """
+    Update all flights on this session's watchlist
+    
+    With ?since=<version>, only flights changed after that version are
+    returned, along with the flight numbers removed from the watchlist.
+    """
     try:
-        saved_flights = SavedFlight.query.all()
+        try:
+            since = parse_since()
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'since must be a version from an earlier response'
+            }), 400
+        
+        owner_id = current_owner_id()
+        saved_flights = watchlist_query(owner_id).all()
         updated_flights = []
+        timed_out = []
+        stale = []
         
-        for saved_flight in saved_flights:
-            flight_data = get_flight_data(saved_flight.flight_number)
-            if flight_data and 'error' not in flight_data:
-                # Update flight details in database
-                flight = Flight.query.filter_by(flight_number=saved_flight.flight_number).first()
-                if flight:
-                    flight.airline = flight_data.get('airline', flight.airline)
-                    flight.departure_airport = flight_data.get('departure_airport', flight.departure_airport)
-                    flight.arrival_airport = flight_data.get('arrival_airport', flight.arrival_airport)
-                    flight.scheduled_departure = datetime.fromisoformat(flight_data.get('scheduled_departure')) if flight_data.get('scheduled_departure') else flight.scheduled_departure
-                    flight.scheduled_arrival = datetime.fromisoformat(flight_data.get('scheduled_arrival')) if flight_data.get('scheduled_arrival') else flight.scheduled_arrival
-                    flight.actual_departure = datetime.fromisoformat(flight_data.get('actual_departure')) if flight_data.get('actual_departure') else flight.actual_departure
-                    flight.actual_arrival = datetime.fromisoformat(flight_data.get('actual_arrival')) if flight_data.get('actual_arrival') else flight.actual_arrival
-                    flight.status = flight_data.get('status', flight.status)
-                    flight.departure_lat = flight_data.get('departure_lat', flight.departure_lat)
-                    flight.departure_lon = flight_data.get('departure_lon', flight.departure_lon)
-                    flight.arrival_lat = flight_data.get('arrival_lat', flight.arrival_lat)
-                    flight.arrival_lon = flight_data.get('arrival_lon', flight.arrival_lon)
-                    flight.current_lat = flight_data.get('current_lat', flight.current_lat)
-                    flight.current_lon = flight_data.get('current_lon', flight.current_lon)
-                    flight.altitude = flight_data.get('altitude', flight.altitude)
-                    flight.speed = flight_data.get('speed', flight.speed)
-                    flight.last_updated = datetime.utcnow()
-                else:
-                    # If for some reason the detailed flight data doesn't exist, create it
-                    new_flight = Flight(
-                        flight_number=saved_flight.flight_number,
-                        airline=flight_data.get('airline'),
-                        departure_airport=flight_data.get('departure_airport'),
-                        arrival_airport=flight_data.get('arrival_airport'),
-                        scheduled_departure=datetime.fromisoformat(flight_data.get('scheduled_departure')) if flight_data.get('scheduled_departure') else None,
-                        scheduled_arrival=datetime.fromisoformat(flight_data.get('scheduled_arrival')) if flight_data.get('scheduled_arrival') else None,
-                        actual_departure=datetime.fromisoformat(flight_data.get('actual_departure')) if flight_data.get('actual_departure') else None,
-                        actual_arrival=datetime.fromisoformat(flight_data.get('actual_arrival')) if flight_data.get('actual_arrival') else None,
-                        status=flight_data.get('status'),
-                        departure_lat=flight_data.get('departure_lat'),
-                        departure_lon=flight_data.get('departure_lon'),
-                        arrival_lat=flight_data.get('arrival_lat'),
-                        arrival_lon=flight_data.get('arrival_lon'),
-                        current_lat=flight_data.get('current_lat'),
-                        current_lon=flight_data.get('current_lon'),
-                        altitude=flight_data.get('altitude'),
-                        speed=flight_data.get('speed')
-                    )
-                    db.session.add(new_flight)
-                
-                updated_flights.append(flight_data)
+        flight_numbers = [saved_flight.flight_number for saved_flight in saved_flights]
+        
+        if SCHEDULER_ENABLED:
+            # The background scheduler keeps stored flights fresh, so just serve them
+            message = f'{len(flight_numbers)} flights are refreshed by the background scheduler'
+            if since is None:
+                updated_flights = [flight.to_dict() for flight in Flight.query.filter(Flight.flight_number.in_(flight_numbers)).all()]
+                refresh_estimated_positions(updated_flights)
+        else:
+            # Known departure airports let the batch lookup use narrower upstream
+            # queries; flights about to depart or land get the request budget first
+            stored = Flight.query.filter(Flight.flight_number.in_(flight_numbers)).all()
+            departure_airports = {flight.flight_number: flight.departure_airport for flight in stored}
+            now = datetime.utcnow()
+            priorities = {flight.flight_number: flight_priority(flight, now) for flight in stored}
+            
+            # Fetch every tracked flight in as few upstream requests as possible;
+            # slow lookups are dropped at the deadline
+            release_db_connection()
+            results = get_flights_data(flight_numbers, departure_airports, priorities=priorities)
+            
+            for flight_number in flight_numbers:
+                flight_data = results.get(flight_number)
+                if flight_data and flight_data.get('error') == TIMEOUT_ERROR:
+                    timed_out.append(flight_number)
+                if flight_data and flight_data.get('stale'):
+                    stale.append(flight_number)
+                if flight_data and 'error' not in flight_data:
+                    updated_flights.append(flight_data)
+            
+            # Write the whole batch at once; unchanged flights cost no writes
+            changed = upsert_flights(results)
+            record_flight_events(changed)
+            record_positions(results, changed)
+            db.session.commit()
+            note_write()
+            message = f'{len(updated_flights)} flights updated successfully'
+        
+        if since is None:
+            feed = {'version': settled_event_id()}
+        else:
+            # Only what changed since the client's last poll, usually nothing
+            updated_flights, feed = watchlist_flights(owner_id, FLIGHT_FIELDS, since)
+            refresh_estimated_positions(updated_flights)
         
-        db.session.commit()
         return jsonify({
             'success': True,
-            'message': f'{len(updated_flights)} flights updated successfully',
-            'flights': updated_flights
+            'message': message,
+            'flights': updated_flights,
+            'timed_out': timed_out,
+            'stale': stale,
+            **feed
         }), 200
     except Exception as e:
         db.session.rollback()
@@ -362,3 +574,103 @@ def update_all_flights():
             'error': 'Failed to update flights',
             'details': str(e)
         }), 500
+
+@bp.route('/api/flights/stream', methods=['GET'])
+def stream_flights():
+    """Push flight changes to the client as Server-Sent Events"""
+    app = current_app._get_current_object()
+    owner_id = current_owner_id()
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    def generate():
+        # Tell the client whether the server refreshes flights on its own or
+        # whether it still needs to trigger refreshes itself
+        yield f"event: ready\ndata: {json.dumps({'server_refresh': SCHEDULER_ENABLED})}\n\n"
+        yield from stream_flight_events(get_broadcaster(app), owner_id, last_event_id)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@bp.route('/api/airports', methods=['GET'])
+def get_airports_in_bbox():
+    """Get airports with an IATA code inside ?bbox=south,west,north,east"""
+    try:
+        south, west, north, east = (float(value) for value in request.args.get('bbox', '').split(','))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'bbox must be south,west,north,east in degrees'
+        }), 400
+    
+    found = get_airports().in_bbox(south, west, north, east, with_iata=True)
+    if len(found) > AIRPORTS_MAX_RESULTS:
+        return jsonify({
+            'success': False,
+            'error': f'More than {AIRPORTS_MAX_RESULTS} airports in the box; zoom in'
+        }), 400
+    return jsonify({
+        'success': True,
+        'airports': [airport._asdict() for airport in found]
+    }), 200
+
+@bp.route('/api/airports/nearest', methods=['GET'])
+def get_nearest_airport():
+    """Get the airport with an IATA code closest to ?lat=&lon="""
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+    except (KeyError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': 'lat and lon are required'
+        }), 400
+    
+    airport, distance = get_airports().nearest(lat, lon, with_iata=True)
+    if airport is None:
+        return jsonify({
+            'success': False,
+            'error': 'No airport found'
+        }), 404
+    return jsonify({
+        'success': True,
+        'airport': airport._asdict(),
+        'distance_km': round(distance, 1)
+    }), 200
+
+@bp.route('/api/airports/<code>', methods=['GET'])
+def get_airport(code):
+    """Get an airport by IATA or ICAO code"""
+    airport = get_airports().get(code)
+    if airport is None:
+        return jsonify({
+            'success': False,
+            'error': 'Airport not found'
+        }), 404
+    return jsonify({
+        'success': True,
+        'airport': airport._asdict()
+    }), 200
+
+@bp.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Get runtime statistics for the flight data cache, upstream API client and request budget"""
+    try:
+        return jsonify({
+            'success': True,
+            'cache': get_cache().stats(),
+            'upstream': get_client().stats(),
+            'quota': get_quota().stats()
+        }), 200
+    except Exception as e:
+        logger.error(f"Error retrieving stats: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to retrieve stats',
+            'details': str(e)
+        }), 500
@@ -0,0 +1,270 @@
+import os
+import fcntl
+import logging
+import tempfile
+import threading
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import db
+from models import Flight, upsert_flights
+from aviation_api import get_flights_data
+from quota import flight_priority
+from events import record_flight_events
+from tracks import maintain_positions, record_positions
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# The scheduler is opt-in; when enabled, polling endpoints serve stored data
+SCHEDULER_ENABLED = os.environ.get("FLIGHT_SCHEDULER_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Seconds between scheduler passes (each pass only refreshes flights that are due)
+SCHEDULER_TICK = float(os.environ.get("FLIGHT_SCHEDULER_TICK", "15"))
+
+# Refresh cadence (seconds) by flight state
+REFRESH_ACTIVE = int(os.environ.get("FLIGHT_REFRESH_ACTIVE", "120"))
+REFRESH_IMMINENT = int(os.environ.get("FLIGHT_REFRESH_IMMINENT", "120"))
+REFRESH_SCHEDULED = int(os.environ.get("FLIGHT_REFRESH_SCHEDULED", "900"))
+REFRESH_DISTANT = int(os.environ.get("FLIGHT_REFRESH_DISTANT", "3600"))
+REFRESH_LANDED = int(os.environ.get("FLIGHT_REFRESH_LANDED", "10800"))
+
+# Flights departing within this many seconds are refreshed at the imminent cadence,
+# and within SCHEDULED_WINDOW at the scheduled cadence
+IMMINENT_WINDOW = 3600
+SCHEDULED_WINDOW = 6 * 3600
+
+# PostgreSQL advisory lock id used to elect the scheduler leader
+LEADER_LOCK_KEY = 0x466C5452
+LEADER_LOCK_FILE = os.path.join(tempfile.gettempdir(), "flighttracker-scheduler.lock")
+
+
+def refresh_interval(flight, now):
+    """
+    Decide how often a flight should be refreshed from the upstream API
+    
+    Args:
+        flight (Flight): The stored flight
+        now (datetime): Current UTC time (naive)
+    
+    Returns:
+        int: Seconds between refreshes
+    """
+    status = (flight.status or "").lower()
+    if status in ("landed", "arrived", "cancelled"):
+        return REFRESH_LANDED
+    if status in ("active", "en-route"):
+        return REFRESH_ACTIVE
+    
+    departure = flight.actual_departure or flight.scheduled_departure
+    if departure is None:
+        return REFRESH_SCHEDULED
+    
+    until_departure = (departure.replace(tzinfo=None) - now).total_seconds()
+    if until_departure <= IMMINENT_WINDOW:
+        return REFRESH_IMMINENT
+    if until_departure <= SCHEDULED_WINDOW:
+        return REFRESH_SCHEDULED
+    return REFRESH_DISTANT
+
+
+class LeaderLock:
+    """
+    Cross-process lock so only one gunicorn worker runs the scheduler
+    
+    Uses a session-level advisory lock on PostgreSQL (held on a dedicated
+    connection, so it is released automatically if the worker dies) and an
+    flock()ed file for other databases.
+    """
+    
+    def __init__(self, engine, key=LEADER_LOCK_KEY, path=LEADER_LOCK_FILE):
+        self.engine = engine
+        self.key = key
+        self.path = path
+        self._conn = None
+        self._file = None
+    
+    @property
+    def held(self):
+        return self._conn is not None or self._file is not None
+    
+    def acquire(self):
+        """Try to become (or confirm we still are) the leader; never blocks"""
+        if self.engine.dialect.name == "postgresql":
+            return self._acquire_advisory()
+        return self._acquire_file()
+    
+    def release(self):
+        if self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+                self._conn.commit()
+                self._conn.close()
+            except Exception as e:
+                logger.error(f"Error releasing scheduler leader lock: {str(e)}")
+            self._conn = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def _acquire_advisory(self):
+        if self._conn is not None:
+            try:
+                # Make sure the connection holding the lock is still alive
+                self._conn.execute(text("SELECT 1"))
+                self._conn.commit()
+                return True
+            except Exception as e:
+                logger.warning(f"Lost scheduler leader connection: {str(e)}")
+                self._conn.invalidate()
+                self._conn = None
+        
+        conn = self.engine.connect()
+        try:
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        if acquired:
+            self._conn = conn
+        else:
+            conn.close()
+        return bool(acquired)
+    
+    def _acquire_file(self):
+        if self._file is not None:
+            return True
+        lock_file = open(self.path, "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+
+class RefreshScheduler:
+    """
+    Background thread that keeps tracked flights fresh in the database
+    
+    Each pass refreshes only the flights whose cadence (see refresh_interval)
+    has elapsed, so upstream traffic depends on the number of tracked flights
+    rather than on the number of clients polling the API.
+    """
+    
+    def __init__(self, app, tick=SCHEDULER_TICK):
+        self.app = app
+        self.tick = tick
+        self._stop = threading.Event()
+        self._thread = None
+        self._leader_lock = None
+        self._last_refreshed = {}
+    
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="flight-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Flight refresh scheduler started (tick {self.tick}s)")
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._leader_lock is not None:
+            self._leader_lock.release()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Scheduler pass failed: {str(e)}")
+            self._stop.wait(self.tick)
+    
+    def run_once(self):
+        """Run one scheduler pass; returns the number of flights refreshed"""
+        with self.app.app_context():
+            try:
+                if self._leader_lock is None:
+                    self._leader_lock = LeaderLock(db.engine)
+                was_leader = self._leader_lock.held
+                if not self._leader_lock.acquire():
+                    return 0
+                if not was_leader:
+                    logger.info("This worker is now the flight refresh scheduler leader")
+                refreshed = self._refresh_due_flights()
+                maintain_positions()
+                return refreshed
+            finally:
+                db.session.remove()
+    
+    def _refresh_due_flights(self):
+        now = datetime.utcnow()
+        # One row per watched flight, however many watchlists it is on
+        flights = {
+            flight.flight_number: flight
+            for flight in Flight.query.filter(Flight.saved_flights.any()).all()
+        }
+        
+        # Forget flights that are no longer tracked
+        self._last_refreshed = {
+            flight_number: refreshed_at
+            for flight_number, refreshed_at in self._last_refreshed.items()
+            if flight_number in flights
+        }
+        
+        due = []
+        for flight_number, flight in flights.items():
+            last = self._last_refreshed.get(flight_number) or flight.last_updated
+            if last is None or (now - last).total_seconds() >= refresh_interval(flight, now):
+                due.append(flight_number)
+        
+        if not due:
+            return 0
+        
+        # Flights about to depart or land go first when the request budget is tight
+        priorities = {flight_number: flight_priority(flights[flight_number], now) for flight_number in due}
+        due.sort(key=priorities.get)
+        results = get_flights_data(
+            due,
+            {flight_number: flights[flight_number].departure_airport for flight_number in due if flight_number in flights},
+            priorities=priorities
+        )
+        
+        refreshed = 0
+        for flight_number in due:
+            # Failed lookups also wait a full interval so a bad flight can't hammer the API
+            self._last_refreshed[flight_number] = now
+            flight_data = results.get(flight_number)
+            if not flight_data or "error" in flight_data:
+                logger.warning(f"Scheduled refresh of {flight_number} failed: {(flight_data or {}).get('error')}")
+                continue
+            if flight_data.get("stale"):
+                logger.debug(f"Scheduled refresh of {flight_number} skipped: request budget exhausted")
+                continue
+            refreshed += 1
+        
+        changed = upsert_flights(results)
+        record_flight_events(changed)
+        record_positions(results, changed)
+        db.session.commit()
+        logger.info(f"Scheduler refreshed {refreshed}/{len(due)} due flights")
+        return refreshed
+
+
+_scheduler = None
+
+
+def start_scheduler(app):
+    """Start the background refresh scheduler for this worker, if enabled"""
+    global _scheduler
+    if not SCHEDULER_ENABLED or _scheduler is not None:
+        return _scheduler
+    _scheduler = RefreshScheduler(app)
+    _scheduler.start()
+    return _scheduler
@@ -0,0 +1,46 @@
+"""
+Build the bundled airport dataset (data/airports.csv.gz)
+
+Reads airports.csv from the airportsdata package (MIT licensed, data from
+https://github.com/mwgg/Airports) and keeps the columns airports.py uses.
+Fetch the source with `pip download airportsdata --no-deps` and pass the
+path to the extracted airports.csv, or install the package and omit it.
+
+Usage: python scripts/build_airports.py [path/to/airports.csv]
+"""
+import csv
+import gzip
+import io
+import os
+import sys
+
+COLUMNS = ["icao", "iata", "name", "city", "country", "lat", "lon", "tz"]
+OUTPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "airports.csv.gz")
+
+
+def main():
+    if len(sys.argv) > 1:
+        source = sys.argv[1]
+    else:
+        import airportsdata
+        source = os.path.join(os.path.dirname(airportsdata.__file__), "airports.csv")
+    
+    with open(source, newline="", encoding="utf-8") as f:
+        rows = [row for row in csv.DictReader(f) if row["lat"] and row["lon"]]
+    # Sorted by ICAO code so rebuilds from the same source produce the same file
+    rows.sort(key=lambda row: row["icao"])
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(COLUMNS)
+    for row in rows:
+        writer.writerow([row[column] for column in COLUMNS])
+    
+    # mtime=0 keeps the gzip header (and so the file) reproducible
+    with open(OUTPUT, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as out:
+        out.write(buffer.getvalue().encode("utf-8"))
+    print(f"Wrote {len(rows)} airports to {OUTPUT} ({os.path.getsize(OUTPUT)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
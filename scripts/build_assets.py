@@ -0,0 +1,88 @@
+"""
+Build minified, content-hashed static assets (static/dist/)
+
+Compiles the React components in static/js/components/*.jsx and the entry
+point static/js/app.js into one minified bundle, and minifies the tracker
+page script and stylesheet, using esbuild (run through npx, so Node.js is
+the only requirement; set ESBUILD to use another esbuild command). Each
+output is named after a hash of its contents, and static/dist/manifest.json
+maps the source paths to them; asset_url() in templates serves the built
+files when the manifest exists and the sources otherwise.
+
+Usage: python scripts/build_assets.py
+"""
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+
+STATIC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+DIST = os.path.join(STATIC, "dist")
+
+ESBUILD = shlex.split(os.environ.get("ESBUILD", "npx --yes esbuild@0.24.0"))
+
+# The components are plain scripts that share the global scope, so they are
+# concatenated with each one after the components it uses
+COMPONENTS = [
+    "js/components/LoadingIndicator.jsx",
+    "js/components/ErrorMessage.jsx",
+    "js/components/FlightForm.jsx",
+    "js/components/FlightList.jsx",
+    "js/components/FlightDetails.jsx",
+    "js/components/FlightMap.jsx",
+    "js/components/App.jsx",
+]
+
+# manifest key (the path templates pass to asset_url) -> (sources, esbuild loader)
+BUNDLES = {
+    "js/app.js": (COMPONENTS + ["js/app.js"], "jsx"),
+    "js/tracker.js": (["js/tracker.js"], "js"),
+    "css/custom.css": (["css/custom.css"], "css"),
+}
+
+
+def minify(source, loader):
+    command = ESBUILD + [
+        f"--loader={loader}", "--minify", "--target=es2018",
+        "--jsx-factory=React.createElement", "--jsx-fragment=React.Fragment",
+    ]
+    result = subprocess.run(command, input=source.encode("utf-8"), capture_output=True)
+    if result.returncode != 0:
+        sys.exit(f"esbuild failed: {result.stderr.decode('utf-8', 'replace')}")
+    return result.stdout
+
+
+def main():
+    os.makedirs(DIST, exist_ok=True)
+    manifest = {}
+    for name, (sources, loader) in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(STATIC, source), encoding="utf-8") as f:
+                parts.append(f.read())
+        # A semicolon between scripts stops one file's last statement running into the next
+        separator = "\n" if loader == "css" else "\n;\n"
+        output = minify(separator.join(parts), loader)
+
+        stem, extension = os.path.splitext(os.path.basename(name))
+        built = f"{stem}.{hashlib.sha256(output).hexdigest()[:12]}.min{extension}"
+        with open(os.path.join(DIST, built), "wb") as f:
+            f.write(output)
+        manifest[name] = f"dist/{built}"
+        size = sum(os.path.getsize(os.path.join(STATIC, source)) for source in sources)
+        print(f"{name}: {len(sources)} files, {size} -> {len(output)} bytes ({manifest[name]})")
+
+    # Drop builds the new manifest no longer points at
+    for filename in os.listdir(DIST):
+        if filename != "manifest.json" and f"dist/{filename}" not in manifest.values():
+            os.remove(os.path.join(DIST, filename))
+
+    with open(os.path.join(DIST, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import json
+from datetime import date, datetime
+
+from flask import Response
+
+from models import Flight
+
+try:
+    import orjson
+except ImportError:  # optional: pip install .[serialization]
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: pip install .[serialization]
+    msgpack = None
+
+# Flight columns in Flight.to_dict() order
+FLIGHT_FIELDS = tuple(column.name for column in Flight.__table__.columns)
+
+# Response formats for flight lists: one object per flight, one array per
+# field, or the columnar layout encoded as MessagePack
+FORMATS = ("records", "columns", "msgpack")
+
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def flight_columns(fields=FLIGHT_FIELDS):
+    """The Flight columns for a list of field names, for selecting plain row tuples"""
+    return [Flight.__table__.c[field] for field in fields]
+
+
+def records(fields, rows):
+    """
+    Turn SQL result tuples into one dict per row
+    
+    Values are left as they come from the database; datetimes are converted
+    while encoding, so no per-field work happens here.
+    
+    Args:
+        fields (tuple): Field names, in the order of the selected columns
+        rows (iterable): Result rows (tuples)
+    
+    Returns:
+        list: Dicts keyed by field name
+    """
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def columnar(fields, flights):
+    """
+    Transpose flight dicts into one array per field
+    
+    The field names are sent once instead of once per flight, which roughly
+    halves the size of large lists.
+    
+    Returns:
+        dict: {"fields": [...], "columns": {field: [values]}}
+    """
+    return {
+        "fields": list(fields),
+        "columns": {field: [flight.get(field) for flight in flights] for field in fields}
+    }
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """
+    Encode a payload as JSON bytes
+    
+    Uses orjson when it is installed. Naive datetimes come out as ISO 8601
+    strings either way, matching Flight.to_dict().
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default, separators=(",", ":")).encode()
+
+
+def requested_format(request):
+    """
+    Pick the response format from ?format= or the Accept header
+    
+    Returns:
+        str: One of FORMATS, or None if the requested format is unknown or
+            MessagePack was asked for but isn't installed
+    """
+    fmt = request.args.get("format")
+    if fmt is None:
+        # JSON wins ties, so "Accept: */*" keeps getting JSON
+        best = request.accept_mimetypes.best_match(("application/json",) + MSGPACK_MIMETYPES)
+        fmt = "msgpack" if best in MSGPACK_MIMETYPES else "records"
+    if fmt not in FORMATS or (fmt == "msgpack" and msgpack is None):
+        return None
+    return fmt
+
+
+def flights_response(flights, fields, fmt="records", status=200, **extra):
+    """
+    Build a response for a list of flight dicts
+    
+    Args:
+        flights (list): Flight dicts
+        fields (tuple): Fields to include, in order (used by the columnar formats)
+        fmt (str): One of FORMATS
+        status (int): HTTP status code
+        **extra: Other top-level keys for the payload
+    
+    Returns:
+        flask.Response: The encoded response
+    """
+    payload = {"success": True, **extra}
+    if fmt == "records":
+        payload["flights"] = flights
+        return Response(dumps(payload), status=status, mimetype="application/json")
+    
+    payload["flights"] = columnar(fields, flights)
+    if fmt == "msgpack":
+        return Response(msgpack.packb(payload, default=_default), status=status, mimetype="application/msgpack")
+    return Response(dumps(payload), status=status, mimetype="application/json")
@@ -10,6 +10,8 @@ const App = () => {
   
   // Reference to store the interval ID
   const refreshIntervalRef = React.useRef(null);
+  // Change feed version of the last list or delta applied
+  const flightsVersionRef = React.useRef(null);
   
   // Set refresh interval state and update the ref
   const setRefreshInterval = (interval) => {
@@ -29,22 +31,75 @@ const App = () => {
     };
   }, []);
   
-  // Handle auto-refresh toggle
+  // Keep the selected flight in a ref so stream handlers see the latest value
+  const selectedFlightRef = React.useRef(null);
   React.useEffect(() => {
-    if (autoRefresh) {
-      const interval = setInterval(() => {
-        refreshAllFlights();
-      }, 60000); // Refresh every minute
-      
-      setRefreshInterval(interval);
-    } else if (refreshInterval) {
-      clearInterval(refreshInterval);
-      setRefreshInterval(null);
+    selectedFlightRef.current = selectedFlight;
+  }, [selectedFlight]);
+  
+  // Same for the flight list, which the polling interval reads
+  const flightsRef = React.useRef([]);
+  React.useEffect(() => {
+    flightsRef.current = flights;
+  }, [flights]);
+  
+  // Handle auto-refresh toggle: subscribe to pushed flight updates
+  React.useEffect(() => {
+    if (!autoRefresh) {
+      return;
     }
     
+    const startPolling = () => {
+      if (!refreshIntervalRef.current) {
+        const interval = setInterval(() => {
+          refreshAllFlights();
+        }, 60000); // Refresh every minute
+        
+        setRefreshInterval(interval);
+      }
+    };
+    
+    if (!window.EventSource) {
+      // No Server-Sent Events support; fall back to polling
+      startPolling();
+      return () => {
+        clearInterval(refreshIntervalRef.current);
+        setRefreshInterval(null);
+      };
+    }
+    
+    const stream = new EventSource('/api/flights/stream');
+    
+    stream.addEventListener('ready', (e) => {
+      // Without a server-side scheduler, someone still has to trigger refreshes;
+      // the resulting changes are pushed to every open client
+      if (!JSON.parse(e.data).server_refresh) {
+        startPolling();
+      } else if (refreshIntervalRef.current) {
+        // Got a stream after being turned away; it replaces polling
+        clearInterval(refreshIntervalRef.current);
+        setRefreshInterval(null);
+      }
+    });
+    
+    // The server has no stream to spare; poll until the browser reconnects
+    stream.addEventListener('busy', () => startPolling());
+    
+    stream.addEventListener('update', (e) => {
+      const flight = JSON.parse(e.data);
+      if (flight.flight_number === selectedFlightRef.current) {
+        setFlightDetails(flight);
+      }
+    });
+    
+    stream.addEventListener('remove', () => fetchFlights());
+    stream.addEventListener('reset', () => fetchFlights());
+    
     return () => {
-      if (refreshInterval) {
-        clearInterval(refreshInterval);
+      stream.close();
+      if (refreshIntervalRef.current) {
+        clearInterval(refreshIntervalRef.current);
+        setRefreshInterval(null);
       }
     };
   }, [autoRefresh]);
@@ -55,17 +110,23 @@ const App = () => {
       setLoading(true);
       setError(null);
       
-      const response = await fetch('/api/flights');
+      // One request returns every tracked flight with its details
+      const response = await fetch('/api/flights/details');
       const data = await response.json();
       
       if (data.success) {
+        flightsVersionRef.current = data.version;
         setFlights(data.flights);
-        if (data.flights.length > 0 && !selectedFlight) {
-          // Select the first flight by default
-          selectFlight(data.flights[0].flight_number);
-        } else if (selectedFlight) {
-          // Refresh the selected flight details
-          selectFlight(selectedFlight);
+        
+        // Keep the selected flight if it's still tracked, otherwise select the first one
+        const current = data.flights.find(flight => flight.flight_number === selectedFlightRef.current)
+          || data.flights[0];
+        if (current && current.last_updated) {
+          setSelectedFlight(current.flight_number);
+          setFlightDetails(current);
+        } else if (current) {
+          // No stored details yet; fetch them
+          selectFlight(current.flight_number);
         }
       } else {
         setError(data.error || 'Failed to fetch flights');
@@ -190,11 +251,33 @@ const App = () => {
       setLoading(true);
       setError(null);
       
-      const response = await fetch('/api/flights/update-all');
+      // Only flights changed since the last fetch come back
+      const since = flightsVersionRef.current !== null ? `?since=${flightsVersionRef.current}` : '';
+      const response = await fetch(`/api/flights/update-all${since}`);
       const data = await response.json();
       
       if (data.success) {
-        await fetchFlights();
+        // Removed or newly added flights, or an expired cursor, need the whole list
+        const known = new Set(flightsRef.current.map(flight => flight.flight_number));
+        const needsReload = !since || data.reset || data.removed.length > 0 ||
+          data.flights.some(flight => !known.has(flight.flight_number));
+        if (needsReload) {
+          await fetchFlights();
+        } else {
+          // Apply the delta and move the cursor past it, so the next poll
+          // only asks for what changed after this one
+          const changed = new Map(data.flights.map(flight => [flight.flight_number, flight]));
+          if (changed.size > 0) {
+            setFlights(current => current.map(flight => changed.has(flight.flight_number)
+              ? { ...flight, ...changed.get(flight.flight_number) }
+              : flight));
+            const selected = changed.get(selectedFlightRef.current);
+            if (selected) {
+              setFlightDetails(current => ({ ...current, ...selected }));
+            }
+          }
+          flightsVersionRef.current = data.version;
+        }
       } else {
         setError(data.error || 'Failed to update flights');
       }
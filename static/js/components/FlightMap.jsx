@@ -5,6 +5,12 @@ const FlightMap = ({ flightDetails }) => {
   const markersRef = React.useRef([]);
   const pathRef = React.useRef(null);
   const planeMarkerRef = React.useRef(null);
+  // Recorded track of the shown flight; each refresh only fetches newer samples
+  const trackRef = React.useRef({ flightNumber: null, since: null, latlngs: [] });
+  const trackLineRef = React.useRef(null);
+  // Other flights in the viewport, reloaded whenever the map moves
+  const trafficLayerRef = React.useRef(null);
+  const shownFlightRef = React.useRef(null);
   
   React.useEffect(() => {
     // Initialize map if not already created
@@ -19,10 +25,65 @@ const FlightMap = ({ flightDetails }) => {
         maxZoom: 19,
         attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors &copy; <a href="https://carto.com/attributions">CARTO</a>'
       }).addTo(mapInstanceRef.current);
+      
+      trafficLayerRef.current = L.layerGroup().addTo(mapInstanceRef.current);
     }
     
+    const map = mapInstanceRef.current;
+    if (!map) return;
+    let request = 0;
+    
+    // Only the flights inside the viewport are fetched; at low zoom the
+    // server groups them into clusters
+    const loadTraffic = async () => {
+      const current = ++request;
+      const bounds = map.getBounds();
+      const bbox = [bounds.getSouth(), bounds.getWest(), bounds.getNorth(), bounds.getEast()]
+        .map(value => value.toFixed(4)).join(',');
+      try {
+        const response = await fetch(`/api/flights/in-bbox?bbox=${bbox}&zoom=${map.getZoom()}`);
+        const data = await response.json();
+        // Ignore responses overtaken by a later move
+        if (current !== request || !data.success || !trafficLayerRef.current) return;
+        
+        trafficLayerRef.current.clearLayers();
+        data.clusters.forEach(cluster => {
+          L.marker([cluster.lat, cluster.lon], {
+            icon: L.divIcon({
+              html: `<span class="badge rounded-pill bg-secondary">${cluster.count}</span>`,
+              iconSize: [30, 20],
+              iconAnchor: [15, 10],
+              className: 'flight-cluster'
+            })
+          }).on('click', () => map.setView([cluster.lat, cluster.lon], map.getZoom() + 2))
+            .addTo(trafficLayerRef.current);
+        });
+        data.flights
+          .filter(flight => flight.flight_number !== shownFlightRef.current)
+          .forEach(flight => {
+            L.circleMarker([flight.current_lat, flight.current_lon], {
+              radius: 4,
+              color: '#90a4ae',
+              weight: 1,
+              fillOpacity: 0.8
+            }).bindPopup(`
+              <strong>${flight.flight_number}</strong><br>
+              ${flight.departure_airport || '?'} &rarr; ${flight.arrival_airport || '?'}<br>
+              Status: ${flight.status || 'N/A'}
+            `).addTo(trafficLayerRef.current);
+          });
+      } catch (err) {
+        console.error('Error loading flights in view:', err);
+      }
+    };
+    
+    map.on('moveend', loadTraffic);
+    loadTraffic();
+    
     // Return a cleanup function to run when the component unmounts
     return () => {
+      map.off('moveend', loadTraffic);
+      trafficLayerRef.current = null;
       if (mapInstanceRef.current) {
         mapInstanceRef.current.remove();
         mapInstanceRef.current = null;
@@ -33,6 +94,7 @@ const FlightMap = ({ flightDetails }) => {
   React.useEffect(() => {
     // Update map when flight details change
     if (!mapInstanceRef.current || !flightDetails) return;
+    shownFlightRef.current = flightDetails.flight_number;
     
     // Clear previous markers and path
     markersRef.current.forEach(marker => marker.remove());
@@ -148,6 +210,60 @@ const FlightMap = ({ flightDetails }) => {
     
   }, [flightDetails]);
   
+  React.useEffect(() => {
+    if (!mapInstanceRef.current || !flightDetails) return;
+    
+    // Start a new track when a different flight is shown
+    if (trackRef.current.flightNumber !== flightDetails.flight_number) {
+      trackRef.current = { flightNumber: flightDetails.flight_number, since: null, latlngs: [] };
+      if (trackLineRef.current) {
+        trackLineRef.current.remove();
+        trackLineRef.current = null;
+      }
+    }
+    
+    let cancelled = false;
+    const track = trackRef.current;
+    
+    const loadTrack = async () => {
+      try {
+        const query = track.since !== null ? `?since=${track.since}` : '';
+        const response = await fetch(`/api/flights/${track.flightNumber}/track${query}`);
+        const data = await response.json();
+        if (cancelled || !data.success) return;
+        
+        const latlngs = data.track.lat.map((lat, i) => [lat, data.track.lon[i]]);
+        track.latlngs.push(...latlngs);
+        track.since = data.next_since;
+        
+        // Extend the existing line instead of redrawing it
+        if (trackLineRef.current) {
+          latlngs.forEach(latlng => trackLineRef.current.addLatLng(latlng));
+        } else if (track.latlngs.length > 1) {
+          trackLineRef.current = L.polyline(track.latlngs, {
+            color: '#ffb300',
+            weight: 2,
+            opacity: 0.9,
+            className: 'flight-track'
+          }).addTo(mapInstanceRef.current);
+        }
+        
+        // Long tracks come in pages
+        if (data.more) {
+          loadTrack();
+        }
+      } catch (err) {
+        console.error('Error loading flight track:', err);
+      }
+    };
+    
+    loadTrack();
+    
+    return () => {
+      cancelled = true;
+    };
+  }, [flightDetails]);
+  
   return (
     <div className="map-container mb-4" ref={mapRef}></div>
   );
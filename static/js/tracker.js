@@ -0,0 +1,981 @@
+// Flight tracker page (templates/index.html)
+document.addEventListener('DOMContentLoaded', function() {
+    // Set current year in footer
+    document.getElementById('currentYear').textContent = new Date().getFullYear();
+
+    // Initialize map
+    let map = null;
+    function initMap() {
+        const mapContainer = document.getElementById('mapContainer');
+        if (mapContainer) {
+            map = L.map(mapContainer).setView([20, 0], 2);
+            L.tileLayer('https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png', {
+                maxZoom: 19,
+                attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
+            }).addTo(map);
+        }
+    }
+
+    // Form submission
+    const flightForm = document.getElementById('flightForm');
+    flightForm.addEventListener('submit', function(e) {
+        e.preventDefault();
+        const flightNumber = document.getElementById('flightNumber').value.trim().toUpperCase();
+        if (flightNumber) {
+            addFlight(flightNumber);
+        }
+    });
+
+    // Add flight function
+    function addFlight(flightNumber) {
+        console.log('Adding flight:', flightNumber);
+        fetch('/api/flights/add', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ flight_number: flightNumber }),
+        })
+        .then(response => {
+            console.log('Add flight response status:', response.status);
+            if (!response.ok) {
+                throw new Error(`HTTP error: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            console.log('Add flight response data:', data);
+            if (data.success) {
+                document.getElementById('flightNumber').value = '';
+                fetchFlights();
+                // Make sure we display the new flight's details
+                setTimeout(() => {
+                    selectFlight(data.flight.flight_number);
+                }, 500);
+            } else {
+                alert('Error: ' + (data.error || 'Failed to add flight'));
+            }
+        })
+        .catch(error => {
+            console.error('Error adding flight:', error);
+            alert('Error connecting to server');
+        });
+    }
+
+    // Map toggle functionality
+    document.getElementById('mapToggle').addEventListener('change', function() {
+        const mapContainers = document.querySelectorAll('.map-container');
+        mapContainers.forEach(container => {
+            container.style.display = this.checked ? 'block' : 'none';
+        });
+    });
+
+    // Change feed version of the last full list; refreshes only fetch what changed after it
+    let flightsVersion = null;
+
+    // Fetch flights function
+    function fetchFlights() {
+        console.log('Fetching flights...');
+        // One request returns every tracked flight with its details
+        fetch('/api/flights/details')
+        .then(response => {
+            console.log('Response status:', response.status);
+            if (!response.ok) {
+                throw new Error(`HTTP error: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            console.log('Flights data:', data);
+            if (data.success) {
+                flightsVersion = data.version;
+                const flightsList = document.getElementById('flightsList');
+                const emptyState = document.querySelector('.empty-state');
+                const flightCounter = document.getElementById('flightCounter');
+                const addFlightBtn = document.getElementById('addFlightBtn');
+
+                // Update flight counter
+                flightCounter.textContent = `${data.flights.length}/${data.max_flights} Flights`;
+
+                // Disable add button once the watchlist is full
+                if (data.flights.length >= data.max_flights) {
+                    addFlightBtn.disabled = true;
+                    addFlightBtn.title = `Maximum limit reached (${data.max_flights} flights)`;
+                } else {
+                    addFlightBtn.disabled = false;
+                    addFlightBtn.title = "";
+                }
+
+                if (data.flights.length > 0) {
+                    flightsList.style.display = 'block';
+                    emptyState.style.display = 'none';
+
+                    // Update all flight details
+                    updateAllFlightDetails(data.flights);
+
+                    flightsList.innerHTML = '';
+                    data.flights.forEach(flight => {
+                        const li = document.createElement('li');
+                        li.className = 'list-group-item flight-card d-flex justify-content-between align-items-center';
+                        li.dataset.flightNumber = flight.flight_number;
+
+                        // Get status class
+                        function getStatusClass(status) {
+                            if (!status) return 'text-secondary';
+                            const statusLower = status.toLowerCase();
+                            if (statusLower.includes('scheduled')) return 'text-primary';
+                            if (statusLower.includes('active') || statusLower.includes('en-route')) return 'text-success';
+                            if (statusLower.includes('landed')) return 'text-info';
+                            if (statusLower.includes('cancelled')) return 'text-danger';
+                            if (statusLower.includes('delayed')) return 'text-warning';
+                            if (statusLower.includes('diverted')) return 'text-warning';
+                            return 'text-secondary';
+                        }
+
+                        // Get status icon
+                        function getStatusIcon(status) {
+                            if (!status) return 'question-circle';
+                            const statusLower = status.toLowerCase();
+                            if (statusLower.includes('scheduled')) return 'calendar-check';
+                            if (statusLower.includes('active') || statusLower.includes('en-route')) return 'plane';
+                            if (statusLower.includes('landed')) return 'check-circle';
+                            if (statusLower.includes('cancelled')) return 'times-circle';
+                            if (statusLower.includes('delayed')) return 'clock';
+                            if (statusLower.includes('diverted')) return 'exclamation-triangle';
+                            return 'question-circle';
+                        }
+
+                        const statusClass = getStatusClass(flight.status);
+                        const statusIcon = getStatusIcon(flight.status);
+
+                        li.innerHTML = `
+                            <div>
+                                <strong>${flight.flight_number}</strong>
+                                <div class="small ${statusClass}">
+                                    <i class="fas fa-${statusIcon} me-1"></i>
+                                    ${flight.status || 'Unknown'}
+                                </div>
+                            </div>
+                            <div>
+                                <a href="https://flightaware.com/live/flight/${flight.flight_number}" 
+                                   class="btn btn-sm btn-outline-info me-1" 
+                                   target="_blank" 
+                                   title="View on FlightAware">
+                                    <i class="fas fa-external-link-alt"></i>
+                                </a>
+                                <button class="btn btn-sm btn-outline-danger remove-flight">
+                                    <i class="fas fa-times"></i>
+                                </button>
+                            </div>
+                        `;
+                        li.addEventListener('click', function(e) {
+                            // Don't select flight if clicking on a button or link
+                            if (!e.target.closest('.remove-flight') && !e.target.closest('a') && 
+                                !e.target.closest('button') && !e.target.closest('.btn')) {
+                                selectFlight(flight.flight_number);
+                            }
+                        });
+
+                        // Explicitly handle button clicks
+                        const removeBtn = li.querySelector('.remove-flight');
+                        if (removeBtn) {
+                            removeBtn.addEventListener('click', function(e) {
+                                e.stopPropagation();
+                                e.preventDefault();
+                                console.log('Remove button clicked for flight:', flight.flight_number);
+                                removeFlight(flight.flight_number);
+                            });
+                        }
+
+                        // Make sure FlightAware link works
+                        const flightAwareLink = li.querySelector('a[href*="flightaware.com"]');
+                        if (flightAwareLink) {
+                            flightAwareLink.addEventListener('click', function(e) {
+                                e.stopPropagation();
+                                // Let the default link behavior continue
+                            });
+                        }
+
+                        flightsList.appendChild(li);
+                    });
+
+                    // Select first flight if none selected
+                    if (!document.querySelector('.flight-card.active') && data.flights.length > 0) {
+                        selectFlight(data.flights[0].flight_number);
+                    }
+                } else {
+                    flightsList.style.display = 'none';
+                    emptyState.style.display = 'block';
+                }
+            }
+        })
+        .catch(error => {
+            console.error('Error fetching flights:', error);
+        });
+    }
+
+    // Select flight function
+    function selectFlight(flightNumber) {
+        console.log('Selecting flight:', flightNumber);
+
+        // First check if this flight is still in our tracked flights list
+        Promise.resolve()
+        .then(() => {
+            // The list is kept current by fetchFlights and the live stream
+            const isTrackedFlight = !!document.querySelector(`.flight-card[data-flight-number="${flightNumber}"]`);
+
+            if (!isTrackedFlight) {
+                // If the flight is not in our tracked flights anymore, remove its card
+                const flightCard = document.getElementById(`flight-card-${flightNumber}`);
+                if (flightCard) {
+                    flightCard.remove();
+                }
+                return;
+            }
+
+            // Highlight selected flight
+            document.querySelectorAll('.flight-card').forEach(card => {
+                card.classList.remove('active');
+            });
+            const selectedCard = document.querySelector(`.flight-card[data-flight-number="${flightNumber}"]`);
+            if (selectedCard) {
+                selectedCard.classList.add('active');
+            }
+
+            // Check if we already have a flight detail card for this flight
+            const existingCard = document.getElementById(`flight-card-${flightNumber}`);
+            if (!existingCard) {
+                // Create a loading card while we fetch details
+                addBasicFlightCard(flightNumber);
+            }
+
+            // Fetch flight details
+            fetch(`/api/flights/details/${flightNumber}`)
+            .then(response => {
+                console.log(`Select flight response status for ${flightNumber}:`, response.status);
+                if (!response.ok) {
+                    throw new Error(`HTTP error: ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                console.log(`Select flight data for ${flightNumber}:`, data);
+                if (data.success) {
+                    displayFlightDetails(data.flight);
+                } else {
+                    console.error('Error:', data.error || 'Could not fetch flight details');
+                }
+            })
+            .catch(error => {
+                console.error('Error fetching flight details:', error);
+            });
+        })
+        .catch(error => {
+            console.error('Error checking tracked flights:', error);
+        });
+
+        // Helper function to add a basic card when details can't be fetched
+        function addBasicFlightCard(flightNumber) {
+            const allFlightsContainer = document.getElementById('allFlightsContainer');
+            const flightCard = document.createElement('div');
+            flightCard.className = 'card mb-4 flight-detail-card';
+            flightCard.id = `flight-card-${flightNumber}`;
+
+            flightCard.innerHTML = `
+                <div class="card-header d-flex justify-content-between align-items-center">
+                    <div>
+                        <h5 class="mb-0">${flightNumber}</h5>
+                        <div class="small text-secondary">
+                            <i class="fas fa-circle me-1"></i>
+                            Loading status...
+                        </div>
+                    </div>
+                    <div class="d-flex">
+                        <a href="https://flightaware.com/live/flight/${flightNumber}" 
+                           class="btn btn-sm btn-outline-info me-2" 
+                           target="_blank" 
+                           title="View on FlightAware">
+                            <i class="fas fa-external-link-alt me-1"></i>
+                            FlightAware
+                        </a>
+                        <button class="btn btn-sm btn-outline-secondary" onclick="refreshSingleFlight('${flightNumber}')">
+                            <i class="fas fa-sync-alt"></i>
+                        </button>
+                    </div>
+                </div>
+                <div class="card-body">
+                    <div class="alert alert-info text-center">
+                        <i class="fas fa-sync fa-spin me-2"></i>
+                        Loading flight details...
+                    </div>
+                </div>
+            `;
+
+            allFlightsContainer.appendChild(flightCard);
+        }
+    }
+
+    // Remove flight function
+    function removeFlight(flightNumber) {
+        if (confirm(`Are you sure you want to remove flight ${flightNumber}?`)) {
+            console.log('Removing flight:', flightNumber);
+
+            // Make the remove flight button show as in progress
+            const allRemoveButtons = document.querySelectorAll('.remove-flight');
+            allRemoveButtons.forEach(btn => {
+                if (btn.closest('.flight-card') && 
+                    btn.closest('.flight-card').dataset.flightNumber === flightNumber) {
+                    btn.disabled = true;
+                    btn.innerHTML = '<i class="fas fa-spinner fa-spin"></i>';
+                }
+            });
+
+            fetch(`/api/flights/remove/${flightNumber}`, {
+                method: 'DELETE',
+                headers: {
+                    'Content-Type': 'application/json'
+                }
+            })
+            .then(response => {
+                console.log('Remove flight response status:', response.status);
+                if (!response.ok) {
+                    if (response.status === 502) {
+                        throw new Error('Server disconnected. Please try again.');
+                    } else {
+                        throw new Error(`HTTP error: ${response.status}`);
+                    }
+                }
+                return response.json();
+            })
+            .then(data => {
+                console.log('Remove flight response data:', data);
+                if (data.success) {
+                    delete flightTracks[flightNumber];
+
+                    // First remove the flight card from the list
+                    const listCard = document.querySelector(`.flight-card[data-flight-number="${flightNumber}"]`);
+                    if (listCard) {
+                        listCard.remove();
+                    }
+
+                    // Remove the flight's detail card if it exists
+                    const flightCard = document.getElementById(`flight-card-${flightNumber}`);
+                    if (flightCard) {
+                        flightCard.remove();
+                    }
+
+                    // Reset selectFlight if we've just removed the active flight and clean up any lingering flight cards
+                    const activeCard = document.querySelector('.flight-card.active');
+                    if (activeCard && activeCard.dataset.flightNumber === flightNumber) {
+                        document.getElementById('emptyState').style.display = 'block';
+                    }
+
+                    // Make sure to clear any existing flight cards for this flight number
+                    const allCards = document.querySelectorAll(`.flight-detail-card`);
+                    allCards.forEach(card => {
+                        if (card.id === `flight-card-${flightNumber}`) {
+                            card.remove();
+                        }
+                    });
+
+                    // Refresh the flights list
+                    fetchFlights();
+
+                    // Show a success message
+                    const alertEl = document.createElement('div');
+                    alertEl.className = 'alert alert-success alert-dismissible fade show';
+                    alertEl.innerHTML = `
+                        Flight ${flightNumber} removed successfully
+                        <button type="button" class="btn-close" data-bs-dismiss="alert" aria-label="Close"></button>
+                    `;
+                    document.querySelector('.container').prepend(alertEl);
+
+                    // Auto-dismiss after 3 seconds
+                    setTimeout(() => {
+                        alertEl.remove();
+                    }, 3000);
+                } else {
+                    alert('Error: ' + (data.error || 'Failed to remove flight'));
+                }
+            })
+            .catch(error => {
+                console.error('Error removing flight:', error);
+                alert('Error: ' + error.message);
+
+                // Reset remove buttons
+                allRemoveButtons.forEach(btn => {
+                    if (btn.closest('.flight-card') && 
+                        btn.closest('.flight-card').dataset.flightNumber === flightNumber) {
+                        btn.disabled = false;
+                        btn.innerHTML = '<i class="fas fa-times"></i>';
+                    }
+                });
+            });
+        }
+    }
+
+    // Update all flight details function
+    function updateAllFlightDetails(flights) {
+        const allFlightsContainer = document.getElementById('allFlightsContainer');
+        const emptyState = document.getElementById('emptyState');
+
+        if (flights.length === 0) {
+            emptyState.style.display = 'block';
+            allFlightsContainer.innerHTML = '';
+            return;
+        }
+
+        emptyState.style.display = 'none';
+        allFlightsContainer.innerHTML = '';
+
+        // Details come with the list; flights without stored details get a basic card
+        flights.forEach(flightInfo => {
+            if (flightInfo.last_updated) {
+                addFlightDetailCard(flightInfo);
+            } else {
+                addBasicFlightCard(flightInfo.flight_number);
+            }
+        });
+
+        // Helper function to add a basic card when details can't be fetched
+        function addBasicFlightCard(flightNumber) {
+            const allFlightsContainer = document.getElementById('allFlightsContainer');
+            const flightCard = document.createElement('div');
+            flightCard.className = 'card mb-4 flight-detail-card';
+            flightCard.id = `flight-card-${flightNumber}`;
+
+            flightCard.innerHTML = `
+                <div class="card-header d-flex justify-content-between align-items-center">
+                    <div>
+                        <h5 class="mb-0">${flightNumber}</h5>
+                        <div class="small text-secondary">
+                            <i class="fas fa-circle me-1"></i>
+                            Loading status...
+                        </div>
+                    </div>
+                    <div class="d-flex">
+                        <a href="https://flightaware.com/live/flight/${flightNumber}" 
+                           class="btn btn-sm btn-outline-info me-2" 
+                           target="_blank" 
+                           title="View on FlightAware">
+                            <i class="fas fa-external-link-alt me-1"></i>
+                            FlightAware
+                        </a>
+                        <button class="btn btn-sm btn-outline-secondary" onclick="refreshSingleFlight('${flightNumber}')">
+                            <i class="fas fa-sync-alt"></i>
+                        </button>
+                    </div>
+                </div>
+                <div class="card-body">
+                    <div class="alert alert-info text-center">
+                        <i class="fas fa-sync fa-spin me-2"></i>
+                        Loading flight details...
+                    </div>
+                </div>
+            `;
+
+            allFlightsContainer.appendChild(flightCard);
+        }
+    }
+
+    // Create a single flight detail card
+    function addFlightDetailCard(flight) {
+        const allFlightsContainer = document.getElementById('allFlightsContainer');
+        const flightCard = document.createElement('div');
+        flightCard.className = 'card mb-4 flight-detail-card';
+        flightCard.id = `flight-card-${flight.flight_number}`;
+
+        // Create map container ID specific to this flight
+        const mapContainerId = `map-container-${flight.flight_number}`;
+
+        // Add card content
+        flightCard.innerHTML = createFlightDetailCardContent(flight, mapContainerId);
+
+        // Add to container
+        allFlightsContainer.appendChild(flightCard);
+
+        // Initialize map for this flight if coordinates are available
+        initFlightMap(flight, mapContainerId);
+    }
+
+    // Display flight details function (now just refreshes the card for the given flight)
+    function displayFlightDetails(flight) {
+        // This function is kept for compatibility but now just refreshes the card
+
+        // Check if this flight already has a card
+        const existingCard = document.getElementById(`flight-card-${flight.flight_number}`);
+
+        // If we found the card, update it
+        if (existingCard) {
+            const mapContainerId = `map-container-${flight.flight_number}`;
+            existingCard.innerHTML = createFlightDetailCardContent(flight, mapContainerId);
+            initFlightMap(flight, mapContainerId);
+        } else {
+            // If no card exists yet, add it
+            addFlightDetailCard(flight);
+        }
+    }
+
+    // Create flight detail card content
+    function createFlightDetailCardContent(flight, mapContainerId) {
+        // Format date function
+        function formatDateTime(dateTimeStr) {
+            if (!dateTimeStr) return 'N/A';
+            const date = new Date(dateTimeStr);
+            const options = { 
+                weekday: 'short',
+                day: 'numeric', 
+                month: 'short', 
+                year: 'numeric',
+                hour: '2-digit', 
+                minute: '2-digit',
+                timeZoneName: 'short'
+            };
+            return date.toLocaleString('en-US', options);
+        }
+
+        // Calculate and format delay
+        function calculateDelay(scheduled, actual) {
+            if (!scheduled || !actual) return null;
+            const scheduledDate = new Date(scheduled);
+            const actualDate = new Date(actual);
+            return Math.round((actualDate - scheduledDate) / (1000 * 60));
+        }
+
+        function formatDelay(delayMinutes) {
+            if (delayMinutes === null) return '';
+            if (delayMinutes <= 0) {
+                return '<span class="text-success">On time</span>';
+            }
+            const hours = Math.floor(delayMinutes / 60);
+            const minutes = delayMinutes % 60;
+            let delayText = '';
+            if (hours > 0) {
+                delayText += `${hours}h `;
+            }
+            if (minutes > 0 || hours === 0) {
+                delayText += `${minutes}m`;
+            }
+            return `<span class="text-warning">Delayed by ${delayText}</span>`;
+        }
+
+        // Get status class
+        function getStatusClass(status) {
+            if (!status) return 'text-secondary';
+            const statusLower = status.toLowerCase();
+            if (statusLower.includes('scheduled')) return 'text-primary';
+            if (statusLower.includes('active') || statusLower.includes('en-route')) return 'text-success';
+            if (statusLower.includes('landed')) return 'text-info';
+            if (statusLower.includes('cancelled')) return 'text-danger';
+            if (statusLower.includes('delayed')) return 'text-warning';
+            if (statusLower.includes('diverted')) return 'text-warning';
+            return 'text-secondary';
+        }
+
+        const departureDelay = calculateDelay(flight.scheduled_departure, flight.actual_departure);
+        const arrivalDelay = calculateDelay(flight.scheduled_arrival, flight.actual_arrival);
+        const statusClass = getStatusClass(flight.status);
+
+        // Check if we have map coordinates
+        const hasMapData = flight.departure_lat && flight.departure_lon && 
+                          flight.arrival_lat && flight.arrival_lon;
+
+        return `
+            <div class="card-header d-flex justify-content-between align-items-center">
+                <div>
+                    <h5 class="mb-0">
+                        ${flight.airline ? `${flight.airline} ` : ''}
+                        ${flight.flight_number}
+                    </h5>
+                    <div class="small ${statusClass}">
+                        <i class="fas fa-circle me-1"></i>
+                        ${flight.status || 'Unknown Status'}
+                    </div>
+                </div>
+                <div class="d-flex">
+                    <a href="https://flightaware.com/live/flight/${flight.flight_number}" 
+                       class="btn btn-sm btn-outline-info me-2" 
+                       target="_blank" 
+                       title="View on FlightAware">
+                        <i class="fas fa-external-link-alt me-1"></i>
+                        FlightAware
+                    </a>
+                    <button class="btn btn-sm btn-outline-secondary" onclick="refreshSingleFlight('${flight.flight_number}')">
+                        <i class="fas fa-sync-alt"></i>
+                    </button>
+                </div>
+            </div>
+            <div class="card-body">
+                <div class="row mb-3">
+                    <div class="col-md-6 mb-3">
+                        <div class="alert alert-secondary mb-0">
+                            <div>
+                                <strong>From:</strong> ${flight.departure_airport || 'N/A'}
+                            </div>
+                            <div>
+                                <small>${formatDateTime(flight.scheduled_departure)}</small>
+                            </div>
+                            <div class="mt-1">
+                                ${formatDelay(departureDelay)}
+                            </div>
+                        </div>
+                    </div>
+                    <div class="col-md-6 mb-3">
+                        <div class="alert alert-secondary mb-0">
+                            <div>
+                                <strong>To:</strong> ${flight.arrival_airport || 'N/A'}
+                            </div>
+                            <div>
+                                <small>${formatDateTime(flight.scheduled_arrival)}</small>
+                            </div>
+                            <div class="mt-1">
+                                ${formatDelay(arrivalDelay)}
+                            </div>
+                        </div>
+                    </div>
+                </div>
+
+                ${hasMapData ? 
+                    `<div class="map-container mb-3" id="${mapContainerId}" style="height: 250px;"></div>` : 
+                    `<div class="alert alert-secondary text-center mb-3">
+                        <i class="fas fa-map-marker-alt me-1"></i>
+                        Map unavailable: No coordinate data
+                    </div>`
+                }
+
+                ${(flight.altitude || flight.speed) ? `
+                <div class="row mb-3">
+                    ${flight.altitude ? `
+                    <div class="col-md-6 mb-2">
+                        <div class="d-flex align-items-center">
+                            <i class="fas fa-arrow-up me-2"></i>
+                            <div>
+                                <div class="text-muted small">Altitude</div>
+                                <div><strong>${flight.altitude.toLocaleString()} ft</strong></div>
+                            </div>
+                        </div>
+                    </div>
+                    ` : ''}
+
+                    ${flight.speed ? `
+                    <div class="col-md-6 mb-2">
+                        <div class="d-flex align-items-center">
+                            <i class="fas fa-tachometer-alt me-2"></i>
+                            <div>
+                                <div class="text-muted small">Speed</div>
+                                <div><strong>${flight.speed.toLocaleString()} km/h</strong></div>
+                            </div>
+                        </div>
+                    </div>
+                    ` : ''}
+                </div>
+                ` : ''}
+
+                <div class="text-end">
+                    <small class="text-muted">
+                        <i class="fas fa-clock me-1"></i>
+                        Last updated: ${formatDateTime(flight.last_updated)}
+                    </small>
+                </div>
+            </div>
+        `;
+    }
+
+    // Recorded positions per flight; refreshes only fetch samples newer than `since`
+    const flightTracks = {};
+
+    function loadFlightTrack(flightNumber) {
+        if (!flightTracks[flightNumber]) {
+            flightTracks[flightNumber] = { since: null, latlngs: [] };
+        }
+        const cached = flightTracks[flightNumber];
+        const query = cached.since !== null ? `?since=${cached.since}` : '';
+
+        return fetch(`/api/flights/${flightNumber}/track${query}`)
+        .then(response => response.ok ? response.json() : null)
+        .then(data => {
+            if (!data || !data.success) {
+                return cached.latlngs;
+            }
+            data.track.lat.forEach((lat, i) => cached.latlngs.push([lat, data.track.lon[i]]));
+            cached.since = data.next_since;
+            // Long tracks come in pages
+            return data.more ? loadFlightTrack(flightNumber) : cached.latlngs;
+        })
+        .catch(error => {
+            console.error(`Error loading track for ${flightNumber}:`, error);
+            return cached.latlngs;
+        });
+    }
+
+    // Initialize map for a specific flight
+    function initFlightMap(flight, mapContainerId) {
+        // Check if we should display the map based on toggle state
+        const mapToggle = document.getElementById('mapToggle');
+        const mapContainer = document.getElementById(mapContainerId);
+
+        if (!mapContainer) return;
+
+        // Apply map toggle setting
+        if (!mapToggle.checked) {
+            mapContainer.style.display = 'none';
+        }
+
+        // Check if we have map data
+        if (!flight.departure_lat || !flight.departure_lon || 
+            !flight.arrival_lat || !flight.arrival_lon) {
+            return;
+        }
+
+        // Initialize the map
+        const map = L.map(mapContainerId).setView([20, 0], 2);
+        L.tileLayer('https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png', {
+            maxZoom: 19,
+            attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
+        }).addTo(map);
+
+        // Create custom airport marker icon
+        const airportIcon = L.divIcon({
+            html: '<i class="fas fa-map-marker-alt fa-2x text-info"></i>',
+            iconSize: [20, 20],
+            iconAnchor: [10, 20],
+            className: 'airport-marker'
+        });
+
+        // Create custom plane marker icon
+        const planeIcon = L.divIcon({
+            html: '<i class="fas fa-plane text-warning"></i>',
+            iconSize: [20, 20],
+            iconAnchor: [10, 10],
+            className: 'plane-marker'
+        });
+
+        // Add departure marker
+        const departureMarker = L.marker([flight.departure_lat, flight.departure_lon], { icon: airportIcon }).addTo(map);
+        departureMarker.bindPopup(`<strong>${flight.departure_airport}</strong><br>Departure Airport`);
+
+        // Add arrival marker
+        const arrivalMarker = L.marker([flight.arrival_lat, flight.arrival_lon], { icon: airportIcon }).addTo(map);
+        arrivalMarker.bindPopup(`<strong>${flight.arrival_airport}</strong><br>Arrival Airport`);
+
+        // Draw flight path
+        const latlngs = [
+            [flight.departure_lat, flight.departure_lon],
+            [flight.arrival_lat, flight.arrival_lon]
+        ];
+        L.polyline(latlngs, {
+            color: '#1e88e5',
+            weight: 2,
+            opacity: 0.7,
+            className: 'flight-path'
+        }).addTo(map);
+
+        // Draw the flown track from the recorded positions
+        loadFlightTrack(flight.flight_number).then(latlngs => {
+            if (latlngs.length > 1) {
+                L.polyline(latlngs, {
+                    color: '#ffb300',
+                    weight: 2,
+                    opacity: 0.9,
+                    className: 'flight-track'
+                }).addTo(map);
+            }
+        });
+
+        // Add current position if available
+        if (flight.current_lat && flight.current_lon) {
+            const planeMarker = L.marker([flight.current_lat, flight.current_lon], { icon: planeIcon }).addTo(map);
+            planeMarker.bindPopup(`
+                <strong>${flight.flight_number}</strong><br>
+                ${flight.altitude ? `Altitude: ${flight.altitude.toLocaleString()} ft<br>` : ''}
+                ${flight.speed ? `Speed: ${flight.speed.toLocaleString()} km/h` : ''}
+            `);
+        }
+
+        // Fit bounds to show all markers
+        const bounds = L.latLngBounds([
+            [flight.departure_lat, flight.departure_lon],
+            [flight.arrival_lat, flight.arrival_lon]
+        ]);
+        if (flight.current_lat && flight.current_lon) {
+            bounds.extend([flight.current_lat, flight.current_lon]);
+        }
+        map.fitBounds(bounds, { padding: [30, 30] });
+    }
+
+    // Refresh single flight function
+    function refreshSingleFlight(flightNumber) {
+        console.log('Refreshing flight:', flightNumber);
+
+        // Show loading state on the card
+        const existingCard = document.getElementById(`flight-card-${flightNumber}`);
+        if (existingCard) {
+            existingCard.querySelector('.card-body').innerHTML = `
+                <div class="alert alert-info text-center">
+                    <i class="fas fa-sync fa-spin me-2"></i>
+                    Refreshing flight data...
+                </div>
+            `;
+        }
+
+        fetch(`/api/flights/update/${flightNumber}`)
+        .then(response => {
+            console.log(`Refresh flight response status for ${flightNumber}:`, response.status);
+            if (!response.ok) {
+                throw new Error(`HTTP error: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            console.log(`Refresh flight data for ${flightNumber}:`, data);
+            if (data.success) {
+                // Remove existing card
+                const existingCard = document.getElementById(`flight-card-${flightNumber}`);
+                if (existingCard) {
+                    existingCard.remove();
+                }
+
+                // Add updated card
+                addFlightDetailCard(data.flight);
+            } else {
+                alert('Error: ' + (data.error || 'Failed to update flight data'));
+                // Reset the card to its previous state by refreshing the whole list
+                fetchFlights();
+            }
+        })
+        .catch(error => {
+            console.error('Error refreshing flight:', error);
+            // Reset the card to its previous state by refreshing the whole list
+            fetchFlights();
+        });
+    }
+
+    // Refresh all flights function
+    document.getElementById('refreshButton').addEventListener('click', function() {
+        const since = flightsVersion !== null ? `?since=${flightsVersion}` : '';
+        fetch(`/api/flights/update-all${since}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                // Only flights that changed since the last fetch come back. Removed or
+                // newly added flights, or an expired cursor, need the whole list
+                const needsReload = !since || data.reset || data.removed.length > 0 ||
+                    data.flights.some(flight => !document.querySelector(`.flight-card[data-flight-number="${flight.flight_number}"]`));
+                if (needsReload) {
+                    fetchFlights();
+                } else {
+                    data.flights.forEach(displayFlightDetails);
+                    flightsVersion = data.version;
+                }
+                const activeFlightCard = document.querySelector('.flight-card.active');
+                if (activeFlightCard) {
+                    const flightNumber = activeFlightCard.dataset.flightNumber;
+                    selectFlight(flightNumber);
+                }
+            } else {
+                alert('Error: ' + (data.error || 'Failed to update flights'));
+            }
+        })
+        .catch(error => {
+            console.error('Error refreshing all flights:', error);
+        });
+    });
+
+    // Auto-refresh toggle: subscribe to pushed flight updates
+    let autoRefreshInterval = null;
+    let flightStream = null;
+
+    function startPolling() {
+        if (!autoRefreshInterval) {
+            autoRefreshInterval = setInterval(function() {
+                document.getElementById('refreshButton').click();
+            }, 60000); // Refresh every minute
+        }
+    }
+
+    function startFlightStream() {
+        if (!window.EventSource) {
+            // No Server-Sent Events support; fall back to polling
+            startPolling();
+            return;
+        }
+
+        flightStream = new EventSource('/api/flights/stream');
+
+        flightStream.addEventListener('ready', function(e) {
+            // Without a server-side scheduler, someone still has to trigger refreshes;
+            // the resulting changes are pushed to every open client
+            if (!JSON.parse(e.data).server_refresh) {
+                startPolling();
+            } else if (autoRefreshInterval) {
+                // Got a stream after being turned away; it replaces polling
+                clearInterval(autoRefreshInterval);
+                autoRefreshInterval = null;
+            }
+        });
+
+        flightStream.addEventListener('busy', function() {
+            // The server has no stream to spare; poll until the browser reconnects
+            startPolling();
+        });
+
+        flightStream.addEventListener('update', function(e) {
+            const flight = JSON.parse(e.data);
+            // Only show updates for flights in our list
+            if (document.querySelector(`.flight-card[data-flight-number="${flight.flight_number}"]`)) {
+                displayFlightDetails(flight);
+            }
+        });
+
+        flightStream.addEventListener('remove', function(e) {
+            const flightNumber = JSON.parse(e.data).flight_number;
+            const listCard = document.querySelector(`.flight-card[data-flight-number="${flightNumber}"]`);
+            if (listCard) {
+                fetchFlights();
+            }
+        });
+
+        flightStream.addEventListener('reset', function() {
+            fetchFlights();
+        });
+    }
+
+    document.getElementById('autoRefreshToggle').addEventListener('change', function() {
+        if (this.checked) {
+            startFlightStream();
+            document.querySelector('footer small').textContent = `© ${new Date().getFullYear()} Flight Tracker | Data refreshed automatically`;
+        } else {
+            if (flightStream) {
+                flightStream.close();
+                flightStream = null;
+            }
+            clearInterval(autoRefreshInterval);
+            autoRefreshInterval = null;
+            document.querySelector('footer small').textContent = `© ${new Date().getFullYear()} Flight Tracker | Data refreshed manually`;
+        }
+    });
+
+    // Initial fetch of flights
+    fetchFlights();
+
+    // Function to refresh a single flight's details
+    function refreshSingleFlight(flightNumber) {
+        fetch(`/api/flights/update/${flightNumber}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (data.success) {
+                displayFlightDetails(data.flight);
+            } else {
+                console.error('Failed to refresh flight:', data.error);
+            }
+        })
+        .catch(error => {
+            console.error('Error refreshing flight:', error);
+        });
+    }
+});
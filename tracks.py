@@ -0,0 +1,182 @@
+import os
+import time
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import db
+from models import FlightPosition
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Position samples older than this are deleted
+TRACK_RETENTION = timedelta(days=int(os.environ.get("FLIGHT_TRACK_RETENTION_DAYS", "7")))
+
+# Samples older than this are thinned to one per TRACK_DOWNSAMPLE_INTERVAL seconds
+TRACK_DOWNSAMPLE_AFTER = timedelta(hours=int(os.environ.get("FLIGHT_TRACK_DOWNSAMPLE_AFTER_HOURS", "6")))
+TRACK_DOWNSAMPLE_INTERVAL = int(os.environ.get("FLIGHT_TRACK_DOWNSAMPLE_INTERVAL", "300"))
+
+# Maximum samples returned by one track request; clients page with ?since=
+TRACK_PAGE_SIZE = int(os.environ.get("FLIGHT_TRACK_PAGE_SIZE", "5000"))
+
+# Seconds between retention/downsampling runs (by the scheduler leader)
+TRACK_MAINTENANCE_INTERVAL = 3600
+
+EPOCH = datetime(1970, 1, 1)
+
+_last_maintenance = 0.0
+
+# Samples recorded before this were thinned by an earlier run in this process
+_downsampled_before = None
+
+
+def to_epoch_ms(value):
+    """Convert a naive UTC datetime to integer milliseconds since the epoch"""
+    return (value - EPOCH) // timedelta(milliseconds=1)
+
+
+def record_positions(results, flight_numbers):
+    """
+    Append the current position of each given flight to its track
+    
+    Args:
+        results (dict): get_flight_data results by flight number
+        flight_numbers (list): Flights whose stored data just changed
+    """
+    # Whole milliseconds, so the ?since= cursor clients get back is exact
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    rows = []
+    for flight_number in flight_numbers:
+        flight_data = results.get(flight_number) or {}
+        if flight_data.get("current_lat") is None or flight_data.get("current_lon") is None:
+            continue
+        rows.append({
+            "flight_number": flight_number,
+            "recorded_at": now,
+            "lat": flight_data["current_lat"],
+            "lon": flight_data["current_lon"],
+            "altitude": flight_data.get("altitude"),
+            "speed": flight_data.get("speed"),
+            "source": flight_data.get("position_source"),
+        })
+    if rows:
+        db.session.execute(insert(FlightPosition), rows)
+
+
+def get_track(flight_number, since=None, limit=TRACK_PAGE_SIZE):
+    """
+    Get a flight's position samples in columnar form
+    
+    Args:
+        flight_number (str): The flight number
+        since (int): Only return samples recorded after this time (epoch milliseconds)
+        limit (int): Maximum number of samples to return
+    
+    Returns:
+        dict: Parallel lists of sample times (epoch ms), positions and sources,
+            plus the cursor for the next request and whether more samples are waiting
+    """
+    query = db.session.query(
+        FlightPosition.recorded_at, FlightPosition.lat, FlightPosition.lon,
+        FlightPosition.altitude, FlightPosition.speed, FlightPosition.source
+    ).filter(FlightPosition.flight_number == flight_number)
+    if since is not None:
+        query = query.filter(FlightPosition.recorded_at > EPOCH + timedelta(milliseconds=since))
+    rows = query.order_by(FlightPosition.recorded_at).limit(limit + 1).all()
+    
+    more = len(rows) > limit
+    rows = rows[:limit]
+    track = {
+        "t": [to_epoch_ms(row.recorded_at) for row in rows],
+        "lat": [row.lat for row in rows],
+        "lon": [row.lon for row in rows],
+        "altitude": [row.altitude for row in rows],
+        "speed": [row.speed for row in rows],
+        "source": [row.source for row in rows],
+    }
+    return {
+        "track": track,
+        "next_since": track["t"][-1] if rows else since,
+        "more": more
+    }
+
+
+def downsample_cutoff(now):
+    """
+    Samples recorded before this are thinned: TRACK_DOWNSAMPLE_AFTER ago,
+    rounded down to the start of a TRACK_DOWNSAMPLE_INTERVAL bucket so a
+    bucket is never split between two runs
+    """
+    interval = timedelta(seconds=TRACK_DOWNSAMPLE_INTERVAL)
+    return EPOCH + (now - TRACK_DOWNSAMPLE_AFTER - EPOCH) // interval * interval
+
+
+def downsample_positions(now=None, since=None):
+    """
+    Apply track retention and thin out old samples
+    
+    Samples past TRACK_RETENTION are deleted, and samples older than
+    TRACK_DOWNSAMPLE_AFTER are reduced to the first one in each
+    TRACK_DOWNSAMPLE_INTERVAL per flight.
+    
+    Args:
+        now (datetime): Current UTC time (defaults to now)
+        since (datetime): Samples before this were already thinned, so only
+            the ones from here up to downsample_cutoff(now) are read; None
+            reads every sample still kept
+    
+    Returns:
+        tuple: (expired samples deleted, samples removed by downsampling)
+    """
+    now = now or datetime.utcnow()
+    expired = FlightPosition.query.filter(
+        FlightPosition.recorded_at < now - TRACK_RETENTION
+    ).delete(synchronize_session=False)
+    
+    query = db.session.query(
+        FlightPosition.id, FlightPosition.flight_number, FlightPosition.recorded_at
+    ).filter(FlightPosition.recorded_at < downsample_cutoff(now))
+    if since is not None:
+        query = query.filter(FlightPosition.recorded_at >= since)
+    rows = query.order_by(FlightPosition.flight_number, FlightPosition.recorded_at).all()
+    
+    redundant = []
+    last_bucket = None
+    for position_id, flight_number, recorded_at in rows:
+        bucket = (flight_number, to_epoch_ms(recorded_at) // (TRACK_DOWNSAMPLE_INTERVAL * 1000))
+        if bucket == last_bucket:
+            redundant.append(position_id)
+        last_bucket = bucket
+    
+    for start in range(0, len(redundant), 500):
+        FlightPosition.query.filter(
+            FlightPosition.id.in_(redundant[start:start + 500])
+        ).delete(synchronize_session=False)
+    db.session.commit()
+    return expired, len(redundant)
+
+
+def maintain_positions():
+    """
+    Run downsample_positions at most once per TRACK_MAINTENANCE_INTERVAL
+    
+    Only the scheduler leader calls this. After the first run in a process
+    each run only reads the samples that aged past TRACK_DOWNSAMPLE_AFTER
+    since the previous one.
+    """
+    global _last_maintenance, _downsampled_before
+    if time.monotonic() - _last_maintenance < TRACK_MAINTENANCE_INTERVAL:
+        return
+    _last_maintenance = time.monotonic()
+    try:
+        now = datetime.utcnow()
+        expired, redundant = downsample_positions(now, since=_downsampled_before)
+        _downsampled_before = downsample_cutoff(now)
+        if expired or redundant:
+            logger.info(f"Pruned {expired} expired and {redundant} downsampled track positions")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error pruning track positions: {str(e)}")
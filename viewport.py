@@ -0,0 +1,169 @@
+import os
+import math
+
+from sqlalchemy import Integer, and_, cast, func, or_
+
+from app import db
+from models import Flight
+from geo import AIRBORNE_STATUSES, refresh_estimated_positions
+from watchlists import watchlist_flights_query
+
+# Below this zoom level flights are grouped into clusters
+CLUSTER_MAX_ZOOM = int(os.environ.get("MAP_CLUSTER_MAX_ZOOM", "8"))
+
+# Cluster cell size in screen pixels (map tiles are 256 pixels wide)
+CLUSTER_CELL_PIXELS = int(os.environ.get("MAP_CLUSTER_CELL_PIXELS", "64"))
+
+# Flights returned individually before the response switches to clusters at any zoom
+VIEWPORT_MAX_FLIGHTS = int(os.environ.get("MAP_VIEWPORT_MAX_FLIGHTS", "1000"))
+
+# Fields sent for each flight drawn on the map
+MAP_FIELDS = (
+    "flight_number", "airline", "status", "departure_airport", "arrival_airport",
+    "current_lat", "current_lon", "position_source", "altitude", "speed",
+)
+
+# Also loaded so estimated positions can be moved to the current time
+ROUTE_FIELDS = (
+    "departure_lat", "departure_lon", "arrival_lat", "arrival_lon",
+    "scheduled_departure", "actual_departure", "scheduled_arrival", "actual_arrival",
+)
+
+
+def normalize_bbox(south, west, north, east):
+    """
+    Clamp a map viewport to valid coordinates
+    
+    Leaflet reports longitudes beyond +/-180 once the map has been panned
+    around the world; those are wrapped back, and a viewport that ends up with
+    west > east crosses the antimeridian.
+    
+    Returns:
+        tuple: (south, west, north, east)
+    """
+    south, north = max(-90.0, min(south, north)), min(90.0, max(south, north))
+    if east - west >= 360:
+        return south, -180.0, north, 180.0
+    west = (west + 180) % 360 - 180
+    east = (east + 180) % 360 - 180
+    if east == -180.0:
+        east = 180.0
+    return south, west, north, east
+
+
+def _bbox_filter(south, west, north, east):
+    lat_filter = Flight.current_lat.between(south, north)
+    if west <= east:
+        return and_(lat_filter, Flight.current_lon.between(west, east))
+    return and_(lat_filter, or_(Flight.current_lon >= west, Flight.current_lon <= east))
+
+
+def _in_bbox(flight, south, west, north, east):
+    lat, lon = flight["current_lat"], flight["current_lon"]
+    if lat is None or lon is None or not south <= lat <= north:
+        return False
+    if west <= east:
+        return west <= lon <= east
+    return lon >= west or lon <= east
+
+
+def _moving_filter():
+    """Flights whose stored position refresh_estimated_positions() moves, so the map can't use it as stored"""
+    return and_(
+        func.coalesce(Flight.position_source, "") == "estimated",
+        func.lower(func.coalesce(Flight.status, "")).in_(AIRBORNE_STATUSES),
+        Flight.departure_lat.isnot(None), Flight.departure_lon.isnot(None),
+        Flight.arrival_lat.isnot(None), Flight.arrival_lon.isnot(None)
+    )
+
+
+def _cell_index(value, cell):
+    """
+    SQL for floor(value / cell), matching math.floor() in Python
+    
+    Values are offset to be positive, where SQLite's CAST truncation is a
+    floor; PostgreSQL's CAST rounds, so other databases use floor() (which
+    SQLite only has when built with its math functions).
+    """
+    if db.session.get_bind().dialect.name == "sqlite":
+        return cast(value / cell, Integer)
+    return cast(func.floor(value / cell), Integer)
+
+
+def _map_flights(query):
+    fields = MAP_FIELDS + ROUTE_FIELDS
+    flights = [dict(zip(fields, row)) for row in query.with_entities(*(getattr(Flight, field) for field in fields))]
+    refresh_estimated_positions(flights)
+    return [{field: flight[field] for field in MAP_FIELDS} for flight in flights]
+
+
+def flights_in_bbox(owner_id, south, west, north, east, zoom):
+    """
+    Get the flights on a watchlist that are visible in a map viewport
+    
+    At low zoom (or when too many flights are visible) flights are grouped
+    into grid cells in the database, and only cells holding a single flight
+    are returned as flights, so the response size depends on the viewport
+    rather than on the number of tracked flights.
+    
+    Airborne flights with estimated positions are moved to the current time
+    first and then filtered and grouped in Python, so every flight is
+    placed, filtered and clustered by the position it is drawn at.
+    
+    Args:
+        owner_id (str): The watchlist owner
+        south, west, north, east (float): Viewport bounds in degrees
+        zoom (int): Map zoom level
+    
+    Returns:
+        dict: "flights" (list of flight dicts) and "clusters" (list of
+            {lat, lon, count} dicts)
+    """
+    south, west, north, east = normalize_bbox(south, west, north, east)
+    watched = watchlist_flights_query(owner_id, Flight.id)
+    moving = _moving_filter()
+    moving_in_view = [
+        flight for flight in _map_flights(watched.filter(moving))
+        if _in_bbox(flight, south, west, north, east)
+    ]
+    in_view = watched.filter(~moving, _bbox_filter(south, west, north, east))
+    
+    room = VIEWPORT_MAX_FLIGHTS + 1 - len(moving_in_view)
+    if zoom > CLUSTER_MAX_ZOOM and room > 0:
+        flights = moving_in_view + _map_flights(in_view.limit(room))
+        if len(flights) <= VIEWPORT_MAX_FLIGHTS:
+            return {"flights": flights, "clusters": []}
+    
+    # Degrees covered by one cluster cell at this zoom; cells are numbered
+    # from the south pole and the antimeridian so the numbers are positive
+    cell = 360.0 / (2 ** max(0, zoom)) * CLUSTER_CELL_PIXELS / 256
+    row = _cell_index(Flight.current_lat + 90, cell)
+    column = _cell_index(Flight.current_lon + 180, cell)
+    cells = {
+        (cell_row, cell_column): [count, lat_sum, lon_sum, flight_number, None]
+        for cell_row, cell_column, count, lat_sum, lon_sum, flight_number in in_view.with_entities(
+            row, column, func.count(Flight.id), func.sum(Flight.current_lat), func.sum(Flight.current_lon),
+            func.min(Flight.flight_number)
+        ).order_by(None).group_by(row, column)
+    }
+    for flight in moving_in_view:
+        key = (math.floor((flight["current_lat"] + 90) / cell), math.floor((flight["current_lon"] + 180) / cell))
+        totals = cells.setdefault(key, [0, 0.0, 0.0, flight["flight_number"], flight])
+        totals[0] += 1
+        totals[1] += flight["current_lat"]
+        totals[2] += flight["current_lon"]
+    
+    clusters = []
+    flights = []
+    singles = []
+    for count, lat_sum, lon_sum, flight_number, flight in cells.values():
+        if count > 1:
+            clusters.append({"lat": round(lat_sum / count, 4), "lon": round(lon_sum / count, 4), "count": count})
+        elif flight:
+            flights.append(flight)
+        else:
+            singles.append(flight_number)
+    
+    if singles:
+        flights += _map_flights(Flight.query.filter(Flight.flight_number.in_(singles)))
+    return {"flights": flights, "clusters": clusters}
@@ -0,0 +1,151 @@
+import os
+import uuid
+import logging
+from datetime import datetime
+
+from flask import session
+from sqlalchemy import func, insert, literal, or_, select, text
+
+from app import db
+from models import Flight, FlightEvent, SavedFlight
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Maximum number of flights on one watchlist
+WATCHLIST_MAX_FLIGHTS = int(os.environ.get("WATCHLIST_MAX_FLIGHTS", "50"))
+
+# First key of the PostgreSQL advisory locks that serialize adds to one watchlist
+WATCHLIST_LOCK_NAMESPACE = 0x5741
+
+
+def current_owner_id():
+    """
+    Get the id of the watchlist owned by this browser session
+    
+    Visitors don't sign in; each browser gets a random id in its (signed)
+    session cookie the first time it touches a watchlist.
+    
+    Returns:
+        str: The owner id
+    """
+    owner_id = session.get("owner_id")
+    if not owner_id:
+        owner_id = uuid.uuid4().hex
+        session["owner_id"] = owner_id
+        session.permanent = True
+    return owner_id
+
+
+def watchlist_query(owner_id):
+    """SavedFlight rows on a watchlist, oldest first"""
+    return SavedFlight.query.filter_by(owner_id=owner_id).order_by(SavedFlight.id)
+
+
+def watchlist_flights_query(owner_id, *columns):
+    """
+    Columns of the flights on a watchlist joined with their details, oldest first
+    
+    Every saved flight has a details row (foreign key), so an inner join
+    loses nothing.
+    """
+    return db.session.query(*columns).select_from(SavedFlight).join(
+        Flight, Flight.flight_number == SavedFlight.flight_number
+    ).filter(SavedFlight.owner_id == owner_id).order_by(SavedFlight.id)
+
+
+def watchlist_changes(owner_id, since):
+    """
+    What changed on a watchlist after a version
+    
+    Versions are flight event ids. A flight changed if its own version is
+    newer, or if it was added to the watchlist afterwards; it was removed if
+    the last add/remove event for it on this watchlist is a removal.
+    
+    Clients get settled_event_id() as their version, so no event below it
+    can still commit late; changes after it are sent again until they
+    settle, rather than skipped when a lower id commits after a higher one.
+    
+    Args:
+        owner_id (str): The watchlist owner
+        since (int): Version the client last saw
+    
+    Returns:
+        tuple: (filter selecting the watchlist rows to send, list of removed
+            flight numbers), or None if events after `since` have been pruned
+            and the client has to reload the whole list
+    """
+    if since <= 0:
+        return None
+    oldest = db.session.query(db.func.min(FlightEvent.id)).scalar()
+    if oldest is not None and oldest > since + 1:
+        return None
+    
+    # Latest membership event per flight on this watchlist
+    latest = {}
+    for flight_number, event_type in db.session.query(FlightEvent.flight_number, FlightEvent.event_type).filter(
+        FlightEvent.id > since, FlightEvent.owner_id == owner_id
+    ).order_by(FlightEvent.id):
+        latest[flight_number] = event_type
+    
+    added = [flight_number for flight_number, event_type in latest.items() if event_type == "add"]
+    removed = [flight_number for flight_number, event_type in latest.items() if event_type == "remove"]
+    changed = or_(Flight.version > since, SavedFlight.flight_number.in_(added)) if added else Flight.version > since
+    return changed, removed
+
+
+def add_to_watchlist(owner_id, flight_number):
+    """
+    Put a flight on a watchlist unless it already holds WATCHLIST_MAX_FLIGHTS
+    
+    Runs in the current session; the caller commits. The count is part of
+    the INSERT, so two adds can't both take the last place. PostgreSQL
+    statements don't see each other's uncommitted rows, so adds to the same
+    watchlist first wait on an advisory lock held until commit; SQLite only
+    runs one write at a time anyway.
+    
+    Returns:
+        bool: True if the flight was added, False if the watchlist is full
+    
+    Raises:
+        sqlalchemy.exc.IntegrityError: If the flight is already on the watchlist
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, hashtext(:owner_id))"),
+            {"namespace": WATCHLIST_LOCK_NAMESPACE, "owner_id": owner_id}
+        )
+    
+    table = SavedFlight.__table__
+    count = select(func.count()).select_from(table).where(table.c.owner_id == owner_id).scalar_subquery()
+    added = db.session.execute(insert(table).from_select(
+        ["owner_id", "flight_number", "date_added"],
+        select(literal(owner_id), literal(flight_number), literal(datetime.utcnow()))
+        .where(count < WATCHLIST_MAX_FLIGHTS)
+    ))
+    return added.rowcount == 1
+
+
+def remove_from_watchlist(owner_id, flight_number):
+    """
+    Take a flight off a watchlist, and delete its details once nobody watches it
+    
+    Runs in the current session; the caller commits.
+    
+    Returns:
+        tuple: (removed, orphaned) - whether the flight was on the watchlist,
+            and whether its details row was deleted with it
+    """
+    removed = SavedFlight.query.filter_by(owner_id=owner_id, flight_number=flight_number).delete(
+        synchronize_session=False
+    )
+    if not removed:
+        return False, False
+    
+    # Only delete the details row if no other watchlist still references it
+    orphaned = Flight.query.filter(
+        Flight.flight_number == flight_number, ~Flight.saved_flights.any()
+    ).delete(synchronize_session=False)
+    if orphaned:
+        logger.info(f"Deleted flight {flight_number}; no watchlist references it")
+    return True, bool(orphaned)